@@ -1,11 +1,12 @@
-import calendar
 from config import *
 from datetime import datetime
 from flask_sqlalchemy import BaseQuery
 import json
+import localization
 import models
+import pagination
 from sqlalchemy import or_
-from typing import Any, List, Optional
+from typing import Any, List, Optional, Tuple
 
 
 def expect_int(value: Any, default: int, minimum: Optional[int] = None,
@@ -29,7 +30,7 @@ def expect_timestamp(value: Any) -> Optional[datetime]:
     """
     value = expect_int(value, 0)
     if value:
-        value = datetime.fromtimestamp(value)
+        value = localization.from_timestamp(value)
     return value or None
 
 
@@ -42,7 +43,7 @@ def absolute_url(relative_url: str) -> Optional[str]:
 def get_timestamp(datetime: datetime) -> int:
     """ Get the UTC timestamp from a datetime object.
     """
-    return int(calendar.timegm(datetime.utctimetuple()))
+    return localization.to_timestamp(datetime)
 
 
 def get_crab(crab_ID: int) -> Optional['models.Crab']:
@@ -122,6 +123,24 @@ def get_molt_replies(molt_ID: int, since: Optional[int] = None,
     return query
 
 
+def get_molt_conversation(molt_ID: int, since: Optional[int] = None,
+                          since_id: Optional[int] = None) \
+        -> Optional[BaseQuery]:
+    """ Get every Molt in the conversation a Molt by ID is part of. Returns
+        None if there is no such Molt.
+    """
+    molt = models.Molt.query.filter_by(id=molt_ID, deleted=False).first()
+    if molt is None:
+        return None
+    query = molt.query_conversation() \
+        .order_by(models.Molt.timestamp.desc())
+    if since:
+        query = query.filter(models.Molt.timestamp > since)
+    if since_id:
+        query = query.filter(models.Molt.id > since_id)
+    return query
+
+
 def get_molts_mentioning(username: str, since: Optional[int] = None,
                          since_id: Optional[int] = None) \
         -> BaseQuery:
@@ -197,15 +216,18 @@ def get_timeline(crab: 'models.Crab', since: Optional[int] = None,
         -> BaseQuery:
     """ Get a Crab's timeline.
     """
-    following_ids = [following.id for following in crab.following]
-    query = models.Molt.query \
-            .filter_by(deleted=False, is_reply=False) \
-            .filter(models.Molt.author.has(banned=False, deleted=False)) \
-            .filter(or_(
-                models.Molt.author.has(models.Crab.id.in_(following_ids)),
-                models.Molt.author == crab
-            )) \
-            .order_by(models.Molt.timestamp.desc())
+    if TIMELINE_INBOX_ENABLED:
+        query = crab.query_timeline_inbox()
+    else:
+        following_ids = [following.id for following in crab.following]
+        query = models.Molt.query \
+                .filter_by(deleted=False, is_reply=False) \
+                .filter(models.Molt.author.has(banned=False, deleted=False)) \
+                .filter(or_(
+                    models.Molt.author.has(models.Crab.id.in_(following_ids)),
+                    models.Molt.author == crab
+                )) \
+                .order_by(models.Molt.timestamp.desc())
     if since:
         query = query.filter(models.Molt.timestamp > since)
     if since_id:
@@ -250,6 +272,7 @@ def molt_to_json(molt: 'models.Molt') -> dict:
         "edited": molt.edited,
         "quoted_molt": molt.original_molt_id if molt.is_quote else None,
         "replying_to": molt.original_molt_id if molt.is_reply else None,
+        "conversation": molt.conversation_id or molt.id,
         "image": molt.image,
         "likes": molt.like_count,
         "remolts": molt.remolt_count,
@@ -259,20 +282,41 @@ def molt_to_json(molt: 'models.Molt') -> dict:
     return molt_json
 
 
-def query_to_json(query: BaseQuery, limit: int = 100, offset: int = 0) \
-        -> dict:
+def query_to_json(query: BaseQuery, limit: int = 100, offset: int = 0,
+                  before: Optional[str] = None, after: Optional[str] = None,
+                  key: Optional[Tuple[Any, Any]] = None) -> dict:
     """ Serialize a list of objects into a JSON-compatible dict.
+
+        Passing a `before` or `after` cursor switches from offset pagination
+        to keyset pagination (see `pagination.paginate`), which skips the
+        `total` count. Molt listings include a `next_cursor` to continue from.
     """
-    total_items = query.count()
-    query = query.limit(limit).offset(offset)
-    query_json = {
-        "count": query.count(),
-        "limit": limit,
-        "offset": offset or 0,
-        "total": total_items
-    }
+    if before or after:
+        page = pagination.paginate(query, before, after, per_page=limit,
+                                   key=key)
+        items = page.items
+        query_json = {
+            "count": len(items),
+            "limit": limit,
+            "next_cursor": page.next_cursor if page.has_next else None,
+            "prev_cursor": page.prev_cursor if page.has_prev else None
+        }
+    else:
+        total_items = query.count()
+        items = query.limit(limit).offset(offset).all()
+        query_json = {
+            "count": len(items),
+            "limit": limit,
+            "offset": offset or 0,
+            "total": total_items
+        }
+        if items and isinstance(items[-1], (models.Molt, models.Bookmark)) \
+                and offset + len(items) < total_items:
+            query_json['next_cursor'] = pagination.encode_cursor(
+                items[-1].timestamp, items[-1].id
+            )
 
-    for item in query.all():
+    for item in items:
         if isinstance(item, models.Molt):
             molt_list = query_json.get('molts', list())
             molt_list.append(molt_to_json(item))
@@ -35,7 +35,9 @@ is_debug_server = getenv_bool('IS_DEBUG_SERVER', True)
 BASE_PATH = os.path.dirname(os.path.abspath(__file__))
 MOLT_CHAR_LIMIT: int = 280
 MOLTS_PER_PAGE: int = 20
+CRABS_PER_PAGE: int = 20
 NOTIFS_PER_PAGE: int = 20
+NEW_MOLTS_COUNT_LIMIT: int = 99  # New molt indicator shows e.g. '99+' past this
 MINUTES_EDITABLE: int = 5
 MUTED_WORDS_CHAR_LIMIT: int = 2048
 ADMINS: List[str] = load_lines_from_file("admins")  # Users allowed to access the Tortimer page
@@ -43,7 +45,7 @@ UPLOAD_FOLDER: str = os.path.join(BASE_PATH, 'static/img/user_uploads')
 ALLOWED_EXTENSIONS: Set[str] = {'png', 'jpg', 'jpeg'}
 RECOMMENDED_USERS: List[str] = load_lines_from_file("recommended_users")  # Users suggested on post-signup page
 BASE_URL = "http://localhost" if is_debug_server else "https://crabber.net"
-SERVER_START = round(datetime.datetime.utcnow().timestamp())  # Timestamp of when the server went up
+SERVER_START = round(datetime.datetime.now(datetime.timezone.utc).timestamp())  # Timestamp of when the server went up
 FEATURED_MOLT_ID = int(os.getenv('FEATURED_MOLT_ID') or '1')
 FEATURED_CRAB_USERNAME = os.getenv('FEATURED_CRAB_USERNAME', 'jake')
 BLACKLIST_IP = load_lines_from_file('blacklist-ip')
@@ -85,6 +87,87 @@ API_MAX_ACCESS_TOKENS = 5
 
 RSS_MOLT_LIMIT = 50
 
+# Read home timelines from the materialized `timeline_entry` inbox instead of
+# scanning all Molts by followed Crabs. Run `scripts/rebuild_timelines.py`
+# before enabling this on an existing database.
+TIMELINE_INBOX_ENABLED = getenv_bool('TIMELINE_INBOX_ENABLED', False)
+
+# Read the notifications page from the pre-aggregated `notification_group`
+# table instead of grouping all notifications on every load. Run
+# `scripts/rebuild_notification_groups.py` before enabling this on an
+# existing database.
+NOTIFICATION_GROUPS_ENABLED = getenv_bool('NOTIFICATION_GROUPS_ENABLED', False)
+
+# Search Molts with a full-text index (FTS5 on SQLite, an ngram FULLTEXT index
+# on MySQL) instead of scanning with LIKE. Run
+# `scripts/rebuild_search_index.py` to create the index before enabling this.
+FULLTEXT_SEARCH_ENABLED = getenv_bool('FULLTEXT_SEARCH_ENABLED', False)
+
+# Match muted words in Python with a compiled automaton per Crab instead of
+# adding an ILIKE clause per muted word to every feed query. Feeds fetch
+# `OVERFETCH` times a page at a time (up to `MAX_BATCHES` batches) so that
+# pages stay full after muted Molts are dropped.
+MUTED_WORDS_MATCHER_ENABLED = getenv_bool('MUTED_WORDS_MATCHER_ENABLED', False)
+MUTED_WORDS_MATCHER_CACHE_SIZE = int(
+    os.getenv('MUTED_WORDS_MATCHER_CACHE_SIZE') or 1024
+)
+MUTED_WORDS_OVERFETCH = int(os.getenv('MUTED_WORDS_OVERFETCH') or 2)
+MUTED_WORDS_MAX_BATCHES = int(os.getenv('MUTED_WORDS_MAX_BATCHES') or 5)
+
+# Rank trending Crabtags from hourly per-tag use counts (`crabtag_usage`)
+# kept up to date as Molts are posted, instead of grouping a week of
+# `crabtag_links` on every page render. Run `scripts/rebuild_trending.py`
+# before enabling this on an existing database. Either way, each process
+# reuses the trending list for `TRENDING_CACHE_TTL` seconds.
+TRENDING_COUNTERS_ENABLED = getenv_bool('TRENDING_COUNTERS_ENABLED', False)
+TRENDING_CACHE_TTL = int(os.getenv('TRENDING_CACHE_TTL') or 60)
+
+# Serve the stats page from a snapshot of its site-wide aggregates instead of
+# computing them on every request. Build snapshots on a schedule with
+# `scripts/build_stats_snapshot.py` (e.g. from cron, or with `--loop` to
+# rebuild every `STATS_SNAPSHOT_INTERVAL` seconds); one is built on demand if
+# none exists yet.
+STATS_SNAPSHOT_ENABLED = getenv_bool('STATS_SNAPSHOT_ENABLED', False)
+STATS_SNAPSHOT_INTERVAL = int(os.getenv('STATS_SNAPSHOT_INTERVAL') or 600)
+
+# Rendered Molt HTML cache. Entries are invalidated on edits, card fetches and
+# mentioned users' renames/bans; the TTL bounds staleness for changes made by
+# other processes. Set the size to 0 to disable. With a Redis URL set, renders
+# are also shared between workers (requires the `redis` package).
+RICH_CONTENT_CACHE_SIZE = int(os.getenv('RICH_CONTENT_CACHE_SIZE') or 4096)
+RICH_CONTENT_CACHE_TTL = int(os.getenv('RICH_CONTENT_CACHE_TTL') or 600)
+RICH_CONTENT_CACHE_REDIS_URL = os.getenv('RICH_CONTENT_CACHE_REDIS_URL')
+
+# Push new-Molt and notification events to browsers over server-sent events
+# (`/events/`) instead of having every tab poll every 10 seconds. Each open
+# stream holds a worker thread, so run with threaded/async workers (e.g.
+# `gunicorn --threads` or gevent). Events are delivered within the publishing
+# process unless a Redis URL is set to relay them between workers (requires
+# the `redis` package).
+EVENT_STREAM_ENABLED = getenv_bool('EVENT_STREAM_ENABLED', False)
+EVENT_STREAM_REDIS_URL = os.getenv('EVENT_STREAM_REDIS_URL')
+EVENT_STREAM_KEEPALIVE = int(os.getenv('EVENT_STREAM_KEEPALIVE') or 15)
+# Streams are closed after this many seconds (browsers reconnect on their own)
+EVENT_STREAM_TIMEOUT = int(os.getenv('EVENT_STREAM_TIMEOUT') or 300)
+
+# Log a warning when a main-site request queries the logged-in Crab again
+# after `utils.get_current_user` has loaded them, to catch code that bypasses
+# the per-request copy. On by default on debug servers.
+CURRENT_USER_QUERY_CHECK = getenv_bool('CURRENT_USER_QUERY_CHECK',
+                                       is_debug_server)
+
+# Stream long pages (thread replies, timeline content, RSS feeds) to the
+# browser as they render, sending about `STREAM_BUFFER_SIZE` characters at a
+# time. Thread replies are read from the database `STREAM_CHUNK_SIZE` Molts at
+# a time.
+STREAMING_ENABLED = getenv_bool('STREAMING_ENABLED', True)
+STREAM_BUFFER_SIZE = int(os.getenv('STREAM_BUFFER_SIZE') or 8192)
+STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE') or 20)
+
+# Add an `X-Template-Globals` header to responses listing, for each lazy
+# template global, how many times it was computed and read during the request.
+TEMPLATE_GLOBALS_TRACE = getenv_bool('TEMPLATE_GLOBALS_TRACE', False)
+
 HCAPTCHA_ENABLED = getenv_bool('HCAPTCHA_ENABLED', False)
 REGISTRATION_ENABLED = getenv_bool('REGISTRATION_ENABLED', True)
 
@@ -2,16 +2,23 @@ import calendar
 import config
 from crab_mail import CrabMail
 import datetime
-from flask import abort, Flask, jsonify, render_template, request, redirect, \
-    send_from_directory, session
+import events
+import localization
+from flask import abort, Flask, g, jsonify, render_template, request, \
+    redirect, Response, send_from_directory, session
 from flask_hcaptcha import hCaptcha
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 import models
 import os
+import pagination
 import patterns
-from typing import Iterable, Tuple, Union
+import preload
+import render_cache
+import time
+from typing import Any, Callable, Iterable, Tuple, Union
 import utils
+from werkzeug.local import LocalProxy
 from werkzeug.middleware.profiler import ProfilerMiddleware
 
 
@@ -116,38 +123,37 @@ def index():
 
     # Display page
     elif current_user is not None:
-        page_n = request.args.get('p', 1, type=int)
+        before, after = pagination.get_cursor_args()
+        page_cursor = pagination.cursor_query(before, after)
 
         if request.args.get('ajax_json'):
-            blocks = dict()
-            for block in ('title', 'heading', 'body'):
-                blocks[block] = render_template(
-                    f'timeline-ajax-{block}.html',
-                    current_page="home",
-                    page_n=page_n,
-                    current_user=current_user
-                )
-            return jsonify(blocks)
+            return jsonify(utils.render_blocks(
+                'timeline.html',
+                current_page="home",
+                page_cursor=page_cursor,
+                current_user=current_user
+            ))
         else:
             if request.args.get('ajax_content'):
-                import time
-                start_time = time.time()
-                molts = current_user \
-                    .query_timeline() \
-                    .paginate(page_n, config.MOLTS_PER_PAGE, False)
+                molts = pagination.paginate(
+                    current_user.query_timeline(), before, after,
+                    key=models.Crab.timeline_sort_key(),
+                    exclude=current_user.muted_molt_filter
+                )
 
-                return render_template(
+                return utils.stream_template(
                     'timeline-content.html',
                     current_page='home',
-                    page_n=page_n,
+                    page_cursor=page_cursor,
                     molts=molts,
+                    preloaded=preload.PreloadedPage(molts.items, current_user),
                     current_user=current_user
                 )
             else:
                 return render_template(
                     'timeline.html',
                     current_page='home',
-                    page_n=page_n,
+                    page_cursor=page_cursor,
                     current_user=utils.get_current_user()
                 )
     else:
@@ -178,30 +184,32 @@ def wild_west():
 
     # Display page
     elif current_user is not None:
-        page_n = request.args.get('p', 1, type=int)
+        before, after = pagination.get_cursor_args()
+        page_cursor = pagination.cursor_query(before, after)
         # Ajax page switching
         if request.args.get('ajax_json'):
-            blocks = dict()
-            for block in ('title', 'heading', 'body'):
-                blocks[block] = render_template(
-                    f'wild-west-ajax-{block}.html',
-                    current_page="wild-west",
-                    page_n=page_n,
-                    current_user=utils.get_current_user()
-                )
-            return jsonify(blocks)
+            return jsonify(utils.render_blocks(
+                'wild-west.html',
+                current_page="wild-west",
+                page_cursor=page_cursor,
+                current_user=utils.get_current_user()
+            ))
         else:
             # Ajax content loading
             if request.args.get('ajax_content'):
                 molts = models.Molt.query_all(include_replies=False,
                                               include_quotes=False)
-                molts = utils.get_current_user().filter_molt_query(molts)
-                molts = molts.paginate(page_n, config.MOLTS_PER_PAGE, False)
-                return render_template(
+                molts = current_user.filter_molt_query(molts)
+                molts = pagination.paginate(
+                    molts, before, after,
+                    exclude=current_user.muted_molt_filter
+                )
+                return utils.stream_template(
                     'wild-west-content.html',
                     current_page='wild-west',
-                    page_n=page_n,
+                    page_cursor=page_cursor,
                     molts=molts,
+                    preloaded=preload.PreloadedPage(molts.items, current_user),
                     current_user=current_user
                 )
             # Page skeleton
@@ -209,7 +217,7 @@ def wild_west():
                 return render_template(
                     'wild-west.html',
                     current_page='wild-west',
-                    page_n=page_n,
+                    page_cursor=page_cursor,
                     current_user=current_user
                 )
     else:
@@ -228,15 +236,12 @@ def notifications():
         notifications = utils.get_current_user() \
             .get_notifications(paginated=True, page=page_n)
         if request.args.get('ajax_json'):
-            blocks = dict()
-            for block in ('title', 'heading', 'body'):
-                blocks[block] = render_template(
-                    f'notifications-ajax-{block}.html',
-                    current_page="notifications",
-                    notifications=notifications,
-                    current_user=utils.get_current_user()
-                )
-            return jsonify(blocks)
+            return jsonify(utils.render_blocks(
+                'notifications.html',
+                current_page="notifications",
+                notifications=notifications,
+                current_user=utils.get_current_user()
+            ))
         else:
             return render_template(
                 'notifications.html',
@@ -512,10 +517,12 @@ def settings():
             dyslexic_mode = request.form.get('dyslexic_mode') == 'on'
             comicsans_mode = request.form.get('comicsans_mode') == 'on'
 
-            current_user.set_preference('spooky_mode', spooky_mode)
-            current_user.set_preference('light_mode', light_mode)
-            current_user.set_preference('dyslexic_mode', dyslexic_mode)
-            current_user.set_preference('comicsans_mode', comicsans_mode)
+            current_user.set_preferences(dict(
+                spooky_mode=spooky_mode,
+                light_mode=light_mode,
+                dyslexic_mode=dyslexic_mode,
+                comicsans_mode=comicsans_mode
+            ))
             return 'Saved preferences.', 200
         # Everything else
         else:
@@ -524,19 +531,18 @@ def settings():
     # Display page
     elif session.get('current_user') is not None:
         if request.args.get('ajax_json'):
-            blocks = dict()
-            for block in ('title', 'heading', 'body'):
-                blocks[block] = render_template(
-                    f'settings-ajax-{block}.html',
-                    current_page='settings',
-                    current_user=utils.get_current_user()
-                )
-            return jsonify(blocks)
+            return jsonify(utils.render_blocks(
+                'settings.html',
+                current_page='settings',
+                current_user=utils.get_current_user(),
+                region_timezones=localization.REGION_TIMEZONES
+            ))
         else:
             return render_template(
                 'settings.html',
                 current_page='settings',
-                current_user=utils.get_current_user()
+                current_user=utils.get_current_user(),
+                region_timezones=localization.REGION_TIMEZONES
             )
     else:
         return redirect("/login")
@@ -558,7 +564,7 @@ def user(username):
         # Check if blocked (if logged in)
         current_user_is_blocked = False
         if current_user and this_user:
-            current_user_is_blocked = this_user.is_blocking(current_user)
+            current_user_is_blocked = current_user.is_blocked_by(this_user)
 
         if this_user is None or current_user_is_blocked:
             return render_template(
@@ -568,47 +574,48 @@ def user(username):
             )
         else:
             social_title = f'{this_user.display_name} on Crabber'
-            m_page_n = request.args.get('molts-p', 1, type=int)
-            r_page_n = request.args.get('replies-p', 1, type=int)
-            l_page_n = request.args.get('likes-p', 1, type=int)
+            cursors = {section: pagination.get_cursor_args(f'{section}-')
+                       for section in ('molts', 'replies', 'likes')}
 
             if request.args.get('ajax_json'):
-                blocks = dict()
-                for block in ('title', 'heading', 'body'):
-                    blocks[block] = render_template(
-                        f'profile-ajax-{block}.html',
-                        current_page=(
-                            'own-profile' if this_user == current_user else ''
-                        ),
-                        current_user=current_user,
-                        this_user=this_user,
-                        current_tab=current_tab,
-                    )
-                return jsonify(blocks)
+                return jsonify(utils.render_blocks(
+                    'profile.html',
+                    current_page=(
+                        'own-profile' if this_user == current_user else ''
+                    ),
+                    current_user=current_user,
+                    this_user=this_user,
+                    current_tab=current_tab,
+                ))
             elif request.args.get('ajax_section'):
                 section = request.args.get('ajax_section')
                 hex_ID = request.args.get('hex_ID')
 
                 molts = replies = likes = None
+                exclude = current_user.muted_molt_filter \
+                    if current_user else None
 
                 if section == 'molts':
                     molts = this_user.query_molts() \
                         .filter_by(is_reply=False)
                     if current_user:
                         molts = current_user.filter_molt_query(molts)
-                    molts = molts.paginate(m_page_n, config.MOLTS_PER_PAGE,
-                                           False)
+                    molts = pagination.paginate(molts, *cursors['molts'],
+                                                exclude=exclude)
                 elif section == 'replies':
                     replies = this_user.query_replies()
                     if current_user:
                         replies = current_user.filter_molt_query(replies)
-                    replies = replies.paginate(r_page_n, config.MOLTS_PER_PAGE,
-                                               False)
+                    replies = pagination.paginate(replies,
+                                                  *cursors['replies'],
+                                                  exclude=exclude)
                 elif section == 'likes':
                     likes = this_user.query_likes()
                     if current_user:
                         likes = current_user.filter_molt_query(likes)
-                    likes = likes.paginate(l_page_n, config.MOLTS_PER_PAGE)
+                    likes = pagination.paginate(likes, *cursors['likes'],
+                                                exclude=exclude)
+                page = molts or replies or likes
                 return render_template(
                     f'profile-ajax-tab-{section}.html',
                     current_page=(
@@ -620,6 +627,12 @@ def user(username):
                     likes=likes,
                     current_tab=current_tab,
                     replies=replies,
+                    preloaded=preload.PreloadedPage(
+                        page.items if page else (), current_user,
+                        # Molts show their authors' reply chains
+                        replies_from='author' if molts else None,
+                        depth_limit=3
+                    ),
                     hexID=hex_ID
                 )
             else:
@@ -629,8 +642,13 @@ def user(username):
                         'own-profile' if this_user == current_user else ''
                     ),
                     current_user=current_user, this_user=this_user,
-                    current_tab=current_tab, m_page_n=m_page_n,
-                    r_page_n=r_page_n, l_page_n=l_page_n,
+                    current_tab=current_tab,
+                    molts_cursor=pagination.cursor_query(
+                        *cursors['molts'], prefix='molts-'),
+                    replies_cursor=pagination.cursor_query(
+                        *cursors['replies'], prefix='replies-'),
+                    likes_cursor=pagination.cursor_query(
+                        *cursors['likes'], prefix='likes-'),
                     social_title=social_title
                 )
 
@@ -694,8 +712,7 @@ def molt_page(username, molt_id):
         # Check if blocked (if logged in)
         is_blocked = False
         if current_user and primary_molt:
-            is_blocked = primary_molt.author.is_blocking(current_user) \
-                or primary_molt.author.is_blocked_by(current_user)
+            is_blocked = primary_molt.author_id in current_user.block_ids
 
         if primary_molt is None \
            or is_blocked \
@@ -716,14 +733,35 @@ def molt_page(username, molt_id):
         else:
             social_title = (f'{primary_molt.author.display_name}\'s post on '
                             'Crabber')
-            replies = primary_molt.query_replies()
-            if current_user:
-                replies = current_user.filter_molt_query(replies)
+            # Replies are only rendered by the ajax_content request, which
+            # streams them as they're read and rendered
+            if ajax_content:
+                replies = primary_molt.query_replies()
+                if current_user:
+                    replies = current_user.filter_molt_query(replies)
+                replies = preload.StreamedPage(
+                    pagination.chunks(replies, config.STREAM_CHUNK_SIZE),
+                    current_user, items=[primary_molt],
+                    exclude=current_user.muted_molt_filter
+                    if current_user else None,
+                    replies_from=primary_molt.author_id
+                )
+                return utils.stream_template(
+                    'molt-page-replies.html',
+                    current_page="molt-page",
+                    molt=primary_molt,
+                    replies=replies,
+                    preloaded=replies,
+                    current_user=current_user,
+                    social_title=social_title
+                )
             return render_template(
-                'molt-page-replies.html' if ajax_content else 'molt-page.html',
+                'molt-page.html',
                 current_page="molt-page",
                 molt=primary_molt,
-                replies=replies,
+                replies=list(),
+                preloaded=preload.PreloadedPage([primary_molt],
+                                                current_user),
                 current_user=utils.get_current_user(),
                 social_title=social_title
             )
@@ -757,28 +795,31 @@ def crabtags(crabtag):
 
     # Display page
     elif session.get('current_user') is not None:
-        page_n = request.args.get('p', 1, type=int)
+        before, after = pagination.get_cursor_args()
+        page_cursor = pagination.cursor_query(before, after)
         if request.args.get('ajax_json'):
-            blocks = dict()
-            for block in ('title', 'heading', 'body'):
-                blocks[block] = render_template(
-                    f'crabtag-ajax-{block}.html',
-                    current_page='crabtag',
-                    crabtag=crabtag,
-                    page_n=page_n,
-                    current_user=utils.get_current_user()
-                )
-            return jsonify(blocks)
+            return jsonify(utils.render_blocks(
+                'crabtag.html',
+                current_page='crabtag',
+                crabtag=crabtag,
+                page_cursor=page_cursor,
+                current_user=utils.get_current_user()
+            ))
         else:
             molts = models.Molt.query_with_tag(crabtag)
             molts = utils.get_current_user().filter_molt_query(molts)
-            molts = molts.paginate(page_n, config.MOLTS_PER_PAGE, False)
+            molts = pagination.paginate(
+                molts, before, after,
+                exclude=utils.get_current_user().muted_molt_filter
+            )
             return render_template(
                 ('crabtag-content.html' if request.args.get('ajax_content')
                  else 'crabtag.html'),
                 current_page='crabtag',
-                page_n=page_n,
+                page_cursor=page_cursor,
                 molts=molts,
+                preloaded=preload.PreloadedPage(molts.items,
+                                                utils.get_current_user()),
                 current_user=utils.get_current_user(),
                 crabtag=crabtag
             )
@@ -795,27 +836,30 @@ def bookmarks():
     # Display page
     elif session.get('current_user') is not None:
         current_user = utils.get_current_user()
-        page_n = request.args.get('p', 1, type=int)
+        before, after = pagination.get_cursor_args()
+        page_cursor = pagination.cursor_query(before, after)
         bookmarks = current_user.query_bookmarks()
         bookmarks = utils.get_current_user().filter_molt_query(bookmarks)
-        bookmarks = bookmarks.paginate(page_n, config.MOLTS_PER_PAGE, False)
+        bookmarks = pagination.paginate(
+            bookmarks, before, after,
+            key=(models.Bookmark.timestamp, models.Bookmark.id),
+            exclude=current_user.muted_molt_filter
+        )
         if request.args.get('ajax_json'):
-            blocks = dict()
-            for block in ('title', 'heading', 'body'):
-                blocks[block] = render_template(
-                    f'bookmarks-ajax-{block}.html',
-                    current_page='bookmarks',
-                    page_n=page_n, bookmarks=bookmarks,
-                    current_user=utils.get_current_user()
-                )
-            return jsonify(blocks)
+            return jsonify(utils.render_blocks(
+                'bookmarks.html',
+                current_page='bookmarks',
+                page_cursor=page_cursor, bookmarks=bookmarks,
+                current_user=utils.get_current_user()
+            ))
         else:
             return render_template(
                 'bookmarks-content.html' if request.args.get('ajax_content')
                 else 'bookmarks.html',
                 current_page='bookmarks',
-                page_n=page_n,
+                page_cursor=page_cursor,
                 bookmarks=bookmarks,
+                preloaded=preload.PreloadedPage(bookmarks.items, current_user),
                 current_user=utils.get_current_user()
             )
     else:
@@ -831,41 +875,69 @@ def search():
     # Display page
     elif session.get('current_user') is not None:
         query = request.args.get('q')
-        page_n = request.args.get('p', 1, type=int)
+        # Best match first needs the full-text index; otherwise newest first
+        order = 'relevance' if config.FULLTEXT_SEARCH_ENABLED \
+            and request.args.get('order') == 'relevance' else 'recent'
+        before, after = pagination.get_cursor_args()
+        page_cursor = pagination.cursor_query(before, after)
+        crabs_before, crabs_after = pagination.get_cursor_args('crabs-')
+        # Crab results were paged, so show that tab
+        crabs_tab = 'crabs-before' in request.args \
+            or 'crabs-after' in request.args
         ajax_content = request.args.get('ajax_content')
 
         if request.args.get('ajax_json'):
-            blocks = dict()
-            for block in ('title', 'heading', 'body'):
-                blocks[block] = render_template(
-                    f'search-ajax-{block}.html',
-                    current_page="search",
-                    query=query,
-                    page_n=page_n,
-                    current_user=utils.get_current_user()
-                )
-            return jsonify(blocks)
+            return jsonify(utils.render_blocks(
+                'search.html',
+                current_page="search",
+                query=query,
+                order=order,
+                fulltext_search=config.FULLTEXT_SEARCH_ENABLED,
+                page_cursor=page_cursor,
+                current_user=utils.get_current_user()
+            ))
         else:
             if query:
                 crab_results = models.Crab.search(query)
                 crab_results = utils.get_current_user() \
                     .filter_user_query_by_not_blocked(crab_results)
-                molt_results = models.Molt.search(query)
+                crab_results = pagination.paginate(
+                    crab_results, crabs_before, crabs_after,
+                    per_page=config.CRABS_PER_PAGE,
+                    key=models.Crab.follower_sort_key()
+                )
+                molt_results = models.Molt.search(query, order)
                 molt_results = utils.get_current_user() \
                     .filter_molt_query(molt_results)
-                molt_results = molt_results.paginate(
-                    page_n, config.MOLTS_PER_PAGE, False)
+                if order == 'relevance':
+                    # Relevance isn't a seekable key, so page by offset
+                    molt_results = pagination.paginate_ranked(
+                        molt_results, before, after,
+                        exclude=utils.get_current_user().muted_molt_filter
+                    )
+                else:
+                    molt_results = pagination.paginate(
+                        molt_results, before, after,
+                        exclude=utils.get_current_user().muted_molt_filter
+                    )
+                preloaded = preload.PreloadedPage(molt_results.items,
+                                                  utils.get_current_user())
             else:
                 molt_results = tuple()
                 crab_results = tuple()
+                preloaded = None
 
             return render_template(
                 'search-results.html' if ajax_content else 'search.html',
                 current_page="search",
                 query=query,
-                page_n=page_n,
+                order=order,
+                fulltext_search=config.FULLTEXT_SEARCH_ENABLED,
+                page_cursor=page_cursor,
                 molt_results=molt_results,
                 crab_results=crab_results,
+                crabs_tab=crabs_tab,
+                preloaded=preloaded,
                 current_user=utils.get_current_user()
             )
     else:
@@ -880,72 +952,88 @@ def stats():
 
     current_user = utils.get_current_user()
 
-    # Query follow counts for users
-    most_followed = models.Crab.query_most_popular()
-    newest_user = models.Crab.query_all() \
-        .order_by(models.Crab.register_time.desc())
-
-    if current_user:
-        most_followed = current_user \
-            .filter_user_query_by_not_blocked(most_followed)
-        newest_user = current_user \
-            .filter_user_query_by_not_blocked(newest_user)
-
-    newest_user = newest_user.first()
-    most_followed = most_followed.first()
+    if config.STATS_SNAPSHOT_ENABLED:
+        snapshot = models.StatsSnapshot.get_latest()
+        if snapshot is None:
+            snapshot = models.StatsSnapshot.build()
+            models.db.session.commit()
+        stats_dict = snapshot.get_stats(current_user)
+    else:
+        # Query follow counts for users
+        most_followed = models.Crab.query_most_popular()
+        newest_user = models.Crab.query_all() \
+            .order_by(models.Crab.register_time.desc())
 
-    best_molt = models.Molt.query_most_liked()
-    talked_molt = models.Molt.query_most_replied()
+        if current_user:
+            most_followed = current_user \
+                .filter_user_query_by_not_blocked(most_followed)
+            newest_user = current_user \
+                .filter_user_query_by_not_blocked(newest_user)
 
-    if current_user:
-        best_molt = current_user.filter_molt_query(best_molt)
-        talked_molt = current_user.filter_molt_query(talked_molt)
+        newest_user = newest_user.first()
+        most_followed = most_followed.first()
 
-    best_molt = best_molt.first()
-    talked_molt = talked_molt.first()
+        best_molt = models.Molt.query_most_liked()
+        talked_molt = models.Molt.query_most_replied()
 
-    trendy_tag = (models.Crabtag.query_most_popular().first() or (None,))[0]
-    if trendy_tag:
-        trendy_tag_molts = models.Molt.order_query_by_likes(
-            trendy_tag.query_molts())
         if current_user:
-            trendy_tag_molts = current_user \
-                .filter_molt_query(trendy_tag_molts)
-        trendy_tag_molts = trendy_tag_molts.limit(3).all()
-    else:
-        trendy_tag_molts = list()
-
-    stats_dict = dict(
-        users=models.Crab.query.filter_by(deleted=False, banned=False).count(),
-        mini_stats=[
-            dict(number=models.Molt.query.count(),
-                 label="molts sent"),
-            dict(number=models.Molt.query.filter_by(deleted=True).count(),
-                 label="molts deleted",
-                 sublabel="what are they hiding?"),
-            dict(number=models.Like.query.count(),
-                 label="likes given"),
-            dict(number=models.TrophyCase.query.count(),
-                 label="trophies awarded")
-        ],
-        crab_king=most_followed,
-        baby_crab=newest_user,
-        best_molt=best_molt,
-        talked_molt=talked_molt,
-        trendy_tag=trendy_tag,
-        trendy_tag_molts=trendy_tag_molts
-    )
+            best_molt = current_user.filter_molt_query(best_molt)
+            talked_molt = current_user.filter_molt_query(talked_molt)
+            best_molt = next(iter(current_user.fetch_molts(best_molt, 1)),
+                             None)
+            talked_molt = next(
+                iter(current_user.fetch_molts(talked_molt, 1)), None
+            )
+        else:
+            best_molt = best_molt.first()
+            talked_molt = talked_molt.first()
+
+        trendy_tag = (models.Crabtag.query_most_popular().first()
+                      or (None,))[0]
+        if trendy_tag:
+            trendy_tag_molts = models.Molt.order_query_by_likes(
+                trendy_tag.query_molts())
+            if current_user:
+                trendy_tag_molts = current_user \
+                    .filter_molt_query(trendy_tag_molts)
+                trendy_tag_molts = current_user.fetch_molts(
+                    trendy_tag_molts, 3
+                )
+            else:
+                trendy_tag_molts = trendy_tag_molts.limit(3).all()
+        else:
+            trendy_tag_molts = list()
+
+        stats_dict = dict(
+            users=models.Crab.query.filter_by(deleted=False,
+                                              banned=False).count(),
+            mini_stats=[
+                dict(number=models.Molt.query.count(),
+                     label="molts sent"),
+                dict(number=models.Molt.query.filter_by(deleted=True)
+                     .count(),
+                     label="molts deleted",
+                     sublabel="what are they hiding?"),
+                dict(number=models.Like.query.count(),
+                     label="likes given"),
+                dict(number=models.TrophyCase.query.count(),
+                     label="trophies awarded")
+            ],
+            crab_king=most_followed,
+            baby_crab=newest_user,
+            best_molt=best_molt,
+            talked_molt=talked_molt,
+            trendy_tag=trendy_tag,
+            trendy_tag_molts=trendy_tag_molts
+        )
 
     if request.args.get('ajax_json'):
-        blocks = dict()
-        for block in ('title', 'heading', 'body'):
-            blocks[block] = render_template(
-                f'stats-ajax-{block}.html',
-                current_user=current_user,
-                stats=stats_dict,
-                current_page='stats'
-            )
-        return jsonify(blocks)
+        return jsonify(utils.render_blocks(
+            'stats.html',
+            current_user=current_user,
+            stats=stats_dict,
+            current_page='stats'
+        ))
     else:
         return render_template(
             'stats.html',
@@ -1042,12 +1130,73 @@ def ajax_request(request_type):
                 crab = models.Crab.get_by_ID(id=request.args.get("crab_id"))
                 new_molts = crab.query_timeline() \
                     .filter(models.Molt.timestamp > timestamp)
-                return str(new_molts.count())
+                # Count one past the limit to know whether there are more
+                limit = config.NEW_MOLTS_COUNT_LIMIT
+                if crab.muted_molt_filter is None:
+                    count = new_molts.limit(limit + 1).count()
+                else:
+                    # Muted words are matched in Python, so count what's left
+                    count = len(crab.fetch_molts(new_molts, limit + 1))
+                return f'{limit}+' if count > limit else str(count)
 
             else:
                 return "Crab not found. Did you specify 'crab_id'?"
 
         return "Did not specify 'timestamp'"
+    if request_type == "rich_content_cache":
+        # Cache counters are for admins (see admins.cfg) and debugging only
+        current_user = utils.get_current_user()
+        if not config.is_debug_server and not (
+                current_user and current_user.username in config.ADMINS):
+            return abort(403)
+        return jsonify(render_cache.rich_content.stats())
+
+
+@app.route("/events/")
+def event_stream():
+    """ Server-sent events stream for the current user: `unread_notif` events
+        with their unread notification count and, with `timeline=1`, a
+        `molt` event for each new Molt on their home timeline.
+    """
+    if not config.EVENT_STREAM_ENABLED:
+        return abort(404)
+    current_user = utils.get_current_user()
+    if current_user is None:
+        return abort(401)
+
+    channels = [events.crab_channel(current_user.id)]
+    if request.args.get('timeline'):
+        channels.append(events.author_channel(current_user.id))
+        channels.extend(events.author_channel(crab_id)
+                        for crab_id in current_user.following_ids)
+    subscription = events.broker.subscribe(channels)
+    unread_count = current_user.unread_notifications
+    is_shown = current_user.timeline_event_filter()
+    # Don't hold a database connection for the life of the stream
+    models.db.session.remove()
+
+    def stream():
+        with subscription:
+            yield 'retry: 5000\n'
+            yield events.format_event('unread_notif', {'count': unread_count})
+            closes_at = time.monotonic() + config.EVENT_STREAM_TIMEOUT
+            while time.monotonic() < closes_at:
+                event = subscription.get(timeout=config.EVENT_STREAM_KEEPALIVE)
+                if event is None:
+                    yield ': keepalive\n\n'
+                elif event[0] == 'molt':
+                    # Only count Molts a refresh would show
+                    molt = event[1]
+                    if is_shown(molt):
+                        yield events.format_event('molt', {
+                            'id': molt['id'], 'author_id': molt['author_id']
+                        })
+                else:
+                    yield events.format_event(*event)
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache',
+                             'X-Accel-Buffering': 'no'})
 
 
 @app.route("/api/v0/<action>/", methods=('GET', 'POST'))
@@ -1055,17 +1204,31 @@ def api_v0(_action):
     return 'Deprecated.'
 
 
+def lazy_global(name: str, function: Callable[[], Any]) -> LocalProxy:
+    """ Returns a template global that is computed at most once per request,
+        the first time a template uses it.
+    """
+    def evaluate():
+        values = g.setdefault('template_globals', dict())
+        trace = g.setdefault('template_globals_trace', dict())
+        evaluations, reads = trace.get(name, (0, 0))
+        if name not in values:
+            values[name] = function()
+            evaluations += 1
+        trace[name] = (evaluations, reads + 1)
+        return values[name]
+    return LocalProxy(evaluate)
+
+
+def get_current_preferences() -> models.Preferences:
+    current_user = utils.get_current_user()
+    return current_user.preferences if current_user \
+        else models.Preferences()
+
+
 # GLOBAL FLASK TEMPLATE VARIABLES GO HERE
 @app.context_processor
 def inject_global_vars():
-    current_user = utils.get_current_user()
-    if current_user:
-        spooky_mode = current_user.get_preference('spooky_mode', False)
-        light_mode = current_user.get_preference('light_mode', False)
-        dyslexic_mode = current_user.get_preference('dyslexic_mode', False)
-        comicsans_mode = current_user.get_preference('comicsans_mode', False)
-    else:
-        spooky_mode = light_mode = dyslexic_mode = comicsans_mode = False
     error = request.args.get("error")
     msg = request.args.get("msg")
     location = request.path
@@ -1077,17 +1240,28 @@ def inject_global_vars():
         BASE_URL=config.BASE_URL,
         TIMESTAMP=round(calendar.timegm(now.utctimetuple())),
         IS_WINDOWS=os.name == "nt",
-        localize=utils.localize,
+        localize=localization.localize,
         server_start=config.SERVER_START,
-        current_year=now.utcnow().year,
+        current_year=now.year,
         error=error, msg=msg, location=location,
         uuid=utils.hexID, referrer=request.referrer,
-        spooky_mode=spooky_mode,
-        light_mode=light_mode,
-        dyslexic_mode=dyslexic_mode,
-        comicsans_mode=comicsans_mode,
-        trending_crabtags=models.Crabtag.get_trending(),
+        spooky_mode=lazy_global(
+            'spooky_mode', lambda: get_current_preferences().spooky_mode
+        ),
+        light_mode=lazy_global(
+            'light_mode', lambda: get_current_preferences().light_mode
+        ),
+        dyslexic_mode=lazy_global(
+            'dyslexic_mode', lambda: get_current_preferences().dyslexic_mode
+        ),
+        comicsans_mode=lazy_global(
+            'comicsans_mode', lambda: get_current_preferences().comicsans_mode
+        ),
+        trending_crabtags=lazy_global(
+            'trending_crabtags', models.Crabtag.get_trending
+        ),
         is_debug_server=config.is_debug_server,
+        event_stream_enabled=config.EVENT_STREAM_ENABLED,
     )
 
 
@@ -1122,13 +1296,13 @@ def pretty_url(url, length=35):
 @app.template_filter()
 def pretty_age(time: Union[datetime.datetime, int]):
     """ Converts datetime to pretty twitter-esque age string. (Wrapper for
-        `utils.get_pretty_age`.
-        :param time:
+        `localization.pretty_age`.
+        :param time: UTC datetime or Unix timestamp
         :return: Age string
     """
     if isinstance(time, int):
-        time: datetime.datetime = datetime.datetime.fromtimestamp(time)
-    return utils.get_pretty_age(time)
+        time: datetime.datetime = localization.from_timestamp(time)
+    return localization.pretty_age(time)
 
 
 @app.template_filter()
@@ -1172,7 +1346,7 @@ def before_request():
     # Make sure cookies are still valid
     if session.get('current_user'):
         crab_id = session.get('current_user')
-        if not models.Crab.get_by_ID(id=crab_id):
+        if not utils.get_current_user():
             # Force logout
             session['current_user'] = None
 
@@ -1187,6 +1361,19 @@ def before_request():
     session.permanent = True
 
 
+@app.after_request
+def after_request(response):
+    # Write preferences changed during the request in one commit
+    models.Crab.commit_preferences()
+    if config.TEMPLATE_GLOBALS_TRACE and 'template_globals_trace' in g:
+        # How many times each lazy template global was computed/read
+        response.headers['X-Template-Globals'] = ', '.join(
+            f'{name}={evaluations}/{reads}' for name, (evaluations, reads)
+            in g.template_globals_trace.items()
+        )
+    return response
+
+
 if __name__ == '__main__':
     # Start server locally.
     # If using WSGI this will not be run.
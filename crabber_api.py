@@ -169,6 +169,8 @@ def get_crab_bookmarks(crab_ID):
                                  minimum=0, maximum=API_MAX_CRAB_LIMIT)
     offset = request.args.get('offset')
     offset = api_utils.expect_int(offset, default=0, minimum=0)
+    before = request.args.get('before')
+    after = request.args.get('after')
 
     crab = api_utils.get_crab(crab_ID)
     if crab:
@@ -176,7 +178,11 @@ def get_crab_bookmarks(crab_ID):
         if auth:
             if crab.id == auth['crab_id']:
                 bookmarks = crab.query_bookmarks()
-                bookmarks_json = api_utils.query_to_json(bookmarks)
+                bookmarks_json = api_utils.query_to_json(
+                    bookmarks, limit=limit, offset=offset, before=before,
+                    after=after,
+                    key=(models.Bookmark.timestamp, models.Bookmark.id)
+                )
                 return bookmarks_json
             else:
                 return abort(401, description='These bookmarks do not ' \
@@ -214,12 +220,15 @@ def get_crab_molts(crab_ID):
     offset = api_utils.expect_int(offset, default=0, minimum=0)
     since = api_utils.expect_timestamp(request.args.get('since'))
     since_id = request.args.get('since_id')
+    before = request.args.get('before')
+    after = request.args.get('after')
 
     crab = api_utils.get_crab(crab_ID)
     if crab:
         molts = api_utils.get_molts_from_crab(crab, since=since,
                                               since_id=since_id)
-        molts_json = api_utils.query_to_json(molts, limit=limit, offset=offset)
+        molts_json = api_utils.query_to_json(molts, limit=limit, offset=offset,
+                                             before=before, after=after)
         return molts_json
     else:
         return abort(404, description='No Crab with that ID.')
@@ -566,10 +575,14 @@ def get_molt_replies(molt_ID):
     offset = api_utils.expect_int(offset, default=0, minimum=0)
     since = api_utils.expect_timestamp(request.args.get('since'))
     since_id = request.args.get('since_id')
+    before = request.args.get('before')
+    after = request.args.get('after')
 
     replies = api_utils.get_molt_replies(molt_ID, since=since,
                                          since_id=since_id)
-    replies_json = api_utils.query_to_json(replies, limit=limit, offset=offset)
+    replies_json = api_utils.query_to_json(replies, limit=limit,
+                                           offset=offset, before=before,
+                                           after=after)
     return replies_json
 
 
@@ -582,13 +595,38 @@ def get_molt_quotes(molt_ID):
     offset = api_utils.expect_int(offset, default=0, minimum=0)
     since = api_utils.expect_timestamp(request.args.get('since'))
     since_id = request.args.get('since_id')
+    before = request.args.get('before')
+    after = request.args.get('after')
 
     quotes = api_utils.get_molt_quotes(molt_ID, since=since,
                                        since_id=since_id)
-    quotes_json = api_utils.query_to_json(quotes, limit=limit, offset=offset)
+    quotes_json = api_utils.query_to_json(quotes, limit=limit,
+                                          offset=offset, before=before,
+                                          after=after)
     return quotes_json
 
 
+@API.route('/molts/<molt_ID>/conversation/')
+def get_molt_conversation(molt_ID):
+    limit = request.args.get('limit')
+    limit = api_utils.expect_int(limit, default=API_DEFAULT_MOLT_LIMIT,
+                                 minimum=0, maximum=API_MAX_MOLT_LIMIT)
+    offset = request.args.get('offset')
+    offset = api_utils.expect_int(offset, default=0, minimum=0)
+    since = api_utils.expect_timestamp(request.args.get('since'))
+    since_id = request.args.get('since_id')
+    before = request.args.get('before')
+    after = request.args.get('after')
+
+    molts = api_utils.get_molt_conversation(molt_ID, since=since,
+                                            since_id=since_id)
+    if molts is None:
+        return abort(404, description='No Molt with that ID.')
+    molts_json = api_utils.query_to_json(molts, limit=limit, offset=offset,
+                                         before=before, after=after)
+    return molts_json
+
+
 
 @API.route('/molts/mentioning/<username>/')
 def get_molts_mentioning(username):
@@ -599,10 +637,13 @@ def get_molts_mentioning(username):
     offset = api_utils.expect_int(offset, default=0, minimum=0)
     since = api_utils.expect_timestamp(request.args.get('since'))
     since_id = request.args.get('since_id')
+    before = request.args.get('before')
+    after = request.args.get('after')
 
     molts = api_utils.get_molts_mentioning(username, since=since,
                                            since_id=since_id)
-    molts_json = api_utils.query_to_json(molts, limit=limit, offset=offset)
+    molts_json = api_utils.query_to_json(molts, limit=limit, offset=offset,
+                                         before=before, after=after)
     return molts_json
 
 
@@ -615,10 +656,13 @@ def get_molts_replying(username):
     offset = api_utils.expect_int(offset, default=0, minimum=0)
     since = api_utils.expect_timestamp(request.args.get('since'))
     since_id = request.args.get('since_id')
+    before = request.args.get('before')
+    after = request.args.get('after')
 
     molts = api_utils.get_molts_replying_to(username, since=since,
                                             since_id=since_id)
-    molts_json = api_utils.query_to_json(molts, limit=limit, offset=offset)
+    molts_json = api_utils.query_to_json(molts, limit=limit, offset=offset,
+                                         before=before, after=after)
     return molts_json
 
 
@@ -631,10 +675,13 @@ def get_crabtag(crabtag):
     offset = api_utils.expect_int(offset, default=0, minimum=0)
     since = api_utils.expect_timestamp(request.args.get('since'))
     since_id = request.args.get('since_id')
+    before = request.args.get('before')
+    after = request.args.get('after')
 
     molts = api_utils.get_molts_with_tag(crabtag, since=since,
                                          since_id=since_id)
-    molts_json = api_utils.query_to_json(molts, limit=limit, offset=offset)
+    molts_json = api_utils.query_to_json(molts, limit=limit, offset=offset,
+                                         before=before, after=after)
     return molts_json
 
 
@@ -647,12 +694,16 @@ def get_timeline(username):
     offset = api_utils.expect_int(offset, default=0, minimum=0)
     since = api_utils.expect_timestamp(request.args.get('since'))
     since_id = request.args.get('since_id')
+    before = request.args.get('before')
+    after = request.args.get('after')
 
     crab = api_utils.get_crab_by_username(username)
     if crab:
         molts = api_utils.get_timeline(crab, since=since,
                                        since_id=since_id)
-        molts_json = api_utils.query_to_json(molts, limit=limit, offset=offset)
+        molts_json = api_utils.query_to_json(molts, limit=limit, offset=offset,
+                                             before=before, after=after,
+                                             key=models.Crab.timeline_sort_key())
         return molts_json
     else:
         return abort(404, description='No Crab with that username.')
@@ -1,7 +1,8 @@
 import api_utils
 from config import *
-from flask import abort, Blueprint, render_template, Response
+from flask import abort, Blueprint, render_template
 import models
+import utils
 
 RSS = Blueprint('RSS Feeds', __name__)
 
@@ -16,9 +17,11 @@ def get_crab(username):
     crab = api_utils.get_crab_by_username(username)
     if crab:
         molts = crab.query_molts().filter_by(is_reply=False, is_remolt=False) \
-            .limit(RSS_MOLT_LIMIT)
-        xml = render_template('rss_user_page.xml', crab=crab, molts=molts)
-        return Response(xml, mimetype='text/xml')
+            .limit(RSS_MOLT_LIMIT).all()
+        return utils.stream_template(
+            'rss_user_page.xml', mimetype='text/xml', crab=crab, molts=molts,
+            usernames=models.Molt.resolve_mentions(molts)
+        )
     else:
         return abort(404, description='No Crab with that username.')
 
@@ -27,19 +30,23 @@ def get_crab(username):
 def get_crabtag(tagname):
     crabtag = models.Crabtag.get(tagname)
     if crabtag:
-        molts = crabtag.query_molts().limit(RSS_MOLT_LIMIT)
+        molts = crabtag.query_molts().limit(RSS_MOLT_LIMIT).all()
     else:
         molts = []
-    xml = render_template('rss_crabtag.xml', molts=molts, crabtag=tagname)
-    return Response(xml, mimetype='text/xml')
+    return utils.stream_template(
+        'rss_crabtag.xml', mimetype='text/xml', molts=molts, crabtag=tagname,
+        usernames=models.Molt.resolve_mentions(molts)
+    )
 
 
 @RSS.route('/timeline/<username>/')
 def get_timeline(username):
     crab = api_utils.get_crab_by_username(username)
     if crab:
-        molts = crab.query_timeline().limit(RSS_MOLT_LIMIT)
-        xml = render_template('rss_user_timeline.xml', crab=crab, molts=molts)
-        return Response(xml, mimetype='text/xml')
+        molts = crab.fetch_molts(crab.query_timeline(), RSS_MOLT_LIMIT)
+        return utils.stream_template(
+            'rss_user_timeline.xml', mimetype='text/xml', crab=crab,
+            molts=molts, usernames=models.Molt.resolve_mentions(molts)
+        )
     else:
         return abort(404, description='No Crab with that username.')
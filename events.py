@@ -0,0 +1,175 @@
+""" Publish/subscribe of small real-time events (new Molts, unread
+    notification counts) for the `/events/` server-sent events stream.
+
+    Events are published to channels (see `crab_channel` and
+    `author_channel`) and delivered to every subscription listening on that
+    channel. `LocalBroker` delivers within this process; `RedisBroker` relays
+    events between processes through Redis pub/sub. Publishing never touches
+    the database.
+"""
+import config
+import json
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+if config.EVENT_STREAM_REDIS_URL:
+    import redis
+
+# Events queued per subscription before new ones are dropped (slow client)
+SUBSCRIPTION_QUEUE_SIZE = 100
+
+Event = Tuple[str, Dict[str, Any]]
+
+
+def crab_channel(crab_id: int) -> str:
+    """ Channel for events addressed to a Crab (e.g. notifications).
+    """
+    return f'crab:{crab_id}'
+
+
+def author_channel(crab_id: int) -> str:
+    """ Channel for timeline Molts written by a Crab.
+    """
+    return f'author:{crab_id}'
+
+
+class Subscription:
+    """ Queue of events published to a set of channels. Close it (or use it
+        as a context manager) when done listening.
+    """
+    def __init__(self, broker: 'LocalBroker', channels: Iterable[str]):
+        self.broker = broker
+        self.channels: Set[str] = set(channels)
+        self._queue: 'queue.Queue[Event]' = \
+            queue.Queue(maxsize=SUBSCRIPTION_QUEUE_SIZE)
+
+    def put(self, event: Event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            pass
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Event]:
+        """ Returns the next (event_type, data) or None after `timeout`
+            seconds without events.
+        """
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class LocalBroker:
+    """ Delivers events to subscriptions in this process.
+    """
+    def __init__(self):
+        self._subscriptions: Dict[str, Set[Subscription]] = dict()
+        self._lock = threading.Lock()
+
+    def publish(self, channel: str, event_type: str, data: Dict[str, Any]):
+        """ Publish an event to every subscription on `channel`.
+        """
+        self._deliver(channel, (event_type, data))
+
+    def _deliver(self, channel: str, event: Event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.put(event)
+
+    def subscribe(self, channels: Iterable[str]) -> Subscription:
+        """ Returns a new subscription to `channels`.
+        """
+        subscription = Subscription(self, channels)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscriptions.setdefault(channel, set()) \
+                    .add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscriptions = self._subscriptions.get(channel)
+                if subscriptions is not None:
+                    subscriptions.discard(subscription)
+                    if not subscriptions:
+                        del self._subscriptions[channel]
+
+    @property
+    def subscription_count(self) -> int:
+        with self._lock:
+            return len({subscription
+                        for subscriptions in self._subscriptions.values()
+                        for subscription in subscriptions})
+
+
+class RedisBroker(LocalBroker):
+    """ Publishes events through Redis so that subscriptions in every process
+        receive them. Each process runs one listener thread (started with its
+        first subscription) that hands events to its local subscriptions.
+    """
+    def __init__(self, redis_url: str, prefix: str = 'events'):
+        super().__init__()
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(redis_url)
+        self._listener: Optional[threading.Thread] = None
+
+    def publish(self, channel: str, event_type: str, data: Dict[str, Any]):
+        try:
+            self._redis.publish(f'{self.prefix}:{channel}',
+                                json.dumps([event_type, data]))
+        except redis.RedisError:
+            # Still reach subscribers in this process
+            super().publish(channel, event_type, data)
+
+    def subscribe(self, channels: Iterable[str]) -> Subscription:
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen,
+                                                  daemon=True)
+                self._listener.start()
+        return super().subscribe(channels)
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(f'{self.prefix}:*')
+                for message in pubsub.listen():
+                    channel = message['channel'].decode()
+                    channel = channel[len(self.prefix) + 1:]
+                    event_type, data = json.loads(message['data'])
+                    self._deliver(channel, (event_type, data))
+            except redis.RedisError:
+                # Reconnect after a short delay
+                time.sleep(1)
+
+
+def publish(channel: str, event_type: str, data: Dict[str, Any]):
+    """ Publish an event with the configured broker if event streams are
+        enabled.
+    """
+    if config.EVENT_STREAM_ENABLED:
+        broker.publish(channel, event_type, data)
+
+
+def format_event(event_type: str, data: Dict[str, Any]) -> str:
+    """ Format an event as a server-sent events message.
+    """
+    return f'event: {event_type}\ndata: {json.dumps(data)}\n\n'
+
+
+broker = RedisBroker(config.EVENT_STREAM_REDIS_URL) \
+    if config.EVENT_STREAM_REDIS_URL else LocalBroker()
@@ -5,8 +5,9 @@ from bs4 import BeautifulSoup
 from crabber import app
 from datetime import datetime
 from extensions import db
-from models import Card
+from models import Card, Molt
 import os
+import render_cache
 import requests
 from requests.exceptions import RequestException
 from typing import Optional, Tuple
@@ -92,6 +93,7 @@ with Lock('fetch-cards') as lock:
     if lock:
         app.app_context().push()
 
+        ready_cards = list()
         for card in Card.query_unready():
             try:
                 metadata = web_preview(
@@ -104,6 +106,7 @@ with Lock('fetch-cards') as lock:
                 if metadata:
                     card.title, card.description, card.image = metadata
                     card.ready = True
+                    ready_cards.append(card.id)
                     print(f'Fetched {card.url}')
             except (URLUnreachable, URLNotFound, RequestException):
                 pass
@@ -111,5 +114,13 @@ with Lock('fetch-cards') as lock:
                 print(f'Failed to fetch {card.url}')
                 card.failed = True
         db.session.commit()
+
+        # Re-render Molts that now have a card to show
+        if ready_cards:
+            molt_ids = db.session.query(Molt.id) \
+                .filter(Molt.card_id.in_(ready_cards))
+            render_cache.rich_content.invalidate(
+                molt_id for molt_id, in molt_ids
+            )
     else:
         print('Job already in process. Exiting.')
@@ -0,0 +1,138 @@
+""" Full-text index of Molt content for `Molt.search` (enabled by
+    `config.FULLTEXT_SEARCH_ENABLED`).
+
+    SQLite databases use an external-content FTS5 table, `molt_fts`, that
+    triggers keep in sync as Molts are created, edited and deleted. MySQL uses
+    an ngram FULLTEXT index on `molt.content`, which MySQL maintains itself.
+    Soft-deleted Molts stay indexed and are filtered out by `Molt.search`.
+    Create or rebuild the index with `scripts/rebuild_search_index.py`.
+"""
+from extensions import db
+from flask_sqlalchemy import BaseQuery
+import models
+import re
+import sqlalchemy
+from sqlalchemy import column, literal_column, select, table
+from typing import List
+
+FTS_TABLE = 'molt_fts'
+MYSQL_INDEX = 'ft_molt_content'
+# Search terms; punctuation is ignored like it is by the tokenizers
+TERM = re.compile(r'\w+')
+
+_fts = table(FTS_TABLE, column('rowid'), column('rank'))
+
+SQLITE_SCHEMA = (
+    f'''CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE}
+        USING fts5(content, content='molt', content_rowid='id',
+                   tokenize='unicode61 remove_diacritics 2')''',
+    f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON molt
+        BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, content)
+            VALUES (new.id, new.content);
+        END''',
+    f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON molt
+        BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content)
+            VALUES ('delete', old.id, old.content);
+        END''',
+    f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update
+        AFTER UPDATE OF content ON molt
+        BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content)
+            VALUES ('delete', old.id, old.content);
+            INSERT INTO {FTS_TABLE}(rowid, content)
+            VALUES (new.id, new.content);
+        END''',
+)
+
+
+def dialect() -> str:
+    return db.engine.dialect.name
+
+
+def is_supported() -> bool:
+    """ Whether the database has a full-text index implementation here.
+    """
+    return dialect() in ('sqlite', 'mysql')
+
+
+def index_exists() -> bool:
+    inspector = sqlalchemy.inspect(db.engine)
+    if dialect() == 'sqlite':
+        return FTS_TABLE in inspector.get_table_names()
+    elif dialect() == 'mysql':
+        return MYSQL_INDEX in {index['name']
+                               for index in inspector.get_indexes('molt')}
+    return False
+
+
+def create_index():
+    """ Create the index (and, on SQLite, its triggers) if missing. Does not
+        populate an existing SQLite table; see `rebuild_index`. Raises
+        RuntimeError unless `is_supported()`.
+    """
+    if dialect() == 'sqlite':
+        for statement in SQLITE_SCHEMA:
+            db.session.execute(statement)
+    elif dialect() == 'mysql':
+        if not index_exists():
+            db.session.execute(f'ALTER TABLE molt ADD FULLTEXT INDEX '
+                               f'{MYSQL_INDEX} (content) WITH PARSER ngram')
+    else:
+        raise RuntimeError(
+            f'Full-text search is not supported on {dialect()}.'
+        )
+    db.session.commit()
+
+
+def rebuild_index():
+    """ Rebuild the index from the contents of the molt table.
+    """
+    if dialect() == 'mysql' and index_exists():
+        db.session.execute(f'ALTER TABLE molt DROP INDEX {MYSQL_INDEX}')
+    create_index()
+    if dialect() == 'sqlite':
+        db.session.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) "
+                           "VALUES ('rebuild')")
+        db.session.commit()
+
+
+def get_terms(query: str) -> List[str]:
+    return TERM.findall(query)
+
+
+def search(molts: BaseQuery, query: str, order: str = 'recent') -> BaseQuery:
+    """ Filter a Molt query to Molts whose content matches every term of
+        `query` (as a prefix on SQLite, anywhere in the content on MySQL).
+
+        :param molts: Molt query to filter.
+        :param query: User-entered search text.
+        :param order: 'recent' for newest first or 'relevance' for best match
+            first.
+    """
+    terms = get_terms(query)
+    if not terms:
+        return molts.filter(sqlalchemy.false())
+
+    if dialect() == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        matches = literal_column(FTS_TABLE).op('MATCH')(match)
+        if order == 'relevance':
+            return molts \
+                .join(_fts, _fts.c.rowid == models.Molt.id) \
+                .filter(matches) \
+                .order_by(_fts.c.rank, models.Molt.timestamp.desc())
+        return molts \
+            .filter(models.Molt.id.in_(
+                select([_fts.c.rowid]).where(matches)
+            )) \
+            .order_by(models.Molt.timestamp.desc())
+    else:
+        match = models.Molt.content.match(
+            ' '.join(f'+"{term}"' for term in terms)
+        )
+        molts = molts.filter(match)
+        if order == 'relevance':
+            return molts.order_by(match.desc(), models.Molt.timestamp.desc())
+        return molts.order_by(models.Molt.timestamp.desc())
@@ -0,0 +1,187 @@
+""" Timestamp localization and formatting.
+
+    Timestamps are stored as naive UTC datetimes. A Crab's `timezone` is
+    either a fixed offset in hours (e.g. "-06.00", the values offered before
+    region support) or an IANA zone name (e.g. "America/Chicago"). The
+    viewer's zone is resolved once per request and zone objects are shared
+    between requests, so formatting a page of timestamps does no lookups.
+"""
+import calendar
+import datetime
+import email.utils
+from flask import g, has_request_context, session
+import functools
+import patterns
+from typing import FrozenSet, Optional, Tuple, Union
+import utils
+
+try:
+    from zoneinfo import available_timezones, ZoneInfo, ZoneInfoNotFoundError
+except ImportError:  # Python < 3.9
+    from dateutil.tz import gettz
+    available_timezones = ZoneInfo = ZoneInfoNotFoundError = None
+
+# Used for logged-out viewers (Chicago time)
+DEFAULT_TIMEZONE = '-06.00'
+TIMEZONE_MAX_LENGTH = 64
+# Zones kept resolved per process. Timezones come from user input, so this is
+# bounded even though names are checked against the IANA database first.
+ZONE_CACHE_SIZE = 1024
+
+# Region zones offered in settings, alongside the fixed offsets
+REGION_TIMEZONES: Tuple[str, ...] = (
+    'Pacific/Honolulu', 'America/Anchorage', 'America/Los_Angeles',
+    'America/Denver', 'America/Phoenix', 'America/Chicago',
+    'America/Mexico_City', 'America/New_York', 'America/Toronto',
+    'America/Halifax', 'America/St_Johns', 'America/Sao_Paulo',
+    'America/Argentina/Buenos_Aires', 'Atlantic/Azores', 'Europe/London',
+    'Europe/Dublin', 'Europe/Lisbon', 'Europe/Paris', 'Europe/Berlin',
+    'Europe/Madrid', 'Europe/Rome', 'Europe/Amsterdam', 'Europe/Stockholm',
+    'Europe/Warsaw', 'Europe/Athens', 'Europe/Helsinki', 'Europe/Istanbul',
+    'Europe/Moscow', 'Africa/Cairo', 'Africa/Johannesburg', 'Africa/Lagos',
+    'Asia/Dubai', 'Asia/Tehran', 'Asia/Karachi', 'Asia/Kolkata',
+    'Asia/Kathmandu', 'Asia/Dhaka', 'Asia/Bangkok', 'Asia/Jakarta',
+    'Asia/Shanghai', 'Asia/Singapore', 'Asia/Manila', 'Asia/Seoul',
+    'Asia/Tokyo', 'Australia/Perth', 'Australia/Adelaide',
+    'Australia/Brisbane', 'Australia/Sydney', 'Pacific/Auckland',
+)
+
+HOUR = datetime.timedelta(hours=1)
+
+
+class OffsetZone:
+    """ A fixed offset from UTC, plus an hour of daylight saving from March
+        8th through October (the rule timestamps have always been shown with
+        for offset timezones).
+    """
+    def __init__(self, hours: float):
+        self.offset = datetime.timedelta(hours=hours)
+
+    def localize(self, dt: datetime.datetime) -> datetime.datetime:
+        local = dt + self.offset
+        month = local.month
+        if 4 <= month <= 10 or (month == 3 and local.day >= 8):
+            local += HOUR
+        return local
+
+
+class RegionZone:
+    """ An IANA timezone, with its own daylight saving rules.
+    """
+    def __init__(self, tzinfo: datetime.tzinfo):
+        self.tzinfo = tzinfo
+
+    def localize(self, dt: datetime.datetime) -> datetime.datetime:
+        return dt.replace(tzinfo=datetime.timezone.utc) \
+            .astimezone(self.tzinfo) \
+            .replace(tzinfo=None)
+
+
+Zone = Union[OffsetZone, RegionZone]
+
+
+@functools.lru_cache(maxsize=1)
+def _region_names() -> FrozenSet[str]:
+    return frozenset(available_timezones())
+
+
+def _load_tzinfo(name: str) -> Optional[datetime.tzinfo]:
+    if ZoneInfo is not None:
+        if name not in _region_names():
+            return None
+        try:
+            return ZoneInfo(name)
+        except (ZoneInfoNotFoundError, ValueError):
+            return None
+    return gettz(name)
+
+
+@functools.lru_cache(maxsize=ZONE_CACHE_SIZE)
+def _get_zone(timezone: str) -> Optional[Zone]:
+    if patterns.timezone.fullmatch(timezone):
+        return OffsetZone(float(timezone))
+    if '/' in timezone and len(timezone) <= TIMEZONE_MAX_LENGTH:
+        tzinfo = _load_tzinfo(timezone)
+        if tzinfo is not None:
+            return RegionZone(tzinfo)
+    return None
+
+
+def is_valid_timezone(timezone: Optional[str]) -> bool:
+    """ Whether `timezone` is an offset or IANA zone name we can localize to.
+    """
+    return bool(timezone) and _get_zone(timezone) is not None
+
+
+def get_zone(timezone: Optional[str] = None) -> Zone:
+    """ Returns the (shared) zone object for `timezone`, falling back to
+        `DEFAULT_TIMEZONE` if it is missing or invalid.
+    """
+    return (timezone and _get_zone(timezone)) \
+        or _get_zone(DEFAULT_TIMEZONE)
+
+
+def get_request_zone() -> Zone:
+    """ Returns the current viewer's zone, resolved once per request.
+    """
+    if not has_request_context():
+        return get_zone()
+    crab_id = session.get('current_user')
+    cached = g.get('timezone', None)
+    if cached is None or cached[0] != crab_id:
+        current_user = utils.get_current_user()
+        zone = get_zone(current_user.timezone if current_user else None)
+        cached = g.timezone = (crab_id, zone)
+    return cached[1]
+
+
+def localize(dt: datetime.datetime) -> datetime.datetime:
+    """ Converts a UTC datetime to the current viewer's local time.
+        https://www.youtube.com/watch?v=-5wpm-gesOY
+    """
+    return get_request_zone().localize(dt)
+
+
+def pretty_date(dt: datetime.datetime) -> str:
+    """ Formats a UTC datetime as the viewer's local date and time.
+    """
+    return localize(dt).strftime("%I:%M %p · %b %e, %Y")
+
+
+def pretty_age(dt: datetime.datetime,
+               now: Optional[datetime.datetime] = None) -> str:
+    """ Converts datetime to pretty twitter-esque age string.
+    """
+    now = now or datetime.datetime.utcnow()
+    seconds = max((now - dt).total_seconds(), 0)
+
+    if seconds < 60:  # Less than a minute
+        return f"{round(seconds)}s"
+    elif seconds < 60 * 60:  # Less than an hour
+        return f"{round(seconds / 60)}m"
+    elif seconds < 60 * 60 * 24:  # Less than a day
+        return f"{round(seconds / 60 / 60)}h"
+    elif dt.year == now.year:  # Same year as now
+        return localize(dt).strftime("%b %e")
+    else:
+        return localize(dt).strftime("%b %e, %Y")
+
+
+def rfc_2822(dt: datetime.datetime) -> str:
+    """ Formats a UTC datetime as an RFC 2822 date (for RSS).
+    """
+    return email.utils.format_datetime(
+        dt.replace(tzinfo=datetime.timezone.utc)
+    )
+
+
+def to_timestamp(dt: datetime.datetime) -> int:
+    """ Returns the Unix timestamp of a UTC datetime.
+    """
+    return calendar.timegm(dt.utctimetuple())
+
+
+def from_timestamp(timestamp: float) -> datetime.datetime:
+    """ Returns the UTC datetime of a Unix timestamp.
+    """
+    return datetime.datetime.utcfromtimestamp(timestamp)
@@ -0,0 +1,331 @@
+""" Versioned schema migrations for existing databases.
+
+    `db.create_all()` creates missing tables with every index declared in
+    `models`, but never changes tables that already exist. Each migration
+    here brings an existing database up to a schema version; applied versions
+    are recorded in the `schema_migrations` table. Steps check the live schema
+    before changing it, so a migration is a no-op on a database that
+    `create_all` has already brought up to date.
+
+    Indexes are created online where the database supports it (MySQL/InnoDB
+    builds them in place without locking the table; SQLite builds them
+    in one short write transaction). Apply pending migrations with
+    `scripts/migrate.py`.
+"""
+import datetime
+from extensions import db
+import models
+import sqlalchemy
+from sqlalchemy.schema import CreateColumn, CreateIndex as CreateIndexDDL
+import sys
+from typing import Callable, Iterable, List, NamedTuple, Optional, Set, \
+    Tuple
+
+schema_migrations = db.Table(
+    'schema_migrations',
+    db.Column('version', db.Integer, primary_key=True, autoincrement=False),
+    db.Column('description', db.String(256), nullable=False),
+    db.Column('applied_at', db.DateTime, nullable=False)
+)
+
+
+def get_index(name: str) -> sqlalchemy.Index:
+    """ Returns the index named `name` declared in `models`.
+    """
+    for table in db.metadata.tables.values():
+        for index in table.indexes:
+            if index.name == name:
+                return index
+    raise KeyError(f'No index named {name} is declared.')
+
+
+def index_exists(table_name: str, index_name: str) -> bool:
+    inspector = sqlalchemy.inspect(db.engine)
+    return index_name in {index['name'] for index in
+                          inspector.get_indexes(table_name)}
+
+
+class CreateIndex:
+    """ Create one of the indexes declared in `models` if it is missing.
+    """
+    def __init__(self, name: str):
+        self.name = name
+
+    def __str__(self):
+        return f'create index {self.name}'
+
+    def apply(self):
+        index = get_index(self.name)
+        if index_exists(index.table.name, index.name):
+            return
+        statement = str(
+            CreateIndexDDL(index).compile(dialect=db.engine.dialect)
+        )
+        if db.engine.dialect.name == 'mysql':
+            statement += ' ALGORITHM=INPLACE LOCK=NONE'
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql(statement)
+
+
+class Deduplicate:
+    """ Delete all but the oldest row of each group of rows that share the
+        same `columns`, so that a unique index can be created on them.
+    """
+    def __init__(self, table_name: str, columns: Iterable[str],
+                 after: Optional[Callable[[], None]] = None):
+        """
+            :param after: Called (before committing) if any rows were deleted,
+                e.g. to recount stored counters.
+        """
+        self.table_name = table_name
+        self.columns = tuple(columns)
+        self.after = after
+
+    def __str__(self):
+        return f'deduplicate {self.table_name} ({", ".join(self.columns)})'
+
+    def apply(self):
+        table = db.metadata.tables[self.table_name]
+        columns = [table.c[column] for column in self.columns]
+        # Wrapped in a derived table because MySQL can't select from the
+        # table it is deleting from
+        keep = sqlalchemy.select([sqlalchemy.func.min(table.c.id)
+                                  .label('id')]) \
+            .group_by(*columns) \
+            .subquery()
+        deleted = db.session.execute(
+            table.delete().where(table.c.id.notin_(
+                sqlalchemy.select([keep.c.id])
+            ))
+        ).rowcount
+        if deleted and self.after is not None:
+            self.after()
+        db.session.commit()
+
+
+class Analyze:
+    """ Refresh the query planner's statistics for `tables`.
+    """
+    def __init__(self, *table_names: str):
+        self.table_names = table_names
+
+    def __str__(self):
+        return f'analyze {", ".join(self.table_names)}'
+
+    def apply(self):
+        quote = db.engine.dialect.identifier_preparer.quote
+        table_names = [quote(table_name) for table_name in self.table_names]
+        with db.engine.begin() as connection:
+            if db.engine.dialect.name == 'mysql':
+                connection.exec_driver_sql(
+                    f'ANALYZE TABLE {", ".join(table_names)}'
+                )
+            else:
+                for table_name in table_names:
+                    connection.exec_driver_sql(f'ANALYZE {table_name}')
+
+
+class WidenColumn:
+    """ Lengthen a string column to the length declared in `models`. SQLite
+        doesn't enforce string lengths, so this only changes MySQL tables.
+    """
+    def __init__(self, table_name: str, column_name: str):
+        self.table_name = table_name
+        self.column_name = column_name
+
+    def __str__(self):
+        return f'widen {self.table_name}.{self.column_name}'
+
+    def apply(self):
+        if db.engine.dialect.name != 'mysql':
+            return
+        column = db.metadata.tables[self.table_name].c[self.column_name]
+        inspector = sqlalchemy.inspect(db.engine)
+        current = next(live_column for live_column
+                       in inspector.get_columns(self.table_name)
+                       if live_column['name'] == self.column_name)
+        if (current['type'].length or 0) >= column.type.length:
+            return
+        quote = db.engine.dialect.identifier_preparer.quote
+        column_type = column.type.compile(dialect=db.engine.dialect)
+        null = 'NULL' if column.nullable else 'NOT NULL'
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql(
+                f'ALTER TABLE {quote(self.table_name)} MODIFY '
+                f'{quote(self.column_name)} {column_type} {null}'
+            )
+
+
+class AddColumn:
+    """ Add a column declared in `models` to an existing table if it is
+        missing. The column must be nullable or have a server default, which
+        existing rows get; fill in real values with a script.
+    """
+    def __init__(self, table_name: str, column_name: str):
+        self.table_name = table_name
+        self.column_name = column_name
+
+    def __str__(self):
+        return f'add column {self.table_name}.{self.column_name}'
+
+    def apply(self):
+        inspector = sqlalchemy.inspect(db.engine)
+        if self.column_name in {column['name'] for column in
+                                inspector.get_columns(self.table_name)}:
+            return
+        column = db.metadata.tables[self.table_name].c[self.column_name]
+        if not column.nullable and column.server_default is None:
+            raise ValueError(f'{self} needs a server default for existing '
+                             'rows.')
+        quote = db.engine.dialect.identifier_preparer.quote
+        definition = CreateColumn(column).compile(dialect=db.engine.dialect)
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql(
+                f'ALTER TABLE {quote(self.table_name)} ADD COLUMN '
+                f'{definition}'
+            )
+
+
+class CreateTable:
+    """ Create a table declared in `models`, with its indexes, if it is
+        missing.
+    """
+    def __init__(self, table_name: str):
+        self.table_name = table_name
+
+    def __str__(self):
+        return f'create table {self.table_name}'
+
+    def apply(self):
+        db.metadata.tables[self.table_name].create(db.engine, checkfirst=True)
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    steps: Tuple
+    # Scripts (in `scripts/`) that fill in the new schema, to run after
+    # migrating
+    scripts: Tuple[str, ...] = ()
+
+
+def _reconcile_follower_counts():
+    models.Crab.reconcile_follower_counts()
+
+
+MIGRATIONS: Tuple[Migration, ...] = (
+    Migration(1, 'Index and deduplicate follows, blocks and Crabtag links', (
+        # Recounted after deduplicating follows
+        AddColumn('crab', 'follower_count'),
+        Deduplicate('following', ('follower_id', 'following_id'),
+                    after=_reconcile_follower_counts),
+        CreateIndex('ux_following_follower_following'),
+        CreateIndex('ix_following_following_follower'),
+        Deduplicate('blocking', ('blocker_id', 'blocked_id')),
+        CreateIndex('ux_blocking_blocker_blocked'),
+        CreateIndex('ix_blocking_blocked_blocker'),
+        Deduplicate('crabtag_links', ('molt_id', 'tag_id')),
+        CreateIndex('ux_crabtag_links_molt_tag'),
+        CreateIndex('ix_crabtag_links_tag_molt'),
+    )),
+    Migration(2, 'Index Molt, Like and Notification feed paths', (
+        CreateIndex('ix_molt_author_deleted_timestamp'),
+        CreateIndex('ix_molt_original_reply'),
+        CreateIndex('ix_molt_timestamp'),
+        CreateIndex('ix_like_molt'),
+        CreateIndex('ix_notification_recipient_read_timestamp'),
+        Analyze('molt', 'like', 'notification', 'following', 'blocking',
+                'crabtag_links'),
+    )),
+    Migration(3, 'Index Crabtag, Card and API key lookups', (
+        CreateIndex('ix_crabtag_name'),
+        CreateIndex('ix_card_url'),
+        CreateIndex('ux_developer_keys_key'),
+        CreateIndex('ux_access_tokens_key'),
+    )),
+    Migration(4, 'Allow IANA zone names as Crab timezones', (
+        WidenColumn('crab', 'timezone'),
+    )),
+    Migration(5, 'Add Molt conversation IDs', (
+        AddColumn('molt', 'conversation_id'),
+        CreateIndex('ix_molt_conversation_timestamp'),
+    ), scripts=('backfill_conversation_ids.py',)),
+    Migration(6, 'Add lowercase usernames and stored Crab and Molt counters', (
+        AddColumn('crab', 'username_lower'),
+        CreateIndex('ix_crab_username_lower'),
+        AddColumn('crab', 'follower_count'),
+        CreateIndex('ix_crab_follower_count'),
+        AddColumn('crab', 'unread_notification_count'),
+        AddColumn('molt', 'like_count'),
+        AddColumn('molt', 'remolt_count'),
+        AddColumn('molt', 'reply_count'),
+        AddColumn('molt', 'quote_count'),
+    ), scripts=('backfill_username_lower.py', 'reconcile_follower_counts.py',
+                'reconcile_unread_notifications.py',
+                'reconcile_molt_counters.py')),
+    Migration(7, 'Add timeline inbox, notification group, trending and stats '
+                 'tables', (
+        CreateTable('timeline_entry'),
+        CreateTable('notification_group'),
+        CreateTable('crabtag_usage'),
+        CreateTable('stats_snapshot'),
+    ), scripts=('rebuild_timelines.py', 'rebuild_notification_groups.py',
+                'rebuild_trending.py', 'build_stats_snapshot.py')),
+)
+
+
+def require_current_schema():
+    """ Exits with an error if the database has pending migrations, for
+        scripts that need the current schema.
+    """
+    pending = get_pending()
+    if pending:
+        versions = ', '.join(str(migration.version) for migration in pending)
+        sys.exit(f'The database is missing migration(s) {versions}; apply '
+                 'them with scripts/migrate.py first.')
+
+
+def get_applied_versions() -> Set[int]:
+    schema_migrations.create(db.engine, checkfirst=True)
+    return {version for version, in
+            db.session.query(schema_migrations.c.version)}
+
+
+def get_current_version() -> int:
+    return max(get_applied_versions(), default=0)
+
+
+def get_pending(target: Optional[int] = None) -> List[Migration]:
+    """ Returns the migrations not yet applied, up to version `target` (or
+        all of them), in order.
+    """
+    applied = get_applied_versions()
+    return [migration for migration in MIGRATIONS
+            if migration.version not in applied
+            and (target is None or migration.version <= target)]
+
+
+def apply(migration: Migration, log: Callable[[str], None] = print):
+    """ Apply every step of `migration` and record it as applied.
+    """
+    log(f'Applying {migration.version}: {migration.description}')
+    for step in migration.steps:
+        log(f'  {step}')
+        step.apply()
+    db.session.execute(schema_migrations.insert().values(
+        version=migration.version, description=migration.description,
+        applied_at=datetime.datetime.utcnow()
+    ))
+    db.session.commit()
+
+
+def migrate(target: Optional[int] = None,
+            log: Callable[[str], None] = print) -> List[Migration]:
+    """ Apply pending migrations in order, up to version `target`.
+
+        :return: The migrations applied.
+    """
+    pending = get_pending(target)
+    for migration in pending:
+        apply(migration, log)
+    return pending
@@ -1,18 +1,26 @@
+from collections import Counter
 import config
 import datetime
-import email.utils
+import events
 import extensions
-from flask import escape, render_template, render_template_string, url_for
+import fulltext
+from flask import current_app, escape, g, has_request_context, url_for
 from flask_sqlalchemy import BaseQuery
 import json
+import localization
+import muted
 from passlib.hash import sha256_crypt
 import patterns
+import render_cache
 import secrets
 from sqlalchemy import desc, func, or_
-from sqlalchemy.orm import aliased
+from sqlalchemy.orm import aliased, validates
 from sqlalchemy.sql import expression
-from typing import Any, Iterable, List, Optional, Tuple, Union
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, \
+    List, NamedTuple, Optional, Set, Tuple, Union
+import time
 import utils
+import zlib
 
 db = extensions.db
 
@@ -21,7 +29,9 @@ crabtag_table = db.Table(
     'crabtag_links',
     db.Column('id', db.Integer, primary_key=True),
     db.Column('molt_id', db.Integer, db.ForeignKey('molt.id')),
-    db.Column('tag_id', db.Integer, db.ForeignKey('crabtag.id'))
+    db.Column('tag_id', db.Integer, db.ForeignKey('crabtag.id')),
+    db.Index('ux_crabtag_links_molt_tag', 'molt_id', 'tag_id', unique=True),
+    db.Index('ix_crabtag_links_tag_molt', 'tag_id', 'molt_id')
 )
 
 # This stores unidirectional follower-followee relationships
@@ -29,28 +39,101 @@ following_table = db.Table(
     'following',
     db.Column('id', db.Integer, primary_key=True),
     db.Column('follower_id', db.Integer, db.ForeignKey('crab.id')),
-    db.Column('following_id', db.Integer, db.ForeignKey('crab.id'))
+    db.Column('following_id', db.Integer, db.ForeignKey('crab.id')),
+    db.Index('ux_following_follower_following', 'follower_id', 'following_id',
+             unique=True),
+    db.Index('ix_following_following_follower', 'following_id', 'follower_id')
 )
 
 blocking_table = db.Table(
     'blocking',
     db.Column('id', db.Integer, primary_key=True),
     db.Column('blocker_id', db.Integer, db.ForeignKey('crab.id')),
-    db.Column('blocked_id', db.Integer, db.ForeignKey('crab.id'))
+    db.Column('blocked_id', db.Integer, db.ForeignKey('crab.id')),
+    db.Index('ux_blocking_blocker_blocked', 'blocker_id', 'blocked_id',
+             unique=True),
+    db.Index('ix_blocking_blocked_blocker', 'blocked_id', 'blocker_id')
 )
 
+# Block lists longer than this are filtered with a subquery instead of
+# inlining every ID as a bound parameter
+BLOCK_IDS_INLINE_LIMIT = 500
+
+# Replies shown below a Molt in inline reply chains, at most
+REPLY_CHAIN_DEPTH = 10
+
+# When no username starts with a search query, substring matches are looked
+# for among this many of the most followed Crabs rather than the whole table
+CRAB_SEARCH_SCAN_LIMIT = 5000
+
 class NotFoundInDatabase(BaseException):
     pass
 
 
+class Preferences(NamedTuple):
+    """ A Crab's decoded preferences. Stored keys without a field here are
+        kept in `extra` so they survive being written back; `present` holds
+        the fields that were actually stored (or set), so `get` can fall back
+        to the caller's default for the rest.
+    """
+    spooky_mode: bool = False
+    light_mode: bool = False
+    dyslexic_mode: bool = False
+    comicsans_mode: bool = False
+    extra: Tuple[Tuple[str, Any], ...] = ()
+    present: FrozenSet[str] = frozenset()
+
+    @classmethod
+    def typed_fields(cls) -> Tuple[str, ...]:
+        return cls._fields[:-2]
+
+    @classmethod
+    def from_json(cls, raw: str) -> 'Preferences':
+        values = json.loads(raw or '{}')
+        typed = cls.typed_fields()
+        extra = tuple((key, values.pop(key)) for key in list(values)
+                      if key not in typed)
+        return cls(**values, extra=extra, present=frozenset(values))
+
+    def to_json(self) -> str:
+        values = {key: getattr(self, key) for key in self.typed_fields()
+                  if key in self.present}
+        values.update(self.extra)
+        return json.dumps(values)
+
+    def get(self, key: str, default: Optional[Any] = None):
+        if key in self.typed_fields():
+            return getattr(self, key) if key in self.present else default
+        return dict(self.extra).get(key, default)
+
+    def update(self, values: Dict[str, Any]) -> 'Preferences':
+        """ Returns a copy with `values` changed.
+        """
+        typed = self.typed_fields()
+        fields = {key: value for key, value in values.items()
+                  if key in typed}
+        extra = dict(self.extra)
+        extra.update((key, value) for key, value in values.items()
+                     if key not in fields)
+        return self._replace(**fields, extra=tuple(extra.items()),
+                             present=self.present | set(fields))
+
+
 class Crab(db.Model):
     """ Crab object is the what stores user data. Users are referred to as
         crabs. Create new with `Crab.create_new`.
     """
+    __table_args__ = (
+        db.Index('ix_crab_follower_count', 'follower_count', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
 
     # User info
     username = db.Column(db.String(32), nullable=False)
+    # Lowercase copy of `username` for indexed case-insensitive lookups (see
+    # `Crab.resolve_usernames`). Kept in sync by `Crab._set_username`.
+    username_lower = db.Column(db.String(32), nullable=True, index=True)
     email = db.Column(db.String(120), nullable=False)
     display_name = db.Column(db.String(32), nullable=False)
     password = db.Column(db.String(128), nullable=False)
@@ -68,7 +151,7 @@ class Crab(db.Model):
     register_time = db.Column(db.DateTime, nullable=False,
                               default=datetime.datetime.utcnow)
     deleted = db.Column(db.Boolean, nullable=False, default=False)
-    timezone = db.Column(db.String(8), nullable=False, default="-06.00")
+    timezone = db.Column(db.String(64), nullable=False, default="-06.00")
     lastfm = db.Column(db.String(128), nullable=True)
     banned = db.Column(db.Boolean, nullable=False, default=False)
     _password_reset_token = db.Column('password_reset_token', db.String(128))
@@ -80,6 +163,18 @@ class Crab(db.Model):
     _muted_words = db.Column('muted_words', db.String(4096), nullable=False,
                              server_default='')
 
+    # Stored count of unread notifications from available senders. Kept up to
+    # date by `notify`, `read_notifications`, `Notification.mark_read` and
+    # senders' bans/deletions; repaired by
+    # `Crab.reconcile_unread_notifications`.
+    _unread_notification_count = db.Column('unread_notification_count',
+                                           db.Integer, nullable=False,
+                                           default=0, server_default='0')
+    # Stored count of available followers, for ranking (see
+    # `Crab.reconcile_follower_counts`)
+    _follower_count = db.Column('follower_count', db.Integer, nullable=False,
+                                default=0, server_default='0')
+
     # Dynamic relationships
     _molts = db.relationship('Molt', back_populates='author')
     _following = db.relationship(
@@ -120,13 +215,6 @@ class Crab(db.Model):
         """
         return json.loads(self.raw_bio)
 
-    @property
-    def timedelta(self):
-        """ Returns time offset for user's timezone
-        """
-
-        return datetime.timedelta(hours=float(self.timezone))
-
     @property
     def muted_words(self) -> List[str]:
         """ Returns a list of the words this user has muted.
@@ -206,12 +294,69 @@ class Crab(db.Model):
         """
         return self.query_blockers().all()
 
+    @property
+    def blocked_ids(self) -> FrozenSet[int]:
+        """ Returns the IDs of Crabs this Crab has blocked (including
+            deleted/banned users).
+        """
+        return self._load_block_ids()[0]
+
+    @property
+    def blocker_ids(self) -> FrozenSet[int]:
+        """ Returns the IDs of Crabs that have blocked this Crab (including
+            deleted/banned users).
+        """
+        return self._load_block_ids()[1]
+
+    @property
+    def block_ids(self) -> FrozenSet[int]:
+        """ Returns the IDs of Crabs this Crab has blocked or been blocked by.
+        """
+        blocked_ids, blocker_ids = self._load_block_ids()
+        return blocked_ids | blocker_ids
+
+    def _load_block_ids(self) -> Tuple[FrozenSet[int], FrozenSet[int]]:
+        """ Returns (blocked IDs, blocker IDs), read in one query and cached on
+            this instance (i.e. for the rest of the request) until
+            `clear_block_ids`.
+        """
+        cached = getattr(self, '_block_ids_cache', None)
+        if cached is None:
+            rows = db.session.query(blocking_table.c.blocker_id,
+                                    blocking_table.c.blocked_id) \
+                .filter(db.or_(blocking_table.c.blocker_id == self.id,
+                               blocking_table.c.blocked_id == self.id)) \
+                .all()
+            cached = (
+                frozenset(blocked_id for blocker_id, blocked_id in rows
+                          if blocker_id == self.id),
+                frozenset(blocker_id for blocker_id, blocked_id in rows
+                          if blocked_id == self.id),
+            )
+            self._block_ids_cache = cached
+        return cached
+
+    def clear_block_ids(self):
+        """ Forget the cached block IDs (after a block or unblock).
+        """
+        self._block_ids_cache = None
+
     @property
     def following(self) -> List['Crab']:
         """ Returns this Crab's following without deleted/banned users.
         """
         return self.query_following().all()
 
+    @property
+    def following_ids(self) -> List[int]:
+        """ Returns the IDs of every Crab this Crab follows.
+        """
+        return [
+            crab_id for crab_id, in
+            db.session.query(following_table.c.following_id)
+            .filter(following_table.c.follower_id == self.id)
+        ]
+
     @property
     def followers(self) -> List['Crab']:
         """ Returns this Crab's followers without deleted/banned users.
@@ -228,7 +373,13 @@ class Crab(db.Model):
     def follower_count(self):
         """ Returns this Crab's follower count without deleted/banned users.
         """
-        return self.query_followers().count()
+        return self._follower_count
+
+    @property
+    def is_available(self) -> bool:
+        """ Returns True if this Crab is neither deleted nor banned.
+        """
+        return not (self.deleted or self.banned)
 
     @property
     def days_active(self):
@@ -245,11 +396,24 @@ class Crab(db.Model):
     @property
     def unread_notifications(self):
         """
-        Get the amount of unread notifications for this Crab
+        Get the amount of unread notifications for this Crab (stored, see
+        `Crab._unread_notification_count`)
         :return: len of unread notifs
         """
-        return Notification.query_all() \
-            .filter_by(recipient=self, read=False).count()
+        return self._unread_notification_count
+
+    def adjust_follower_count(self, amount: int):
+        """ Add `amount` to the stored follower count, in SQL on flush.
+        """
+        self._follower_count = Crab._follower_count + amount
+
+    def adjust_unread_notifications(self, amount: int):
+        """ Add `amount` to the stored unread notification count. The change
+            is applied in SQL on flush, so concurrent adjustments don't
+            overwrite each other.
+        """
+        self._unread_notification_count = \
+            Crab._unread_notification_count + amount
 
     @property
     def pinned(self):
@@ -316,19 +480,50 @@ class Crab(db.Model):
         return mutuals.all()
 
 
+    @property
+    def preferences(self) -> Preferences:
+        """ Returns user's preferences, decoded once per loaded Crab (and again
+            only if they change).
+        """
+        cached = self.__dict__.get('_preferences_decoded')
+        if cached is None or cached[0] is not self._preferences:
+            cached = (self._preferences,
+                      Preferences.from_json(self._preferences))
+            self.__dict__['_preferences_decoded'] = cached
+        return cached[1]
+
     def get_preference(self, key: str, default: Optional[Any] = None):
         """ Gets key from user's preferences.
         """
-        preferences_dict = json.loads(self._preferences)
-        return preferences_dict.get(key, default)
+        return self.preferences.get(key, default)
 
     def set_preference(self, key: str, value: Any):
         """ Sets a value in user's preferences.
         """
-        preferences_dict = json.loads(self._preferences)
-        preferences_dict[key] = value
-        self._preferences = json.dumps(preferences_dict)
-        db.session.commit()
+        self.set_preferences({key: value})
+
+    def set_preferences(self, values: Dict[str, Any]):
+        """ Sets several values in user's preferences at once.
+
+            During a request the change is committed when the request ends
+            (see `Crab.commit_preferences`), so any number of calls costs one
+            commit. Otherwise it's committed immediately.
+        """
+        preferences = self.preferences.update(values)
+        raw = preferences.to_json()
+        self._preferences = raw
+        self.__dict__['_preferences_decoded'] = (raw, preferences)
+        if has_request_context():
+            g.preferences_changed = True
+        else:
+            db.session.commit()
+
+    @staticmethod
+    def commit_preferences():
+        """ Commits preferences set during this request, if any.
+        """
+        if g.pop('preferences_changed', False):
+            db.session.commit()
 
     def get_recommended_crabs(self, limit=3):
         following_ids = db.session.query(Crab.id) \
@@ -381,16 +576,49 @@ class Crab(db.Model):
         """ Banish this user from the site.
         """
         if not self.banned:
+            was_available = self.is_available
             self.banned = True
+            self._update_availability(was_available)
             db.session.commit()
 
     def unban(self):
         """ Restore a banned user's access to the site.
         """
         if self.banned:
+            was_available = self.is_available
             self.banned = False
+            self._update_availability(was_available)
             db.session.commit()
 
+    def _update_availability(self, was_available: bool):
+        """ Recount engagement on the Molts this user has liked, remolted,
+            replied to, or quoted, recount notifications they've sent and the
+            followers of Crabs they follow and the trending Crabtags they've
+            used, and re-render Molts that mention them, if they have become
+            (un)available.
+        """
+        if self.is_available != was_available:
+            Molt.uncache_mentioning(self.username)
+            db.session.flush()
+            original_ids = db.session.query(Molt.original_molt_id) \
+                .filter(Molt.author_id == self.id,
+                        Molt.original_molt_id != None,
+                        Molt.deleted == False)
+            liked_ids = db.session.query(Like.molt_id) \
+                .filter(Like.crab_id == self.id)
+            molt_ids = {molt_id for molt_id, in original_ids.union(liked_ids)}
+            Molt.reconcile_counters(molt_ids)
+            recipient_ids = db.session.query(Notification.recipient_id) \
+                .filter_by(sender_id=self.id, read=False).distinct()
+            Crab.reconcile_unread_notifications(
+                {crab_id for crab_id, in recipient_ids}
+            )
+            if config.NOTIFICATION_GROUPS_ENABLED:
+                NotificationGroup.rebuild_from_sender(self)
+            Crab.reconcile_follower_counts(self.following_ids)
+            if config.TRENDING_COUNTERS_ENABLED:
+                CrabtagUsage.rebuild_from_author(self)
+
     def pin(self, molt):
         """ Set `molt` as user's pinned molt
         """
@@ -404,21 +632,27 @@ class Crab(db.Model):
         db.session.commit()
 
     def get_notifications(self, paginated=False, page=1):
-        """ Return all valid notifications for user.
-        """
-        blocker_ids = db.session \
-            .query(blocking_table.c.blocker_id) \
-            .filter(blocking_table.c.blocked_id == self.id)
-        blocked_ids = db.session \
-            .query(blocking_table.c.blocked_id) \
-            .filter(blocking_table.c.blocker_id == self.id)
-
-        block_ids = blocked_ids.union(blocker_ids)
+        """ Return all valid notifications for user, as (notification,
+            count, timestamp) with likes and remolts of a Molt grouped.
+        """
+        if config.NOTIFICATION_GROUPS_ENABLED:
+            notifs = Notification.query \
+                .with_entities(Notification, NotificationGroup.count,
+                               NotificationGroup.timestamp) \
+                .join(NotificationGroup,
+                      NotificationGroup.notification_id == Notification.id) \
+                .filter(NotificationGroup.recipient_id == self.id) \
+                .order_by(NotificationGroup.timestamp.desc(),
+                          NotificationGroup.id.desc())
+            if paginated:
+                return notifs.paginate(page, config.NOTIFS_PER_PAGE, False)
+            else:
+                return notifs.all()
 
         notifs = Notification.query_all() \
             .filter(db.or_(
                 Notification.sender_id == None,
-                Notification.sender_id.notin_(block_ids),
+                Notification.sender_id.notin_(self.query_block_ids()),
             )) \
             .filter_by(recipient=self)
         likes = notifs \
@@ -445,9 +679,7 @@ class Crab(db.Model):
                 Notification.timestamp.label('timestamp')
             ) \
             .filter(
-                Notification.type.in_(
-                    ('other', 'trophy', 'mention', 'quote', 'reply', 'follow')
-                )
+                Notification.type.in_(NotificationGroup.LISTED_TYPES)
             )
         notifs = other.union(
             likes,
@@ -466,7 +698,9 @@ class Crab(db.Model):
             .filter_by(read=False)
         for notif in notifs:
             notif.read = True
+        self._unread_notification_count = 0
         db.session.commit()
+        self.publish_unread_notifications()
 
     def award(self, title=None, trophy=None):
         """ Award user trophy by object or by title.
@@ -505,6 +739,14 @@ class Crab(db.Model):
             self.unfollow(crab)
             crab.unfollow(self)
             self._blocked.append(crab)
+            self.clear_block_ids()
+            crab.clear_block_ids()
+            if config.TIMELINE_INBOX_ENABLED:
+                TimelineEntry.purge(self, crab)
+                TimelineEntry.purge(crab, self)
+            if config.NOTIFICATION_GROUPS_ENABLED:
+                NotificationGroup.rebuild_from_sender(crab, [self.id])
+                NotificationGroup.rebuild_from_sender(self, [crab.id])
             db.session.commit()
 
     def unblock(self, crab):
@@ -512,6 +754,11 @@ class Crab(db.Model):
         """
         if crab in self._blocked and crab is not self:
             self._blocked.remove(crab)
+            self.clear_block_ids()
+            crab.clear_block_ids()
+            if config.NOTIFICATION_GROUPS_ENABLED:
+                NotificationGroup.rebuild_from_sender(crab, [self.id])
+                NotificationGroup.rebuild_from_sender(self, [crab.id])
             db.session.commit()
 
     def follow(self, crab):
@@ -519,6 +766,11 @@ class Crab(db.Model):
         """
         if crab not in self._following and crab is not self:
             self._following.append(crab)
+            if self.is_available:
+                crab.adjust_follower_count(1)
+                db.session.flush()
+            if config.TIMELINE_INBOX_ENABLED:
+                TimelineEntry.backfill(self, [crab.id])
 
             # Create follow notification
             crab.notify(sender=self, type="follow")
@@ -542,6 +794,10 @@ class Crab(db.Model):
         """
         if crab in self._following and crab is not self:
             self._following.remove(crab)
+            if self.is_available:
+                crab.adjust_follower_count(-1)
+            if config.TIMELINE_INBOX_ENABLED:
+                TimelineEntry.purge(self, crab)
             #
             # Temporarily disabled due to spamming:
             #
@@ -564,28 +820,28 @@ class Crab(db.Model):
     def delete(self):
         """ Delete user. (Can be undone).
         """
+        was_available = self.is_available
         self.deleted = True
+        self._update_availability(was_available)
         db.session.commit()
 
     def restore(self):
         """ Restore deleted user.
         """
+        was_available = self.is_available
         self.deleted = False
+        self._update_availability(was_available)
         db.session.commit()
 
-    def is_blocking(self, crab):
+    def is_blocking(self, crab) -> bool:
         """ Returns True if user has blocked `crab`.
         """
-        return db.session.query(blocking_table) \
-            .filter((blocking_table.c.blocker_id == self.id) &
-                    (blocking_table.c.blocked_id == crab.id)).count()
+        return crab.id in self.blocked_ids
 
-    def is_blocked_by(self, crab):
+    def is_blocked_by(self, crab) -> bool:
         """ Returns True if user has been blocked by `crab`.
         """
-        return db.session.query(blocking_table) \
-            .filter((blocking_table.c.blocked_id == self.id) &
-                    (blocking_table.c.blocker_id == crab.id)).count()
+        return crab.id in self.blocker_ids
 
     def is_following(self, crab):
         """ Returns True if user is following `crab`.
@@ -619,7 +875,7 @@ class Crab(db.Model):
             # Don't notify if either user is blocked
             sender = kwargs.get("sender")
             if sender is not None:
-                if self.is_blocked_by(sender) or self.is_blocking(sender):
+                if sender.id in self.block_ids:
                     return None
 
             # Check for molt duplicates
@@ -650,11 +906,35 @@ class Crab(db.Model):
             if not is_duplicate:
                 new_notif = Notification(recipient=self, **kwargs)
                 db.session.add(new_notif)
+                if new_notif.is_counted:
+                    self.adjust_unread_notifications(1)
+                if config.NOTIFICATION_GROUPS_ENABLED:
+                    NotificationGroup.add(new_notif)
                 db.session.commit()
+                self.publish_unread_notifications()
                 return new_notif
 
+    def publish_unread_notifications(self):
+        """ Push this Crab's unread notification count to their open event
+            streams.
+        """
+        if config.EVENT_STREAM_ENABLED:
+            events.publish(events.crab_channel(self.id), 'unread_notif',
+                           {'count': self.unread_notifications})
+
     # Query methods
 
+    def query_block_ids(self) -> BaseQuery:
+        """ Returns the IDs of Crabs this Crab has blocked or been blocked by.
+        """
+        blocker_ids = db.session \
+            .query(blocking_table.c.blocker_id) \
+            .filter(blocking_table.c.blocked_id == self.id)
+        blocked_ids = db.session \
+            .query(blocking_table.c.blocked_id) \
+            .filter(blocking_table.c.blocker_id == self.id)
+        return blocked_ids.union(blocker_ids)
+
     def query_blocked(self) -> BaseQuery:
         """ Returns this Crab's blocked Crabs without deleted/banned users.
         """
@@ -730,6 +1010,12 @@ class Crab(db.Model):
         return molts
 
     def query_timeline(self) -> BaseQuery:
+        """ Returns the Molts that make up this Crab's home timeline, filtered
+            by their blocks and preferences.
+        """
+        if config.TIMELINE_INBOX_ENABLED:
+            return self.filter_molt_query(self.query_timeline_inbox())
+
         following_ids = db.session.query(following_table.c.following_id) \
             .filter(following_table.c.follower_id == self.id)
         molts = Molt.query_all(
@@ -745,6 +1031,36 @@ class Crab(db.Model):
         molts = self.filter_molt_query(molts)
         return molts
 
+    def query_timeline_inbox(self) -> BaseQuery:
+        """ Returns the available Molts in this Crab's materialized timeline
+            inbox (see `TimelineEntry`), newest first. Does not apply this
+            Crab's blocks or preferences.
+        """
+        molts = Molt.query \
+            .join(TimelineEntry, TimelineEntry.molt_id == Molt.id) \
+            .filter(TimelineEntry.crab_id == self.id) \
+            .filter(Molt.deleted == False) \
+            .filter(Molt.author.has(deleted=False, banned=False)) \
+            .order_by(TimelineEntry.timestamp.desc(),
+                      TimelineEntry.molt_id.desc())
+        return molts
+
+    @staticmethod
+    def follower_sort_key() -> Tuple[Any, Any]:
+        """ Returns the (follower count, id) columns Crab search results are
+            ordered by, for keyset pagination of `Crab.search`.
+        """
+        return Crab._follower_count, Crab.id
+
+    @staticmethod
+    def timeline_sort_key() -> Tuple[Any, Any]:
+        """ Returns the (timestamp, id) columns home timelines are ordered by,
+            for keyset pagination of `query_timeline`.
+        """
+        if config.TIMELINE_INBOX_ENABLED:
+            return TimelineEntry.timestamp, TimelineEntry.molt_id
+        return Molt.timestamp, Molt.id
+
     def change_password(self, password: str):
         self.password = self.hash_pass(password)
         db.session.commit()
@@ -758,9 +1074,94 @@ class Crab(db.Model):
         query = self.filter_molt_query_by_muted_words(query)
         return query
 
+    @property
+    def muted_word_matcher(self) -> 'muted.MutedWordMatcher':
+        """ Returns this Crab's compiled muted words (cached per process).
+        """
+        return muted.matchers.get(self.id, self._muted_words)
+
+    @property
+    def muted_molt_filter(self) -> Optional[Callable[[Any], bool]]:
+        """ Returns a function that says whether a fetched Molt (or Like,
+            Bookmark or row of one) contains this Crab's muted words, for
+            `pagination.paginate`'s `exclude`. None when muted words are
+            filtered in SQL (see `filter_molt_query_by_muted_words`) or there
+            are none.
+        """
+        if not config.MUTED_WORDS_MATCHER_ENABLED:
+            return None
+        matcher = self.muted_word_matcher
+        if not matcher:
+            return None
+
+        def is_muted(item) -> bool:
+            if isinstance(item, Molt):
+                molt = item
+            else:
+                # Likes and Bookmarks, or (Molt, ...) rows
+                molt = getattr(item, 'molt', None) or item[0]
+            return molt.author_id != self.id and matcher.search(molt.content)
+        return is_muted
+
+    def timeline_event_filter(self) -> Callable[[Dict[str, Any]], bool]:
+        """ Returns a function that says whether a published 'molt' event
+            (see `Molt.create`) would show on this Crab's home timeline, with
+            the same blocks and preferences as `filter_molt_query`. They are
+            read once, so the function can outlive the request (e.g. in an
+            event stream).
+        """
+        crab_id = self.id
+        block_ids = self.block_ids
+        show_nsfw = self.show_nsfw
+        matcher = self.muted_word_matcher
+
+        def is_shown(molt: Dict[str, Any]) -> bool:
+            if molt.get('author_id') == crab_id:
+                return True
+            if molt.get('author_id') in block_ids \
+                    or molt.get('original_author_id') in block_ids:
+                return False
+            if not show_nsfw and (
+                    molt.get('nsfw') or (molt.get('original_nsfw') and
+                                         molt.get('original_author_id')
+                                         != crab_id)):
+                return False
+            return not (matcher and matcher.search(molt.get('content')))
+        return is_shown
+
+    def filter_muted_molts(self, items: Iterable[Any]) -> List[Any]:
+        """ Drops fetched Molts (or Likes or Bookmarks of them) containing
+            muted words, when they are matched in Python.
+        """
+        is_muted = self.muted_molt_filter
+        if is_muted is None:
+            return list(items)
+        return [item for item in items if not is_muted(item)]
+
+    def fetch_molts(self, query: BaseQuery, limit: int) -> List[Any]:
+        """ Returns up to `limit` results of a filtered Molt query, in its own
+            order, over-fetching to make up for Molts dropped for muted words.
+        """
+        is_muted = self.muted_molt_filter
+        if is_muted is None:
+            return query.limit(limit).all()
+        batch_size = limit * config.MUTED_WORDS_OVERFETCH
+        results = list()
+        for batch_number in range(config.MUTED_WORDS_MAX_BATCHES):
+            batch = query.limit(batch_size) \
+                .offset(batch_number * batch_size).all()
+            results.extend(item for item in batch if not is_muted(item))
+            if len(results) >= limit or len(batch) < batch_size:
+                break
+        return results[:limit]
+
     def filter_molt_query_by_muted_words(self, query: BaseQuery) -> BaseQuery:
-        """ Filters Molts containing muted words out of a query.
+        """ Filters Molts containing muted words out of a query. Does nothing
+            if muted words are matched in Python instead (see
+            `muted_molt_filter`).
         """
+        if config.MUTED_WORDS_MATCHER_ENABLED:
+            return query
         for muted_word in self.muted_words:
             query = query \
                 .filter(
@@ -788,21 +1189,18 @@ class Crab(db.Model):
         """ Filters a Molt query by authors who have not blocked/been blocked
             by this user.
         """
-        blocked_ids = db.session.query(blocking_table.c.blocked_id) \
-            .filter(blocking_table.c.blocker_id == self.id)
-        blocker_ids = db.session.query(blocking_table.c.blocker_id) \
-            .filter(blocking_table.c.blocked_id == self.id)
+        block_ids = self.block_ids
+        if not block_ids:
+            return query
+        if len(block_ids) > BLOCK_IDS_INLINE_LIMIT:
+            block_ids = self.query_block_ids()
         original_molt = aliased(Molt)
         query = query \
-            .filter(Molt.author_id.notin_(blocker_ids)) \
-            .filter(Molt.author_id.notin_(blocked_ids)) \
+            .filter(Molt.author_id.notin_(block_ids)) \
             .outerjoin(original_molt, original_molt.id == Molt.original_molt_id) \
             .filter(db.or_(
-                Molt.original_molt == None,
-                db.and_(
-                    original_molt.author_id.notin_(blocked_ids),
-                    original_molt.author_id.notin_(blocker_ids)
-                )
+                Molt.original_molt_id == None,
+                original_molt.author_id.notin_(block_ids)
             ))
         return query
 
@@ -810,24 +1208,20 @@ class Crab(db.Model):
         """ Filters a Crab query by users who have not blocked/been blocked by
             this user.
         """
-        blocker_ids = [crab.id for crab in self.blockers]
-        blocked_ids = [crab.id for crab in self.blocked]
-        query = query \
-            .filter(Crab.id.notin_(blocker_ids)) \
-            .filter(Crab.id.notin_(blocked_ids))
-        return query
+        block_ids = self.block_ids
+        if not block_ids:
+            return query
+        if len(block_ids) > BLOCK_IDS_INLINE_LIMIT:
+            block_ids = self.query_block_ids()
+        return query.filter(Crab.id.notin_(block_ids))
 
     @staticmethod
     def order_query_by_followers(query: BaseQuery) -> BaseQuery:
         """ Orders a Crab query by number of followers (descending).
         """
         # Ordering by None overrides previous order_by
-        query = query.outerjoin(following_table,
-                                following_table.c.following_id == Crab.id) \
-            .group_by(following_table.c.following_id) \
-            .order_by(None) \
-            .order_by(func.count(following_table.c.following_id).desc())
-        return query
+        return query.order_by(None) \
+            .order_by(Crab._follower_count.desc(), Crab.id.desc())
 
     @staticmethod
     def query_all() -> BaseQuery:
@@ -835,22 +1229,18 @@ class Crab(db.Model):
 
     @staticmethod
     def query_most_popular() -> BaseQuery:
-        followers = db.session.query(
-            following_table.c.following_id,
-            func.count(following_table.c.following_id).label('count')
-        ).group_by(following_table.c.following_id).subquery()
-
-        crabs = db.session.query(Crab, followers.c.count) \
-            .outerjoin(followers, followers.c.following_id == Crab.id) \
+        crabs = db.session.query(Crab, Crab._follower_count) \
             .filter(Crab.deleted == False, Crab.banned == False) \
-            .order_by(db.desc('count'))
+            .order_by(Crab._follower_count.desc(), Crab.id.desc())
         return crabs
 
     @staticmethod
     def get_by_ID(id: int, include_invalidated: bool = False) \
             -> Optional['Crab']:
         if id:
-            crab = Crab.query.filter_by(id=id)
+            # Exempt from `utils.check_current_user_query`
+            crab = Crab.query.filter_by(id=id) \
+                .execution_options(explicit_lookup=True)
             if not include_invalidated:
                 crab = crab.filter_by(deleted=False, banned=False)
             return crab.first()
@@ -875,14 +1265,164 @@ class Crab(db.Model):
                 crab = crab.filter_by(deleted=False, banned=False)
             return crab.first()
 
+    @staticmethod
+    def resolve_usernames(usernames: Iterable[str]) -> Set[str]:
+        """ Returns which of `usernames` belong to available Crabs, as a set
+            of lowercase usernames. Uses a single query.
+        """
+        usernames = {username.lower() for username in usernames}
+        if not usernames:
+            return set()
+        return {
+            username for username, in db.session.query(Crab.username_lower)
+            .filter(Crab.username_lower.in_(usernames))
+            .filter_by(deleted=False, banned=False)
+        }
+
+    @validates('username')
+    def _set_username(self, key, username):
+        self.username_lower = username.lower() if username else username
+        return username
+
+    @staticmethod
+    def audit_unread_notifications(crab_ids: Optional[Iterable[int]] = None) \
+            -> List[Tuple[int, int, int]]:
+        """ Compare stored unread notification counts against a fresh count.
+
+            :param crab_ids: Crabs to check. Checks every Crab if omitted.
+            :return: List of (crab_id, stored, actual) for every count that
+                has drifted.
+        """
+        stored = db.session.query(Crab.id, Crab._unread_notification_count)
+        actual = Notification.query_all() \
+            .filter_by(read=False) \
+            .with_entities(Notification.recipient_id,
+                           func.count(Notification.id)) \
+            .group_by(Notification.recipient_id)
+        if crab_ids is not None:
+            crab_ids = set(crab_ids)
+            if not crab_ids:
+                return list()
+            stored = stored.filter(Crab.id.in_(crab_ids))
+            actual = actual.filter(Notification.recipient_id.in_(crab_ids))
+        actual = dict(actual.all())
+        return [(crab_id, count, actual.get(crab_id, 0))
+                for crab_id, count in stored
+                if count != actual.get(crab_id, 0)]
+
+    @staticmethod
+    def reconcile_unread_notifications(
+            crab_ids: Optional[Iterable[int]] = None) -> int:
+        """ Recompute stored unread notification counts that have drifted.
+            Does not commit.
+
+            :param crab_ids: Crabs to reconcile. Reconciles every Crab if
+                omitted.
+            :return: Number of counts corrected.
+        """
+        mismatches = Crab.audit_unread_notifications(crab_ids)
+        for crab_id, _, actual in mismatches:
+            Crab.query.filter_by(id=crab_id) \
+                .update({Crab._unread_notification_count: actual},
+                        synchronize_session=False)
+        return len(mismatches)
 
     @staticmethod
     def search(query: str) -> BaseQuery:
-        results = Crab.query.filter_by(deleted=False, banned=False) \
-            .filter(db.or_(Crab.display_name.contains(query, autoescape=True),
-                           Crab.username.contains(query, autoescape=True)))
+        """ Returns available Crabs whose username starts with `query`, most
+            followed first. If there are none, falls back to Crabs whose
+            username or display name contains it, out of the
+            `CRAB_SEARCH_SCAN_LIMIT` most followed. Paginate with
+            `Crab.follower_sort_key()`.
+        """
+        query = query.strip().lstrip('@')
+        results = Crab.query.filter_by(deleted=False, banned=False)
+        if not query:
+            return results.filter(expression.false())
+
+        # Prefix match as a range so it's read straight off
+        # ix_crab_username_lower
+        prefix = query.lower()
+        prefix_end = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        prefix_results = results.filter(Crab.username_lower >= prefix,
+                                        Crab.username_lower < prefix_end)
+        if db.session.query(prefix_results.exists()).scalar():
+            return Crab.order_query_by_followers(prefix_results)
+
+        most_followed = db.select([Crab.id]) \
+            .order_by(Crab._follower_count.desc()) \
+            .limit(CRAB_SEARCH_SCAN_LIMIT) \
+            .subquery()
+        results = results \
+            .filter(Crab.id.in_(db.select([most_followed.c.id]))) \
+            .filter(db.or_(
+                Crab.username.contains(query, autoescape=True),
+                Crab.display_name.contains(query, autoescape=True)
+            ))
         return Crab.order_query_by_followers(results)
 
+    @staticmethod
+    def count_followers(crab_ids: Iterable[int]) -> dict:
+        """ Count available followers from scratch, the same way
+            `query_followers` does. Returns {crab_id: count}.
+        """
+        crab_ids = list(crab_ids)
+        counts = dict.fromkeys(crab_ids, 0)
+        followers = db.session.query(following_table.c.following_id,
+                                     func.count(Crab.id)) \
+            .join(Crab, Crab.id == following_table.c.follower_id) \
+            .filter(Crab.banned == False, Crab.deleted == False) \
+            .filter(following_table.c.following_id.in_(crab_ids)) \
+            .group_by(following_table.c.following_id)
+        counts.update(followers)
+        return counts
+
+    @staticmethod
+    def audit_follower_counts(crab_ids: Optional[Iterable[int]] = None,
+                              batch_size: int = 1000) \
+            -> List[Tuple[int, int, int]]:
+        """ Compare stored follower counts against a fresh count.
+
+            :param crab_ids: Crabs to check. Checks every Crab if omitted.
+            :param batch_size: Number of Crabs to count per query.
+            :return: List of (crab_id, stored, actual) for every count that
+                has drifted.
+        """
+        stored = db.session.query(Crab.id, Crab._follower_count) \
+            .order_by(Crab.id)
+        if crab_ids is not None:
+            crab_ids = set(crab_ids)
+            if not crab_ids:
+                return list()
+            stored = stored.filter(Crab.id.in_(crab_ids))
+
+        mismatches = list()
+        rows = stored.all()
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            actual = Crab.count_followers(crab_id for crab_id, _ in batch)
+            mismatches.extend((crab_id, count, actual[crab_id])
+                              for crab_id, count in batch
+                              if count != actual[crab_id])
+        return mismatches
+
+    @staticmethod
+    def reconcile_follower_counts(crab_ids: Optional[Iterable[int]] = None) \
+            -> int:
+        """ Recompute stored follower counts that have drifted. Does not
+            commit.
+
+            :param crab_ids: Crabs to reconcile. Reconciles every Crab if
+                omitted.
+            :return: Number of counts corrected.
+        """
+        mismatches = Crab.audit_follower_counts(crab_ids)
+        for crab_id, _, actual in mismatches:
+            Crab.query.filter_by(id=crab_id) \
+                .update({Crab._follower_count: actual},
+                        synchronize_session=False)
+        return len(mismatches)
+
     @staticmethod
     def hash_pass(password):
         """ Returns hash of `password`.
@@ -909,6 +1449,15 @@ class Crab(db.Model):
 class Molt(db.Model):
     """ Molt object is the equivilant of a tweet. Create using `Crab.molt`.
     """
+    __table_args__ = (
+        db.Index('ix_molt_author_deleted_timestamp',
+                 'author_id', 'deleted', 'timestamp'),
+        db.Index('ix_molt_original_reply', 'original_molt_id', 'is_reply'),
+        db.Index('ix_molt_timestamp', 'timestamp'),
+        db.Index('ix_molt_conversation_timestamp',
+                 'conversation_id', 'timestamp'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
 
     # Static info
@@ -953,11 +1502,30 @@ class Molt(db.Model):
     original_molt_id = db.Column(db.Integer, db.ForeignKey('molt.id'))
     original_molt = db.relationship('Molt', remote_side=[id],
                                     backref='_remolts')
+    # ID of the Molt at the root of the thread of replies and quotes this
+    # Molt is part of (the root's own ID, once it has any; None for Molts
+    # outside a thread). Set by `Molt.create`; see
+    # `scripts/backfill_conversation_ids.py` for older Molts.
+    conversation_id = db.Column(db.Integer, nullable=True)
 
     # Dynamic relationships
     _likes = db.relationship('Like')
     edited = db.Column(db.Boolean, nullable=False, default=False)
 
+    # Stored engagement counters. Only engagement from available (not
+    # deleted/banned) Crabs is counted. Kept current transactionally; see
+    # `Molt.reconcile_counters` to recompute them.
+    _like_count = db.Column('like_count', db.Integer, nullable=False,
+                            default=0, server_default='0')
+    _remolt_count = db.Column('remolt_count', db.Integer, nullable=False,
+                              default=0, server_default='0')
+    _reply_count = db.Column('reply_count', db.Integer, nullable=False,
+                             default=0, server_default='0')
+    _quote_count = db.Column('quote_count', db.Integer, nullable=False,
+                             default=0, server_default='0')
+
+    COUNTERS = ('like', 'remolt', 'reply', 'quote')
+
     def __repr__(self):
         """__repr__."""
         return f"<Molt by '@{self.author.username}'>"
@@ -974,18 +1542,19 @@ class Molt(db.Model):
         """ Return list of Crabs mentioned in Molt.
         """
         if self.raw_mentions:
-            mention_list = self.raw_mentions.splitlines()
-            return Crab.query.filter(func.lower(Crab.username).in_(mention_list)).all()
+            mention_list = set(self.raw_mentions.splitlines())
+            return Crab.query \
+                .filter(Crab.username_lower.in_(mention_list)).all()
         return list()
 
     @property
     def pretty_date(self):
         """ Return date of publish, formatted for display.
         """
-        return utils.localize(self.timestamp).strftime("%I:%M %p · %b %e, %Y")
+        return localization.pretty_date(self.timestamp)
 
     @property
-    def quote_count(self):
+    def quotes(self):
         """ Get all currently valid quotes of Molt.
         """
         return Molt.query_quotes(self).all()
@@ -994,7 +1563,7 @@ class Molt(db.Model):
     def quote_count(self):
         """ Get number of currently valid quotes of Molt.
         """
-        return Molt.query_quotes(self).count()
+        return self._quote_count
 
     @property
     def remolts(self):
@@ -1006,7 +1575,7 @@ class Molt(db.Model):
     def remolt_count(self):
         """ Get number of currently valid remolts of Molt.
         """
-        return Molt.query_remolts(self).count()
+        return self._remolt_count
 
     @property
     def replies(self):
@@ -1018,7 +1587,7 @@ class Molt(db.Model):
     def reply_count(self):
         """ Get number of currently valid Molts that reply to this Molt.
         """
-        return self.query_replies().count()
+        return self._reply_count
 
     @property
     def likes(self):
@@ -1030,13 +1599,26 @@ class Molt(db.Model):
     def like_count(self):
         """ List number of currently valid likes of Molt.
         """
-        return Molt.query_likes(self).count()
+        return self._like_count
+
+    @property
+    def counter_name(self) -> Optional[str]:
+        """ Name of the counter this Molt contributes to on its original Molt
+            ('remolt', 'reply' or 'quote'), or None.
+        """
+        if self.is_remolt:
+            return 'remolt'
+        elif self.is_reply:
+            return 'reply'
+        elif self.is_quote:
+            return 'quote'
+        return None
 
     @property
     def RFC_2822(self):
         """ Returns RFC 2822-compliant post date.
         """
-        return email.utils.format_datetime(self.timestamp)
+        return localization.rfc_2822(self.timestamp)
 
     @property
     def href(self):
@@ -1047,9 +1629,9 @@ class Molt(db.Model):
 
     @property
     def pretty_age(self):
-        """ Property wrapper for `Molt.get_pretty_age`.
+        """ Property wrapper for `localization.pretty_age`.
         """
-        return utils.get_pretty_age(self.timestamp)
+        return localization.pretty_age(self.timestamp)
 
     def get_author(self, column_names: Optional[Iterable[str]] = None):
         """ Returns only necessary columns from Molt.author, which results in a
@@ -1073,6 +1655,8 @@ class Molt(db.Model):
         if self.raw_tags is None:
             self.raw_tags = ''
 
+        old_tag_ids = [tag.id for tag in self.tags] \
+            if config.TRENDING_COUNTERS_ENABLED and self.id else list()
         self.tags = list()
 
         # Parse all tags
@@ -1082,6 +1666,13 @@ class Molt(db.Model):
             # Update tags relationship to include all new tags
             self.tags.append(Crabtag.get(tag))
 
+        if config.TRENDING_COUNTERS_ENABLED:
+            # New Molts and Crabtags need IDs before they can be counted
+            db.session.add(self)
+            db.session.flush()
+            CrabtagUsage.adjust_molt(self, old_tag_ids, -1)
+            CrabtagUsage.adjust_molt(self, [tag.id for tag in self.tags], 1)
+
         # Parse all mentions
         for user in patterns.mention.findall(self.content):
             if self.raw_mentions is None:
@@ -1142,10 +1733,13 @@ class Molt(db.Model):
             self.nsfw = False
             db.session.commit()
 
-    def semantic_content(self) -> str:
+    def semantic_content(self, usernames: Optional[Set[str]] = None) -> str:
         """ Return Molt content (including embeds, tags, and mentions)
             rasterized as semantic HTML. (For RSS feeds and other external
             applications)
+
+            :param usernames: Mentionable usernames, see
+                `Molt.resolve_mentions`.
         """
         # Escape/sanitize user submitted content
         new_content = str(escape(self.content))
@@ -1155,7 +1749,8 @@ class Molt(db.Model):
         new_content = new_content.strip().replace("\n", "<br>")
 
         # Convert mentions into anchor tags
-        new_content = Molt.label_mentions(new_content, absolute_url=True)
+        new_content = Molt.label_mentions(new_content, absolute_url=True,
+                                           usernames=usernames)
 
         # Convert crabtags into anchor tags
         new_content = Molt.label_crabtags(new_content, absolute_url=True)
@@ -1173,45 +1768,66 @@ class Molt(db.Model):
 
         return f'<p>{new_content}</p>'
 
-    def rich_content(self, full_size_media=False):
+    def rich_content(self, full_size_media=False,
+                     usernames: Optional[Set[str]] = None):
         """ Return Molt content (including embeds, tags, and mentions)
-            rasterized as HTML.
+            rasterized as HTML. Renders are cached (see `render_cache`).
+
+            :param usernames: Mentionable usernames, see
+                `Molt.resolve_mentions`.
+        """
+        if self.id is None:
+            return self.render_rich_content(full_size_media, usernames)
+
+        variant = (f'{int(full_size_media)}:{int(self.nsfw)}:'
+                   f'{zlib.crc32(self.content.encode())}')
+        html = render_cache.rich_content.get(self.id, variant)
+        if html is None:
+            html = self.render_rich_content(full_size_media, usernames)
+            # Don't cache until the link card has been fetched (or given up
+            # on) so it shows up once it's ready
+            if self.card_id is None or self.card.ready or self.card.failed:
+                render_cache.rich_content.set(self.id, variant, html)
+        return html
+
+    def uncache(self):
+        """ Drop cached renders of this Molt.
+        """
+        render_cache.rich_content.invalidate([self.id])
+
+    def render_rich_content(self, full_size_media=False,
+                            usernames: Optional[Set[str]] = None):
+        """ Render Molt content (including embeds, tags, and mentions) as HTML
+            without going through the cache.
         """
         # Escape/sanitize user submitted content
         new_content = str(escape(self.content))
 
         # Render youtube link to embedded iframe
-        if patterns.youtube.search(new_content):
-            youtube_id = patterns.youtube.search(new_content).group(1)
-            youtube_embed = render_template_string(
-                f'{{% with video="{youtube_id}" %}}'
-                '   {% include "youtube.html" %}'
-                '{% endwith %}'
-            )
+        youtube_match = patterns.youtube.search(new_content)
+        if youtube_match:
+            youtube_embed = Molt.render_embed('youtube.html',
+                                              video=youtube_match.group(1))
             new_content = patterns.youtube.sub('', new_content)
         else:
             youtube_embed = "<!-- no valid youtube links found -->"
 
         # Render giphy link to embedded iframe
-        if patterns.giphy.search(new_content):
-            giphy_id = patterns.giphy.search(new_content).group(1)
-            giphy_embed = render_template_string(
-                f'{{% with giphy_id="{giphy_id}" %}}'
-                '   {% include "giphy.html" %}'
-                '{% endwith %}',
-                full_size_media=full_size_media)
+        giphy_match = patterns.giphy.search(new_content)
+        if giphy_match:
+            giphy_embed = Molt.render_embed('giphy.html',
+                                            giphy_id=giphy_match.group(1),
+                                            full_size_media=full_size_media)
             new_content = patterns.giphy.sub('', new_content)
         else:
             giphy_embed = "<!-- no valid giphy links found -->"
 
         # Render external image link to external_img macro
-        if patterns.ext_img.search(new_content):
-            image_link = patterns.ext_img.search(new_content).group(1)
-            ext_img_embed = render_template_string(
-                f'{{% with link="{image_link}" %}}'
-                '  {% include "external_img.html" %}'
-                '{% endwith %}',
-                full_size_media=full_size_media)
+        ext_img_match = patterns.ext_img.search(new_content)
+        if ext_img_match:
+            ext_img_embed = Molt.render_embed('external_img.html',
+                                              link=ext_img_match.group(1),
+                                              full_size_media=full_size_media)
             new_content = patterns.ext_img.sub('', new_content)
         else:
             ext_img_embed = "<!-- no valid external image links found -->"
@@ -1221,8 +1837,11 @@ class Molt(db.Model):
         link_card = '<!-- no cards created -->'
         if self.card:
             if self.card.ready:
-                link_card = render_template('link-card.html', card=self.card,
-                                            nsfw=self.nsfw)
+                link_card = Molt.render_embed(
+                    'link-card.html', card=self.card, nsfw=self.nsfw,
+                    sprite_url=config.SPRITE_URL,
+                    server_start=config.SERVER_START
+                )
 
         # Preserve newlines
         new_content = new_content.strip().replace('\n', '<br>')
@@ -1230,13 +1849,24 @@ class Molt(db.Model):
         new_content = new_content.strip().replace('  ', ' &nbsp;')
 
         # Convert mentions into anchor tags
-        new_content = Molt.label_mentions(new_content)
+        new_content = Molt.label_mentions(new_content, usernames=usernames)
         # Convert crabtags into anchor tags
         new_content = Molt.label_crabtags(new_content)
 
         return new_content + giphy_embed + ext_img_embed + youtube_embed  \
             + link_card
 
+    @staticmethod
+    def render_embed(template_name: str, **context) -> str:
+        """ Render an embed fragment template with `context`.
+
+            The template is compiled once and cached by the app's Jinja
+            environment, and no context processors run, so this is much
+            cheaper than `render_template` for small fragments.
+        """
+        template = current_app.jinja_env.get_template(template_name)
+        return template.render(**context)
+
     def dict(self):
         """ Serialize Molt into dictionary.
         """
@@ -1289,6 +1919,118 @@ class Molt(db.Model):
                 .order_by(Molt.timestamp).first()
         return reply
 
+    @staticmethod
+    def load_reply_chains(roots: Iterable[Tuple['Molt', Optional[int]]],
+                          viewer: Optional[Crab] = None,
+                          depth_limit: int = REPLY_CHAIN_DEPTH) \
+            -> Dict[Tuple[int, Optional[int]], 'Molt']:
+        """ Loads the inline reply chains below Molts (as `molt.html` shows
+            them) with one recursive query, instead of two queries per level.
+
+            Below a Molt, the chain shows the first reply to it by a given
+            Crab; below that reply, the first reply by the author of the Molt
+            above, and so on back and forth, up to `depth_limit` replies.
+            Replies `viewer` can't see (unavailable, blocked, NSFW or muted)
+            are skipped. Muted words matched in Python (see
+            `Crab.muted_molt_filter`) end the chain instead.
+
+            :param roots: (Molt, ID of the Crab whose reply to it comes first)
+                pairs. An ID of None means the first reply by `viewer` or a
+                Crab they follow.
+            :return: The reply shown below each Molt, keyed by (Molt ID, ID of
+                the Crab it's from, as passed in `roots` or implied).
+        """
+        roots = [(molt, replies_from) for molt, replies_from in roots
+                 if molt.reply_count]
+        if not roots or depth_limit < 1:
+            return dict()
+
+        anchors = db.union_all(*(
+            db.select([
+                expression.literal(molt.id).label('molt_id'),
+                expression.literal(molt.author_id).label('author_id'),
+                expression.cast(expression.literal(replies_from), db.Integer)
+                .label('from_id'),
+                expression.cast(expression.null(), db.Integer)
+                .label('parent_id'),
+                expression.cast(expression.null(), db.Integer)
+                .label('parent_from_id'),
+                expression.literal(0).label('depth'),
+            ]) for molt, replies_from in roots
+        )).subquery()
+        chain = db.select([anchors]).cte('reply_chain', recursive=True)
+
+        # The first visible reply to the Molt in each chain row
+        reply = aliased(Molt)
+        from_following = reply.author_id == chain.c.from_id
+        if viewer is not None:
+            following_ids = db.select([following_table.c.following_id]) \
+                .where(following_table.c.follower_id == viewer.id)
+            from_following = db.or_(from_following, db.and_(
+                chain.c.from_id == None,
+                db.or_(reply.author_id == viewer.id,
+                       reply.author_id.in_(following_ids))
+            ))
+        first_reply = db.select([reply.id]) \
+            .where(reply.original_molt_id == chain.c.molt_id,
+                   reply.is_reply == True, reply.deleted == False,
+                   reply.author.has(deleted=False, banned=False),
+                   from_following)
+        if viewer is not None:
+            block_ids = viewer.block_ids
+            if len(block_ids) > BLOCK_IDS_INLINE_LIMIT:
+                block_ids = viewer.query_block_ids()
+            if block_ids:
+                first_reply = first_reply \
+                    .where(reply.author_id.notin_(block_ids))
+            if not viewer.show_nsfw:
+                first_reply = first_reply.where(db.or_(
+                    reply.nsfw == False, reply.author_id == viewer.id
+                ))
+            if not config.MUTED_WORDS_MATCHER_ENABLED:
+                for muted_word in viewer.muted_words:
+                    first_reply = first_reply.where(db.or_(
+                        reply.author_id == viewer.id,
+                        db.not_(reply.content.ilike(f'%{muted_word}%'))
+                    ))
+        first_reply = first_reply \
+            .order_by(reply.timestamp, reply.id) \
+            .limit(1) \
+            .correlate(chain) \
+            .scalar_subquery()
+
+        chain = chain.union_all(
+            db.select([
+                Molt.id, Molt.author_id,
+                chain.c.author_id,
+                chain.c.molt_id,
+                chain.c.from_id,
+                chain.c.depth + 1,
+            ]).select_from(chain.join(Molt, Molt.id == first_reply))
+            .where(chain.c.depth < depth_limit)
+        )
+        rows = db.session.query(chain.c.molt_id, chain.c.parent_id,
+                                chain.c.parent_from_id, chain.c.depth) \
+            .filter(chain.c.depth > 0) \
+            .all()
+
+        molts = {molt.id: molt for molt in Molt.query.filter(
+            Molt.id.in_({molt_id for molt_id, *_ in rows})
+        )} if rows else dict()
+        is_muted = viewer.muted_molt_filter if viewer is not None else None
+        shown = {molt.id for molt, _ in roots}
+        replies = dict()
+        # Shallowest first, so that replies below a muted one are dropped too
+        for molt_id, parent_id, parent_from_id, _ in sorted(
+                rows, key=lambda row: row[3]):
+            molt = molts[molt_id]
+            if parent_id not in shown \
+                    or (is_muted is not None and is_muted(molt)):
+                continue
+            shown.add(molt_id)
+            replies[(parent_id, parent_from_id)] = molt
+        return replies
+
     def quote(self, author, comment, **kwargs):
         """ Quote Molt as `author`.
         """
@@ -1336,6 +2078,7 @@ class Molt(db.Model):
             # Re-evaluate mentions and tags
             self.evaluate_contents()
             db.session.commit()
+            self.uncache()
 
     def like(self, crab):
         """ Like Molt as `crab`.
@@ -1343,6 +2086,10 @@ class Molt(db.Model):
         if not Like.query.filter_by(crab=crab, molt=self).all():
             new_like = Like(crab=crab, molt=self)
             db.session.add(new_like)
+            if crab.is_available:
+                self.adjust_counter('like', 1)
+                # Write the increment so `like_count` reloads below
+                db.session.flush()
             self.author.notify(sender=crab, type="like", molt=self)
 
             # Check if awards are applicable:
@@ -1361,20 +2108,44 @@ class Molt(db.Model):
         old_like = Like.query.filter_by(crab=crab, molt=self).first()
         if old_like is not None:
             db.session.delete(old_like)
+            if crab.is_available:
+                self.adjust_counter('like', -1)
             db.session.commit()
 
     def delete(self):
         """ Delete molt.
         """
-        self.deleted = True
+        if not self.deleted:
+            CrabtagUsage.adjust_molt(self, [tag.id for tag in self.tags], -1)
+            self.deleted = True
+            self.adjust_original_counter(-1)
         db.session.commit()
 
     def restore(self):
         """ Undelete/restore Molt.
         """
-        self.deleted = False
+        if self.deleted:
+            self.deleted = False
+            self.adjust_original_counter(1)
+            CrabtagUsage.adjust_molt(self, [tag.id for tag in self.tags], 1)
         db.session.commit()
 
+    def adjust_counter(self, counter: str, amount: int):
+        """ Add `amount` to one of this Molt's stored engagement counters (see
+            `Molt.COUNTERS`). The change is applied in SQL on flush, so
+            concurrent adjustments don't overwrite each other.
+        """
+        column = getattr(Molt, f'_{counter}_count')
+        setattr(self, f'_{counter}_count', column + amount)
+
+    def adjust_original_counter(self, amount: int):
+        """ Add `amount` to the counter this Molt contributes to on its
+            original Molt, if any, and if its author is counted.
+        """
+        counter = self.counter_name
+        if counter and self.original_molt and self.author.is_available:
+            self.original_molt.adjust_counter(counter, amount)
+
     # Query methods
 
     def query_likes(self):
@@ -1396,6 +2167,20 @@ class Molt(db.Model):
             .filter_by(is_reply=True, original_molt=self, deleted=False) \
             .filter(Molt.author.has(banned=False, deleted=False))
 
+    def query_conversation(self) -> BaseQuery:
+        """ Returns every available Molt in this Molt's conversation: the
+            root Molt and all replies and quotes below it, at any depth.
+            Served by one range read of `ix_molt_conversation_timestamp`.
+        """
+        if self.conversation_id is None:
+            molts = Molt.query.filter(Molt.id == self.id)
+        else:
+            molts = Molt.query \
+                .filter(Molt.conversation_id == self.conversation_id)
+        return molts \
+            .filter_by(deleted=False) \
+            .filter(Molt.author.has(banned=False, deleted=False))
+
     @staticmethod
     def query_all(include_replies=True, include_remolts=False,
                   include_quotes=True) -> BaseQuery:
@@ -1421,6 +2206,128 @@ class Molt(db.Model):
             .group_by(Like.molt_id).order_by(desc('likes'))
         return likes
 
+    @staticmethod
+    def uncache_mentioning(*usernames: str):
+        """ Drop cached renders of Molts that mention any of `usernames`, so
+            their mention links are rebuilt.
+        """
+        if not render_cache.rich_content.enabled:
+            return
+        conditions = list()
+        for username in usernames:
+            username = username.lower()
+            conditions.append(Molt.raw_mentions.like(f'{username}\n%'))
+            conditions.append(Molt.raw_mentions.like(f'%\n{username}\n%'))
+        molt_ids = db.session.query(Molt.id).filter(or_(*conditions))
+        render_cache.rich_content.invalidate(
+            molt_id for molt_id, in molt_ids
+        )
+
+    @staticmethod
+    def count_engagement(molt_ids: Iterable[int]) -> dict:
+        """ Count the engagement of Molts from scratch, the same way the
+            `query_*` methods do. Returns {molt_id: {counter: count}}.
+        """
+        molt_ids = list(molt_ids)
+        counts = {molt_id: dict.fromkeys(Molt.COUNTERS, 0)
+                  for molt_id in molt_ids}
+
+        likes = db.session.query(Like.molt_id, func.count(Like.id)) \
+            .join(Crab, Crab.id == Like.crab_id) \
+            .filter(Crab.deleted == False, Crab.banned == False) \
+            .filter(Like.molt_id.in_(molt_ids)) \
+            .group_by(Like.molt_id)
+        for molt_id, count in likes:
+            counts[molt_id]['like'] = count
+
+        child = aliased(Molt)
+        for counter, flag in (('remolt', child.is_remolt),
+                              ('reply', child.is_reply),
+                              ('quote', child.is_quote)):
+            children = db.session.query(child.original_molt_id,
+                                        func.count(child.id)) \
+                .join(Crab, Crab.id == child.author_id) \
+                .filter(Crab.deleted == False, Crab.banned == False) \
+                .filter(flag == True, child.deleted == False) \
+                .filter(child.original_molt_id.in_(molt_ids)) \
+                .group_by(child.original_molt_id)
+            for molt_id, count in children:
+                counts[molt_id][counter] = count
+        return counts
+
+    @staticmethod
+    def audit_counters(molt_ids: Optional[Iterable[int]] = None,
+                       batch_size: int = 1000) \
+            -> List[Tuple[int, str, int, int]]:
+        """ Compare stored engagement counters against a fresh count.
+
+            :param molt_ids: Molts to check. Checks every Molt if omitted.
+            :param batch_size: Number of Molts to count per round of queries.
+            :return: List of (molt_id, counter, stored, actual) for every
+                counter that has drifted.
+        """
+        mismatches = list()
+        for batch in Molt._stored_counter_batches(molt_ids, batch_size):
+            actual = Molt.count_engagement(row[0] for row in batch)
+            for molt_id, *values in batch:
+                for counter, value in zip(Molt.COUNTERS, values):
+                    if value != actual[molt_id][counter]:
+                        mismatches.append((molt_id, counter, value,
+                                           actual[molt_id][counter]))
+        return mismatches
+
+    @staticmethod
+    def _stored_counter_batches(molt_ids: Optional[Iterable[int]],
+                                batch_size: int) -> Iterator[List[tuple]]:
+        """ Yields (id, like, remolt, reply, quote counts) rows in batches of
+            up to `batch_size`, in ID order, reading one batch at a time.
+        """
+        stored = db.session.query(Molt.id, Molt._like_count,
+                                  Molt._remolt_count, Molt._reply_count,
+                                  Molt._quote_count).order_by(Molt.id)
+        if molt_ids is not None:
+            molt_ids = sorted(set(molt_ids))
+            for start in range(0, len(molt_ids), batch_size):
+                batch_ids = molt_ids[start:start + batch_size]
+                yield stored.filter(Molt.id.in_(batch_ids)).all()
+            return
+        last_id = 0
+        while True:
+            batch = stored.filter(Molt.id > last_id).limit(batch_size).all()
+            if batch:
+                yield batch
+            if len(batch) < batch_size:
+                return
+            last_id = batch[-1][0]
+
+    @staticmethod
+    def reconcile_counters(molt_ids: Optional[Iterable[int]] = None,
+                           batch_size: int = 1000) -> int:
+        """ Recompute stored engagement counters that have drifted. Does not
+            commit.
+
+            :param molt_ids: Molts to reconcile. Reconciles every Molt if
+                omitted.
+            :param batch_size: Number of Molts to count, or update, per
+                query.
+            :return: Number of counters corrected.
+        """
+        mismatches = Molt.audit_counters(molt_ids, batch_size)
+        corrections: Dict[str, Dict[int, int]] = dict()
+        for molt_id, counter, _, actual in mismatches:
+            corrections.setdefault(counter, dict())[molt_id] = actual
+        # One UPDATE per counter per batch, setting each row with a CASE
+        for counter, values in corrections.items():
+            molt_ids = list(values)
+            for start in range(0, len(molt_ids), batch_size):
+                batch = {molt_id: values[molt_id]
+                         for molt_id in molt_ids[start:start + batch_size]}
+                Molt.query.filter(Molt.id.in_(batch)) \
+                    .update({getattr(Molt, f'_{counter}_count'):
+                             expression.case(batch, value=Molt.id)},
+                            synchronize_session=False)
+        return len(mismatches)
+
     @staticmethod
     def query_most_liked() -> BaseQuery:
         molts = db.session.query(Molt, func.count(Like.id)) \
@@ -1490,10 +2397,20 @@ class Molt(db.Model):
         return query
 
     @staticmethod
-    def search(query: str) -> BaseQuery:
+    def search(query: str, order: str = 'recent') -> BaseQuery:
+        """ Returns Molts (excluding replies) whose content matches `query`.
+            Uses the full-text index when `config.FULLTEXT_SEARCH_ENABLED` is
+            set (see `fulltext`), otherwise a substring scan.
+
+            :param order: 'recent' for newest first or 'relevance' for best
+                match first (full-text index only).
+        """
         results = Molt.query.filter_by(deleted=False, is_reply=False) \
+            .filter(Molt.author.has(deleted=False, banned=False))
+        if config.FULLTEXT_SEARCH_ENABLED and fulltext.is_supported():
+            return fulltext.search(results, query, order)
+        results = results \
             .filter(Molt.content.contains(query, autoescape=True)) \
-            .filter(Molt.author.has(deleted=False, banned=False)) \
             .order_by(Molt.timestamp.desc())
         return results
 
@@ -1581,31 +2498,51 @@ class Molt(db.Model):
         return output, urls
 
     @staticmethod
-    def label_mentions(content, absolute_url=False):
+    def extract_mentions(content: str) -> Set[str]:
+        """ Returns the lowercase usernames mentioned in `content`.
+        """
+        return {username.lower()
+                for username in patterns.mention.findall(content)}
+
+    @staticmethod
+    def resolve_mentions(molts: Iterable['Molt']) -> Set[str]:
+        """ Returns the lowercase usernames of available Crabs mentioned in
+            any of `molts`, with a single query. Pass the result to
+            `Molt.rich_content` etc. to render a page of Molts without
+            querying per mention.
+        """
+        usernames = set()
+        for molt in molts:
+            usernames.update(Molt.extract_mentions(molt.content))
+        return Crab.resolve_usernames(usernames)
+
+    @staticmethod
+    def label_mentions(content, absolute_url=False,
+                       usernames: Optional[Set[str]] = None):
         """ Replace mentions with HTML links to users.
+
+            :param usernames: Lowercase usernames of Crabs that can be
+                mentioned. Resolved from `content` if not provided.
         """
-        output = content
-        match = patterns.mention.search(output)
+        if usernames is None:
+            usernames = Crab.resolve_usernames(
+                Molt.extract_mentions(content)
+            )
         base_url = config.BASE_URL if absolute_url else ''
-        if match:
-            start, end = match.span()
-            username_str = output[start:end] \
-                    .replace('<br>', '') \
-                    .strip("@ \t\n")
-            username = Crab.query.filter_by(deleted=False, banned=False) \
-                .filter(Crab.username.ilike(username_str)).first()
-            if username:
-                output = [
-                    output[:start],
+        output = list()
+        position = 0
+        for match in patterns.mention.finditer(content):
+            if match.group(1).lower() in usernames:
+                start, end = match.span()
+                output.append(content[position:start])
+                output.append(
                     f'<a href="{base_url}/user/{match.group(1)}" \
                     class="no-onclick mention zindex-front"> \
-                    {output[start:end]}</a>',
-                    Molt.label_mentions(output[end:])
-                ]
-                output = ''.join(output)
-            else:
-                output = output[:end] + Molt.label_mentions(output[end:])
-        return output
+                    {content[start:end]}</a>'
+                )
+                position = end
+        output.append(content[position:])
+        return ''.join(output)
 
     @staticmethod
     def label_crabtags(content, absolute_url=False):
@@ -1631,15 +2568,40 @@ class Molt(db.Model):
         kwargs['source'] = kwargs.get('source', 'Crabber Web App')
         new_molt = cls(author=author, content=content[:config.MOLT_CHAR_LIMIT],
                        **kwargs)
+        original = new_molt.original_molt
+        if original is not None and (new_molt.is_reply or new_molt.is_quote):
+            if original.conversation_id is None:
+                # Written in the same UPDATE as the original's counter
+                original.conversation_id = original.id
+            new_molt.conversation_id = original.conversation_id
 
         new_molt.evaluate_contents()
         db.session.add(new_molt)
+        new_molt.adjust_original_counter(1)
+        if config.TIMELINE_INBOX_ENABLED and not new_molt.is_reply:
+            # Molt needs an ID before it can be delivered
+            db.session.flush()
+            TimelineEntry.fan_out(new_molt)
         db.session.commit()
+        if not new_molt.is_reply:
+            # Enough for subscribers to apply their timeline filters (see
+            # `Crab.timeline_event_filter`)
+            original = new_molt.original_molt
+            events.publish(events.author_channel(author.id), 'molt', {
+                'id': new_molt.id, 'author_id': author.id,
+                'content': new_molt.content, 'nsfw': new_molt.nsfw,
+                'original_author_id': original.author_id
+                if original else None,
+                'original_nsfw': original.nsfw if original else False,
+            })
         return new_molt
 
 
 class Like(db.Model):
-    __table_args__ = (db.UniqueConstraint('crab_id', 'molt_id'),)
+    __table_args__ = (
+        db.UniqueConstraint('crab_id', 'molt_id'),
+        db.Index('ix_like_molt', 'molt_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     crab_id = db.Column(db.Integer, db.ForeignKey('crab.id'),
                         nullable=False)
@@ -1663,6 +2625,11 @@ class Like(db.Model):
 
 
 class Notification(db.Model):
+    __table_args__ = (
+        db.Index('ix_notification_recipient_read_timestamp',
+                 'recipient_id', 'read', 'timestamp'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     # Crab receiving notif
     recipient_id = db.Column(db.Integer, db.ForeignKey('crab.id'),
@@ -1700,11 +2667,11 @@ class Notification(db.Model):
 
     @property
     def pretty_date(self):
-        return utils.localize(self.timestamp).strftime("%I:%M %p · %b %e, %Y")
+        return localization.pretty_date(self.timestamp)
 
     @property
     def pretty_age(self):
-        return utils.get_pretty_age(self.timestamp)
+        return localization.pretty_age(self.timestamp)
 
     @staticmethod
     def query_all() -> BaseQuery:
@@ -1718,9 +2685,303 @@ class Notification(db.Model):
                 )
             )
 
+    @property
+    def is_counted(self) -> bool:
+        """ Whether this notification counts towards its recipient's unread
+            notifications (when unread).
+        """
+        return self.sender is None or self.sender.is_available
+
     def mark_read(self, is_read=True):
+        if bool(self.read) != is_read and self.is_counted:
+            self.recipient.adjust_unread_notifications(-1 if is_read else 1)
         self.read = is_read
         db.session.commit()
+        self.recipient.publish_unread_notifications()
+
+
+class NotificationGroup(db.Model):
+    """ Pre-aggregated notifications feed. A recipient's likes of a Molt are
+        collapsed into one row, as are remolts of a Molt; every other listed
+        notification gets a row of its own. Each row keeps its count, its
+        latest notification and timestamp, and its latest senders, so the
+        notifications page is a range read on (recipient_id, timestamp).
+
+        Groups are only written while `config.NOTIFICATION_GROUPS_ENABLED` is
+        set. They are updated by `Crab.notify` and rebuilt from `Notification`
+        when a sender becomes (un)available or is (un)blocked.
+    """
+    __tablename__ = 'notification_group'
+    __table_args__ = (
+        db.UniqueConstraint('recipient_id', 'key'),
+        db.Index('ix_notification_group_recipient_timestamp',
+                 'recipient_id', 'timestamp'),
+    )
+
+    # Types collapsed into one row per Molt
+    GROUPED_TYPES = ('like', 'remolt')
+    # Types listed individually
+    LISTED_TYPES = ('other', 'trophy', 'mention', 'quote', 'reply', 'follow')
+    # Number of sender IDs kept per group
+    LATEST_SENDERS = 3
+
+    id = db.Column(db.Integer, primary_key=True)
+    recipient_id = db.Column(db.Integer, db.ForeignKey('crab.id'),
+                             nullable=False)
+    # See `NotificationGroup.make_key`
+    key = db.Column(db.String(64), nullable=False)
+    type = db.Column(db.String(32), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    # Latest notification in the group, rendered by `notif.html`
+    notification_id = db.Column(db.Integer, db.ForeignKey('notification.id'),
+                                nullable=False)
+    notification = db.relationship('Notification')
+    timestamp = db.Column(db.DateTime, nullable=False)
+    _latest_sender_ids = db.Column('latest_sender_ids', db.String(64),
+                                   nullable=False, default='')
+
+    def __repr__(self):
+        return f'<NotificationGroup | {self.recipient_id} | {self.key}>'
+
+    @property
+    def latest_sender_ids(self) -> List[int]:
+        """ IDs of the group's most recent senders, newest first.
+        """
+        return [int(sender_id)
+                for sender_id in self._latest_sender_ids.split(',')
+                if sender_id]
+
+    @staticmethod
+    def make_key(notification_type: str, notification_id: int,
+                 molt_id: Optional[int], original_molt_id: Optional[int]) \
+            -> Optional[str]:
+        """ Returns the key of the group a notification belongs to, or None if
+            it isn't shown on the notifications page.
+        """
+        if notification_type == 'like':
+            return f'like:{molt_id}'
+        elif notification_type == 'remolt':
+            # Remolts whose Molt is gone have nothing to group by
+            if original_molt_id is None:
+                return None
+            return f'remolt:{original_molt_id}'
+        elif notification_type in NotificationGroup.LISTED_TYPES:
+            return f'notification:{notification_id}'
+        return None
+
+    @staticmethod
+    def add(notification: 'Notification'):
+        """ Add a new Notification to its group. Assumes it is visible to its
+            recipient (sent by an available, unblocked Crab).
+        """
+        db.session.flush()
+        molt = notification.molt
+        key = NotificationGroup.make_key(
+            notification.type, notification.id, notification.molt_id,
+            molt.original_molt_id if molt else None
+        )
+        if key is None:
+            return
+        group = NotificationGroup.query \
+            .filter_by(recipient_id=notification.recipient_id, key=key) \
+            .first()
+        if group is None:
+            group = NotificationGroup(recipient_id=notification.recipient_id,
+                                      key=key, type=notification.type,
+                                      count=1)
+            db.session.add(group)
+        else:
+            group.count = NotificationGroup.count + 1
+        group.notification_id = notification.id
+        group.timestamp = notification.timestamp
+        sender_ids = [] if group._latest_sender_ids is None \
+            else group.latest_sender_ids
+        if notification.sender_id is not None:
+            sender_ids = [notification.sender_id] + \
+                [sender_id for sender_id in sender_ids
+                 if sender_id != notification.sender_id]
+        group._latest_sender_ids = ','.join(
+            str(sender_id)
+            for sender_id in sender_ids[:NotificationGroup.LATEST_SENDERS]
+        )
+
+    @staticmethod
+    def rebuild(recipient: Crab, keys: Optional[Iterable[str]] = None):
+        """ Discard and recompute `recipient`'s groups from their visible
+            Notifications. Does not commit.
+
+            :param keys: Only rebuild these groups. Rebuilds every group if
+                omitted.
+        """
+        notifs = Notification.query_all() \
+            .filter_by(recipient_id=recipient.id) \
+            .filter(db.or_(
+                Notification.sender_id == None,
+                Notification.sender_id.notin_(recipient.query_block_ids()),
+            )) \
+            .outerjoin(Molt, Molt.id == Notification.molt_id) \
+            .with_entities(Notification.id, Notification.type,
+                           Notification.molt_id, Molt.original_molt_id,
+                           Notification.sender_id, Notification.timestamp) \
+            .order_by(Notification.timestamp.desc(), Notification.id.desc())
+        existing = NotificationGroup.query.filter_by(recipient_id=recipient.id)
+        if keys is not None:
+            keys = set(keys)
+            conditions = list()
+            for key in keys:
+                kind, _, value = key.partition(':')
+                value = None if value == 'None' else int(value)
+                if kind == 'like':
+                    conditions.append(db.and_(Notification.type == 'like',
+                                              Notification.molt_id == value))
+                elif kind == 'remolt':
+                    conditions.append(db.and_(Notification.type == 'remolt',
+                                              Molt.original_molt_id == value))
+                else:
+                    conditions.append(Notification.id == value)
+            if not conditions:
+                return
+            notifs = notifs.filter(db.or_(*conditions))
+            existing = existing.filter(NotificationGroup.key.in_(keys))
+
+        groups = dict()
+        for notification_id, notification_type, molt_id, original_molt_id, \
+                sender_id, timestamp in notifs:
+            key = NotificationGroup.make_key(notification_type,
+                                             notification_id, molt_id,
+                                             original_molt_id)
+            if key is None or (keys is not None and key not in keys):
+                continue
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = dict(
+                    recipient_id=recipient.id, key=key,
+                    type=notification_type, count=0,
+                    notification_id=notification_id, timestamp=timestamp,
+                    latest_sender_ids=list()
+                )
+            group['count'] += 1
+            senders = group['latest_sender_ids']
+            if sender_id is not None and sender_id not in senders \
+                    and len(senders) < NotificationGroup.LATEST_SENDERS:
+                senders.append(sender_id)
+
+        existing.delete(synchronize_session=False)
+        if groups:
+            for group in groups.values():
+                group['latest_sender_ids'] = ','.join(
+                    str(sender_id) for sender_id in group['latest_sender_ids']
+                )
+            db.session.execute(NotificationGroup.__table__.insert(),
+                               list(groups.values()))
+
+    @staticmethod
+    def rebuild_from_sender(sender: Crab,
+                            recipient_ids: Optional[Iterable[int]] = None):
+        """ Rebuild every group containing a Notification sent by `sender`.
+            Does not commit.
+
+            :param recipient_ids: Only rebuild these recipients' groups.
+        """
+        db.session.flush()
+        rows = db.session.query(Notification.recipient_id, Notification.id,
+                                Notification.type, Notification.molt_id,
+                                Molt.original_molt_id) \
+            .outerjoin(Molt, Molt.id == Notification.molt_id) \
+            .filter(Notification.sender_id == sender.id)
+        if recipient_ids is not None:
+            rows = rows.filter(Notification.recipient_id.in_(recipient_ids))
+        keys = dict()
+        for recipient_id, notification_id, notification_type, molt_id, \
+                original_molt_id in rows:
+            key = NotificationGroup.make_key(notification_type,
+                                             notification_id, molt_id,
+                                             original_molt_id)
+            if key is not None:
+                keys.setdefault(recipient_id, set()).add(key)
+        if keys:
+            for recipient in Crab.query.filter(Crab.id.in_(keys)):
+                NotificationGroup.rebuild(recipient, keys[recipient.id])
+
+
+class TimelineEntry(db.Model):
+    """ Materialized home timeline. Each row delivers a Molt to the timeline of
+        one Crab (its author and each of their followers) so that reading a
+        timeline is a range read on (crab_id, timestamp).
+
+        Entries are only written while `config.TIMELINE_INBOX_ENABLED` is set.
+        Deleted Molts and banned authors are filtered out when reading.
+    """
+    __tablename__ = 'timeline_entry'
+    __table_args__ = (
+        db.UniqueConstraint('crab_id', 'molt_id'),
+        db.Index('ix_timeline_entry_crab_timestamp', 'crab_id', 'timestamp'),
+        db.Index('ix_timeline_entry_crab_author', 'crab_id', 'author_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    # Crab whose timeline this is
+    crab_id = db.Column(db.Integer, db.ForeignKey('crab.id'), nullable=False)
+    molt_id = db.Column(db.Integer, db.ForeignKey('molt.id'), nullable=False)
+    # Copied from Molt so entries can be purged/sorted without a join
+    author_id = db.Column(db.Integer, db.ForeignKey('crab.id'),
+                          nullable=False)
+    timestamp = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<TimelineEntry | {self.crab_id} | {self.molt_id}>'
+
+    @staticmethod
+    def fan_out(molt: 'Molt'):
+        """ Deliver a new Molt to the timelines of its author and all of their
+            followers.
+        """
+        follower_ids = db.session.query(following_table.c.follower_id) \
+            .filter(following_table.c.following_id == molt.author_id)
+        recipient_ids = {molt.author_id}
+        recipient_ids.update(row[0] for row in follower_ids)
+        db.session.execute(
+            TimelineEntry.__table__.insert(),
+            [dict(crab_id=crab_id, molt_id=molt.id,
+                  author_id=molt.author_id, timestamp=molt.timestamp)
+             for crab_id in recipient_ids]
+        )
+
+    @staticmethod
+    def backfill(crab: Crab, author_ids: Iterable[int]):
+        """ Copy every timeline-eligible Molt by `author_ids` into `crab`'s
+            timeline. Molts that are already there are skipped.
+        """
+        existing = db.session.query(TimelineEntry.molt_id) \
+            .filter(TimelineEntry.crab_id == crab.id)
+        molts = db.session.query(
+            expression.literal(crab.id), Molt.id, Molt.author_id,
+            Molt.timestamp
+        ) \
+            .filter(Molt.author_id.in_(author_ids), Molt.is_reply == False) \
+            .filter(Molt.id.notin_(existing))
+        db.session.execute(
+            TimelineEntry.__table__.insert().from_select(
+                ('crab_id', 'molt_id', 'author_id', 'timestamp'),
+                molts.statement
+            )
+        )
+
+    @staticmethod
+    def purge(crab: Crab, author: Crab):
+        """ Remove all of `author`'s Molts from `crab`'s timeline.
+        """
+        TimelineEntry.query \
+            .filter_by(crab_id=crab.id, author_id=author.id) \
+            .delete(synchronize_session=False)
+
+    @staticmethod
+    def rebuild(crab: Crab):
+        """ Discard and rebuild `crab`'s timeline from who they follow.
+        """
+        TimelineEntry.query.filter_by(crab_id=crab.id) \
+            .delete(synchronize_session=False)
+        TimelineEntry.backfill(crab, [crab.id, *crab.following_ids])
 
 
 # Stores what users have what trophies
@@ -1768,6 +3029,10 @@ class Trophy(db.Model):
 
 class DeveloperKey(db.Model):
     __tablename__ = 'developer_keys'
+    __table_args__ = (
+        db.Index('ux_developer_keys_key', 'key', unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     key = db.Column(db.String(64), nullable=False)
     crab_id = db.Column(db.Integer, db.ForeignKey('crab.id'), nullable=False)
@@ -1799,6 +3064,10 @@ class DeveloperKey(db.Model):
 
 class AccessToken(db.Model):
     __tablename__ = 'access_tokens'
+    __table_args__ = (
+        db.Index('ux_access_tokens_key', 'key', unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     key = db.Column(db.String(64), nullable=False)
     crab_id = db.Column(db.Integer, db.ForeignKey('crab.id'), nullable=False)
@@ -1830,6 +3099,10 @@ class AccessToken(db.Model):
 
 class Crabtag(db.Model):
     __tablename__ = 'crabtag'
+    # Not unique: concurrent `Crabtag.get` calls may have created duplicates
+    __table_args__ = (
+        db.Index('ix_crabtag_name', 'name'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(512), nullable=False)
@@ -1837,6 +3110,9 @@ class Crabtag(db.Model):
     molts = db.relationship('Molt', secondary=crabtag_table,
                             back_populates='tags')
 
+    # Results of `get_trending` per limit, as (expires, trending)
+    _trending_cache = dict()
+
     def __repr__(self):
         return f'<Crabtag \'%{self.name}\'>'
 
@@ -1862,16 +3138,28 @@ class Crabtag(db.Model):
         return most_popular
 
     @staticmethod
-    def get_trending(limit: int = 3) -> List[Tuple['Crabtag', int]]:
-        """ Return most popular Crabtags of the last week.
+    def get_trending(limit: int = 3) -> List[Tuple['TrendingCrabtag', int]]:
+        """ Return most popular Crabtags of the last week, as (tag, uses).
+            Results are reused for `config.TRENDING_CACHE_TTL` seconds.
 
             :param limit: Number of results to return.
         """
-        # Get date of 7 days ago
-        since_date = datetime.datetime.utcnow() - datetime.timedelta(7)
+        cached = Crabtag._trending_cache.get(limit)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
 
-        return Crabtag.query_most_popular(since_date=since_date) \
-            .limit(limit).all()
+        if config.TRENDING_COUNTERS_ENABLED:
+            trending = CrabtagUsage.query_trending().limit(limit).all()
+        else:
+            # Get date of 7 days ago
+            since_date = datetime.datetime.utcnow() - datetime.timedelta(7)
+            trending = Crabtag.query_most_popular(since_date=since_date) \
+                .limit(limit).all()
+        trending = [(TrendingCrabtag(tag.id, tag.name), uses)
+                    for tag, uses in trending]
+        Crabtag._trending_cache[limit] = \
+            (time.monotonic() + config.TRENDING_CACHE_TTL, trending)
+        return trending
 
     @classmethod
     def get(cls, name: str) -> 'Crabtag':
@@ -1884,8 +3172,354 @@ class Crabtag(db.Model):
         return crabtag
 
 
+class TrendingCrabtag(NamedTuple):
+    """ Crabtag as returned by `Crabtag.get_trending`, safe to share between
+        requests.
+    """
+    id: int
+    name: str
+
+
+class CrabtagUsage(db.Model):
+    """ Uses of each Crabtag by available Molts, counted per hour, for ranking
+        trending Crabtags over a sliding window without grouping every recent
+        `crabtag_links` row.
+
+        Counts are only written while `config.TRENDING_COUNTERS_ENABLED` is
+        set. They are adjusted as Molts are posted, edited, deleted and
+        restored, and recounted for an author's Crabtags when they become
+        (un)available. Buckets that have left the window are ignored and
+        deleted when a Crabtag gets a new one.
+    """
+    __tablename__ = 'crabtag_usage'
+    __table_args__ = (
+        db.UniqueConstraint('crabtag_id', 'bucket'),
+        db.Index('ix_crabtag_usage_bucket', 'bucket'),
+    )
+
+    BUCKET = datetime.timedelta(hours=1)
+    WINDOW = datetime.timedelta(days=7)
+
+    id = db.Column(db.Integer, primary_key=True)
+    crabtag_id = db.Column(db.Integer, db.ForeignKey('crabtag.id'),
+                           nullable=False)
+    crabtag = db.relationship('Crabtag')
+    # Start of the hour the uses were posted in
+    bucket = db.Column(db.DateTime, nullable=False)
+    uses = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<CrabtagUsage | {self.crabtag_id} | {self.bucket}>'
+
+    @staticmethod
+    def get_bucket(timestamp: datetime.datetime) -> datetime.datetime:
+        """ Returns the start of the bucket `timestamp` falls in.
+        """
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+
+    @staticmethod
+    def window_start() -> datetime.datetime:
+        """ Returns the start of the oldest bucket in the window. The window
+            covers up to one bucket more than `WINDOW`.
+        """
+        return CrabtagUsage.get_bucket(
+            datetime.datetime.utcnow() - CrabtagUsage.WINDOW
+        )
+
+    @staticmethod
+    def query_trending() -> BaseQuery:
+        """ Returns a query of (tag: Crabtag, uses: int) in the window ordered
+            by uses descending.
+        """
+        uses = func.sum(CrabtagUsage.uses).label('uses')
+        return db.session.query(Crabtag, uses) \
+            .join(CrabtagUsage, CrabtagUsage.crabtag_id == Crabtag.id) \
+            .filter(CrabtagUsage.bucket >= CrabtagUsage.window_start()) \
+            .group_by(Crabtag.id) \
+            .having(uses > 0) \
+            .order_by(desc('uses'), Crabtag.id)
+
+    @staticmethod
+    def adjust(crabtag_ids: Iterable[int], timestamp: datetime.datetime,
+               amount: int):
+        """ Add `amount` uses of each Crabtag in `crabtag_ids` at `timestamp`.
+            Does not commit.
+        """
+        bucket = CrabtagUsage.get_bucket(timestamp)
+        window_start = CrabtagUsage.window_start()
+        if bucket < window_start:
+            return
+        for crabtag_id in set(crabtag_ids):
+            usage = CrabtagUsage.query \
+                .filter_by(crabtag_id=crabtag_id, bucket=bucket) \
+                .first()
+            if usage is None:
+                CrabtagUsage.query \
+                    .filter(CrabtagUsage.crabtag_id == crabtag_id,
+                            CrabtagUsage.bucket < window_start) \
+                    .delete(synchronize_session=False)
+                db.session.add(CrabtagUsage(crabtag_id=crabtag_id,
+                                            bucket=bucket, uses=amount))
+            else:
+                usage.uses = CrabtagUsage.uses + amount
+        db.session.flush()
+
+    @staticmethod
+    def adjust_molt(molt: 'Molt', crabtag_ids: Iterable[int], amount: int):
+        """ Add or remove a Molt's uses of `crabtag_ids` (each Crabtag is
+            used once per Molt, however often it appears), if it is counted
+            (not deleted, and by an available author).
+        """
+        if config.TRENDING_COUNTERS_ENABLED and not molt.deleted \
+                and molt.author.is_available:
+            CrabtagUsage.adjust(crabtag_ids,
+                                molt.timestamp or datetime.datetime.utcnow(),
+                                amount)
+
+    @staticmethod
+    def count_uses(crabtag_ids: Optional[Iterable[int]] = None) \
+            -> Counter:
+        """ Count uses of Crabtags by available Molts in the window from
+            `crabtag_links`.
+
+            :param crabtag_ids: Crabtags to count. Counts every Crabtag if
+                omitted.
+            :return: Counter of (crabtag_id, bucket) to uses.
+        """
+        links = db.session.query(crabtag_table.c.tag_id, Molt.timestamp) \
+            .join(Molt, Molt.id == crabtag_table.c.molt_id) \
+            .filter(Molt.timestamp >= CrabtagUsage.window_start())
+        links = Molt.filter_query_by_available(links)
+        if crabtag_ids is not None:
+            links = links.filter(crabtag_table.c.tag_id.in_(crabtag_ids))
+        return Counter((crabtag_id, CrabtagUsage.get_bucket(timestamp))
+                       for crabtag_id, timestamp in links)
+
+    @staticmethod
+    def rebuild(crabtag_ids: Optional[Iterable[int]] = None):
+        """ Discard and recount the window's buckets, and delete buckets that
+            have left it. Does not commit.
+
+            :param crabtag_ids: Only rebuild these Crabtags. Rebuilds every
+                Crabtag if omitted.
+        """
+        existing = CrabtagUsage.query
+        if crabtag_ids is not None:
+            crabtag_ids = set(crabtag_ids)
+            if not crabtag_ids:
+                return
+            existing = existing \
+                .filter(CrabtagUsage.crabtag_id.in_(crabtag_ids))
+        uses = CrabtagUsage.count_uses(crabtag_ids)
+        existing.delete(synchronize_session=False)
+        for (crabtag_id, bucket), count in uses.items():
+            db.session.add(CrabtagUsage(crabtag_id=crabtag_id, bucket=bucket,
+                                        uses=count))
+        db.session.flush()
+
+    @staticmethod
+    def rebuild_from_author(author: 'Crab'):
+        """ Recount the Crabtags `author` has used in the window, after they
+            become (un)available. Does not commit.
+        """
+        crabtag_ids = db.session.query(crabtag_table.c.tag_id) \
+            .join(Molt, Molt.id == crabtag_table.c.molt_id) \
+            .filter(Molt.author_id == author.id,
+                    Molt.timestamp >= CrabtagUsage.window_start()) \
+            .distinct()
+        CrabtagUsage.rebuild({crabtag_id for crabtag_id, in crabtag_ids})
+
+    @staticmethod
+    def audit() -> List[Tuple[str, int, int]]:
+        """ Compare trending counts in the window against the original
+            `Crabtag.query_most_popular` query.
+
+            :return: List of (crabtag name, stored, actual) for every Crabtag
+                whose count has drifted.
+        """
+        since_date = CrabtagUsage.window_start() \
+            - datetime.timedelta(microseconds=1)
+        actual = {tag.name: uses for tag, uses in
+                  Crabtag.query_most_popular(since_date=since_date)}
+        stored = {tag.name: uses for tag, uses in
+                  CrabtagUsage.query_trending()}
+        return [(name, stored.get(name, 0), actual.get(name, 0))
+                for name in sorted(set(actual) | set(stored))
+                if stored.get(name, 0) != actual.get(name, 0)]
+
+
+class StatsSnapshot(db.Model):
+    """ Site-wide aggregates shown on the stats page, built periodically by
+        `scripts/build_stats_snapshot.py` (used when
+        `config.STATS_SNAPSHOT_ENABLED` is set).
+
+        Rankings keep their top `CANDIDATES` entries so that each viewer's
+        blocks and content filters can be applied to them with a lookup by ID
+        (see `get_stats`) instead of re-running the rankings.
+    """
+    __tablename__ = 'stats_snapshot'
+
+    # Number of entries kept per ranking
+    CANDIDATES = 20
+
+    id = db.Column(db.Integer, primary_key=True)
+    # When the snapshot was built
+    timestamp = db.Column(db.DateTime, nullable=False, index=True,
+                          default=datetime.datetime.utcnow)
+    # How long it took to build, in seconds
+    build_seconds = db.Column(db.Float, nullable=False, default=0)
+    _data = db.Column('data', db.Text, nullable=False, default='{}')
+
+    def __repr__(self):
+        return f'<StatsSnapshot | {self.timestamp}>'
+
+    @property
+    def data(self) -> dict:
+        return json.loads(self._data)
+
+    @property
+    def age(self) -> datetime.timedelta:
+        return datetime.datetime.utcnow() - self.timestamp
+
+    @staticmethod
+    def get_latest() -> Optional['StatsSnapshot']:
+        return StatsSnapshot.query \
+            .order_by(StatsSnapshot.timestamp.desc()).first()
+
+    @staticmethod
+    def build() -> 'StatsSnapshot':
+        """ Compute a new snapshot. Does not commit.
+        """
+        started = time.perf_counter()
+        limit = StatsSnapshot.CANDIDATES
+
+        trendy_tag = (Crabtag.query_most_popular().first() or (None,))[0]
+        trendy_tag_molts = list()
+        if trendy_tag:
+            trendy_tag_molts = [
+                molt.id for molt in Molt.order_query_by_likes(
+                    trendy_tag.query_molts()
+                ).limit(limit)
+            ]
+
+        data = dict(
+            users=Crab.query.filter_by(deleted=False, banned=False).count(),
+            molts=Molt.query.count(),
+            deleted_molts=Molt.query.filter_by(deleted=True).count(),
+            likes=Like.query.count(),
+            trophies=TrophyCase.query.count(),
+            most_followed=[
+                [crab.id, followers] for crab, followers
+                in Crab.query_most_popular().limit(limit)
+            ],
+            newest=[
+                crab.id for crab in Crab.query_all()
+                .order_by(Crab.register_time.desc()).limit(limit)
+            ],
+            most_liked=[
+                [molt.id, likes] for molt, likes
+                in Molt.query_most_liked().limit(limit)
+            ],
+            most_replied=[
+                molt.id for molt in Molt.query_most_replied().limit(limit)
+            ],
+            trendy_tag=trendy_tag.id if trendy_tag else None,
+            trendy_tag_molts=trendy_tag_molts,
+        )
+        snapshot = StatsSnapshot(_data=json.dumps(data),
+                                 timestamp=datetime.datetime.utcnow(),
+                                 build_seconds=time.perf_counter() - started)
+        db.session.add(snapshot)
+        return snapshot
+
+    @staticmethod
+    def prune(keep: int = 10) -> int:
+        """ Delete all but the newest `keep` snapshots. Does not commit.
+
+            :return: Number of snapshots deleted.
+        """
+        keep_ids = [snapshot_id for snapshot_id, in db.session
+                    .query(StatsSnapshot.id)
+                    .order_by(StatsSnapshot.timestamp.desc())
+                    .limit(keep)]
+        return StatsSnapshot.query \
+            .filter(StatsSnapshot.id.notin_(keep_ids)) \
+            .delete(synchronize_session=False)
+
+    def get_stats(self, viewer: Optional[Crab] = None) -> dict:
+        """ Returns the stats page's stats as seen by `viewer`: rankings skip
+            Crabs and Molts that have since become unavailable or that the
+            viewer's blocks and content filters hide.
+        """
+        data = self.data
+        block_ids = viewer.block_ids if viewer else frozenset()
+
+        crab_ids = [crab_id for crab_id, _ in data['most_followed']] \
+            + data['newest']
+        crabs = {crab.id: crab for crab in Crab.query_all().filter(
+            Crab.id.in_(crab_ids)
+        )} if crab_ids else dict()
+
+        def visible_crabs(ids: Iterable[int]) -> List[Crab]:
+            return [crabs[crab_id] for crab_id in ids
+                    if crab_id in crabs and crab_id not in block_ids]
+
+        molt_ids = [molt_id for molt_id, _ in data['most_liked']] \
+            + data['most_replied'] + data['trendy_tag_molts']
+        molts = dict()
+        if molt_ids:
+            visible = Molt.filter_query_by_available(
+                Molt.query.filter(Molt.id.in_(molt_ids))
+            )
+            if viewer:
+                visible = viewer.filter_molt_query(visible)
+                visible = viewer.filter_muted_molts(visible)
+            molts = {molt.id: molt for molt in visible}
+
+        def visible_molts(ids: Iterable[int]) -> List[Molt]:
+            return [molts[molt_id] for molt_id in ids if molt_id in molts]
+
+        followers = dict(data['most_followed'])
+        crab_king = next((
+            (crab, followers[crab.id]) for crab
+            in visible_crabs(followers)
+        ), None)
+        likes = dict(data['most_liked'])
+        best_molt = next((
+            (molt, likes[molt.id]) for molt in visible_molts(likes)
+        ), None)
+        trendy_tag = Crabtag.query.get(data['trendy_tag']) \
+            if data['trendy_tag'] else None
+
+        return dict(
+            users=data['users'],
+            mini_stats=[
+                dict(number=data['molts'],
+                     label="molts sent"),
+                dict(number=data['deleted_molts'],
+                     label="molts deleted",
+                     sublabel="what are they hiding?"),
+                dict(number=data['likes'],
+                     label="likes given"),
+                dict(number=data['trophies'],
+                     label="trophies awarded")
+            ],
+            crab_king=crab_king,
+            baby_crab=next(iter(visible_crabs(data['newest'])), None),
+            best_molt=best_molt,
+            talked_molt=next(iter(visible_molts(data['most_replied'])), None),
+            trendy_tag=trendy_tag,
+            trendy_tag_molts=visible_molts(data['trendy_tag_molts'])[:3],
+            snapshot=self,
+        )
+
+
 class Card(db.Model):
     __tablename__ = 'card'
+    # Prefix index on MySQL, whose index keys are limited to 3072 bytes
+    __table_args__ = (
+        db.Index('ix_card_url', 'url', mysql_length=255),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     url = db.Column(db.String(1024))
@@ -0,0 +1,132 @@
+""" Muted-word matching in Python (enabled by
+    `config.MUTED_WORDS_MATCHER_ENABLED`).
+
+    Instead of adding a `NOT content ILIKE '%word%'` clause per muted word to
+    every feed query, each Crab's muted words are compiled once into an
+    Aho-Corasick automaton that finds all of them in a single pass over a
+    Molt's content. Feeds over-fetch and drop matching Molts after the query
+    (see `pagination.paginate`).
+"""
+from collections import OrderedDict, deque
+import config
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+class MutedWordMatcher:
+    """ Aho-Corasick automaton over a set of lowercase words. Matches are
+        case-insensitive substrings, like `ILIKE '%word%'`.
+    """
+    def __init__(self, words: Iterable[str]):
+        self.words: Tuple[str, ...] = tuple(sorted(
+            {word.lower() for word in words if word}
+        ))
+        # State 0 is the root; each state has goto transitions, a failure
+        # link, and the words that end there (including via failure links)
+        self._goto: List[Dict[str, int]] = [dict()]
+        self._fail: List[int] = [0]
+        self._output: List[Set[str]] = [set()]
+
+        for word in self.words:
+            state = 0
+            for char in word:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append(dict())
+                    self._fail.append(0)
+                    self._output.append(set())
+                    self._goto[state][char] = next_state
+                state = next_state
+            self._output[state].add(word)
+
+        # Breadth-first so failure links point at already-finished states
+        pending = deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, next_state in self._goto[state].items():
+                pending.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[next_state] = fail if fail != next_state else 0
+                self._output[next_state] |= self._output[
+                    self._fail[next_state]
+                ]
+
+    def __bool__(self):
+        return bool(self.words)
+
+    def _scan(self, text: str):
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for char in text.lower():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                yield output[state]
+
+    def search(self, text: Optional[str]) -> bool:
+        """ Whether `text` contains any of the words.
+        """
+        if not text or not self.words:
+            return False
+        for _ in self._scan(text):
+            return True
+        return False
+
+    def findall(self, text: Optional[str]) -> Set[str]:
+        """ Returns the set of words found in `text`.
+        """
+        found = set()
+        if text and self.words:
+            for words in self._scan(text):
+                found |= words
+        return found
+
+
+class MatcherCache:
+    """ Bounded, thread-safe LRU of compiled matchers keyed by Crab ID.
+
+        Entries remember the muted-words string they were compiled from, so a
+        change saved by another process is picked up on the next lookup.
+    """
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: 'OrderedDict[int, Tuple[str, MutedWordMatcher]]' = \
+            OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, crab_id: int, muted_words: str) -> MutedWordMatcher:
+        """ Returns the matcher for a Crab's comma-separated muted words,
+            compiling it if needed.
+        """
+        with self._lock:
+            entry = self._entries.get(crab_id)
+            if entry is not None and entry[0] == muted_words:
+                self._entries.move_to_end(crab_id)
+                return entry[1]
+        matcher = MutedWordMatcher(muted_words.split(','))
+        if self.maxsize > 0:
+            with self._lock:
+                self._entries[crab_id] = (muted_words, matcher)
+                self._entries.move_to_end(crab_id)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return matcher
+
+    def invalidate(self, crab_id: int):
+        """ Forget a Crab's matcher (e.g. after they change their muted
+            words).
+        """
+        with self._lock:
+            self._entries.pop(crab_id, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+matchers = MatcherCache(config.MUTED_WORDS_MATCHER_CACHE_SIZE)
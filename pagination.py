@@ -0,0 +1,266 @@
+""" Keyset (cursor) pagination for feeds ordered newest-first.
+
+    Pages are addressed by opaque `before`/`after` tokens that encode the
+    (timestamp, id) of the last/first item of a neighbouring page, so fetching
+    a page is a bounded range read no matter how deep the reader is, and no
+    `COUNT(*)` is ever needed. Integer sort keys (e.g. follower counts) work
+    the same way.
+"""
+import base64
+import binascii
+from config import MOLTS_PER_PAGE, MUTED_WORDS_MAX_BATCHES, \
+    MUTED_WORDS_OVERFETCH
+import datetime
+from flask import request
+from flask_sqlalchemy import BaseQuery
+import models
+from sqlalchemy import and_, or_
+from typing import Any, Callable, Iterator, List, Optional, Tuple, Union
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+class CursorPagination:
+    """ A single page of results. Mirrors the parts of flask_sqlalchemy's
+        `Pagination` that templates use, with cursors in place of page
+        numbers.
+    """
+    def __init__(self, items: List[Any], per_page: int, has_next: bool,
+                 has_prev: bool, next_cursor: Optional[str],
+                 prev_cursor: Optional[str]):
+        self.items = items
+        self.per_page = per_page
+        self.has_next = has_next
+        self.has_prev = has_prev
+        # Pass as `before` to get the next (older) page
+        self.next_cursor = next_cursor
+        # Pass as `after` to get the previous (newer) page
+        self.prev_cursor = prev_cursor
+
+    def __repr__(self):
+        return f'<CursorPagination ({len(self.items)} items)>'
+
+
+def encode_cursor(value: Union[datetime.datetime, int], id: int) -> str:
+    """ Encode a (timestamp or integer, id) key into an opaque URL-safe token.
+    """
+    if isinstance(value, datetime.datetime):
+        micros = (value - EPOCH) // datetime.timedelta(microseconds=1)
+        raw = f'{micros}:{id}'.encode()
+    else:
+        raw = f'n{value}:{id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token: Optional[str]) \
+        -> Optional[Tuple[Union[datetime.datetime, int], int]]:
+    """ Decode a token made by `encode_cursor`. Returns None if the token is
+        missing or malformed.
+    """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        value, id = raw.decode().split(':')
+        if value.startswith('n'):
+            return int(value[1:]), int(id)
+        timestamp = EPOCH + datetime.timedelta(microseconds=int(value))
+        return timestamp, int(id)
+    except (binascii.Error, UnicodeDecodeError, ValueError, OverflowError):
+        return None
+
+
+def get_cursor_args(prefix: str = '') -> Tuple[Optional[str], Optional[str]]:
+    """ Read the (before, after) cursor tokens from the current request.
+
+        :param prefix: Prefix of the argument names for pages that have more
+            than one feed (e.g. 'molts-' for 'molts-before').
+    """
+    return (request.args.get(f'{prefix}before'),
+            request.args.get(f'{prefix}after'))
+
+
+def cursor_query(before: Optional[str] = None, after: Optional[str] = None,
+                 prefix: str = '') -> str:
+    """ Build the query string fragment that requests the given page, for
+        client-side loaders to pass back.
+    """
+    if before:
+        return f'{prefix}before={before}'
+    elif after:
+        return f'{prefix}after={after}'
+    return ''
+
+
+def _seek(query: BaseQuery, sort_column: Any, id_column: Any,
+          key: Tuple[Any, int], ascending: bool) -> BaseQuery:
+    value, id = key
+    if ascending:
+        return query.filter(or_(sort_column > value,
+                                and_(sort_column == value, id_column > id)))
+    return query.filter(or_(sort_column < value,
+                            and_(sort_column == value, id_column < id)))
+
+
+def paginate(query: BaseQuery, before: Optional[str] = None,
+             after: Optional[str] = None, per_page: int = MOLTS_PER_PAGE,
+             key: Optional[Tuple[Any, Any]] = None,
+             exclude: Optional[Callable[[Any], bool]] = None) \
+        -> CursorPagination:
+    """ Fetch one page of `query` ordered by `key` descending.
+
+        :param query: Query to paginate. Any existing ordering is replaced.
+        :param before: Cursor; return items older than this one.
+        :param after: Cursor; return items newer than this one. Ignored if
+            `before` is set.
+        :param per_page: Maximum number of items to return.
+        :param key: (timestamp or integer column, unique id column) to order
+            and seek on. Defaults to (Molt.timestamp, Molt.id).
+        :param exclude: Drops fetched items it returns True for (e.g.
+            `Crab.muted_molt_filter`). Rows are then fetched in over-sized
+            batches until the page is full; if `MUTED_WORDS_MAX_BATCHES` runs
+            out first, the page is short and its cursor continues from the
+            last row read.
+    """
+    sort_column, id_column = key or (models.Molt.timestamp, models.Molt.id)
+    before_key = decode_cursor(before)
+    after_key = None if before_key else decode_cursor(after)
+    ascending = after_key is not None
+
+    query = query.add_columns(sort_column, id_column).order_by(None)
+    if ascending:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+    else:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+
+    seek_key = after_key or before_key
+    if exclude is None:
+        if seek_key:
+            query = _seek(query, sort_column, id_column, seek_key, ascending)
+        rows = query.limit(per_page + 1).all()
+        last_key = None
+    else:
+        batch_size = (per_page + 1) * MUTED_WORDS_OVERFETCH
+        rows = list()
+        for _ in range(MUTED_WORDS_MAX_BATCHES):
+            batch_query = query
+            if seek_key:
+                batch_query = _seek(query, sort_column, id_column, seek_key,
+                                    ascending)
+            batch = batch_query.limit(batch_size).all()
+            rows.extend(row for row in batch if not exclude(row[0]))
+            seek_key = tuple(batch[-1][-2:]) if batch else seek_key
+            if len(rows) > per_page or len(batch) < batch_size:
+                last_key = None
+                break
+        else:
+            # Gave up on filling the page; continue from the last row read
+            last_key = seek_key
+    has_more = len(rows) > per_page or last_key is not None
+    rows = rows[:per_page]
+
+    if after_key:
+        rows.reverse()
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, before_key is not None
+
+    items = [row[0] for row in rows]
+    next_cursor = prev_cursor = None
+    if rows:
+        next_cursor = encode_cursor(*rows[-1][-2:])
+        prev_cursor = encode_cursor(*rows[0][-2:])
+    if last_key is not None:
+        if after_key:
+            prev_cursor = encode_cursor(*last_key)
+        else:
+            next_cursor = encode_cursor(*last_key)
+    if after_key and next_cursor is None:
+        # Nothing newer was left; older pages continue from `after` itself
+        next_cursor = after
+    return CursorPagination(items, per_page, has_next, has_prev,
+                            next_cursor, prev_cursor)
+
+
+def paginate_ranked(query: BaseQuery, before: Optional[str] = None,
+                    after: Optional[str] = None,
+                    per_page: int = MOLTS_PER_PAGE,
+                    exclude: Optional[Callable[[Any], bool]] = None) \
+        -> CursorPagination:
+    """ Fetch one page of `query` in its own order, for orderings with no
+        seekable key (e.g. full-text relevance). Cursors encode offsets into
+        the results instead, so deep pages cost more than with `paginate`.
+
+        :param before: Cursor; return the page starting at this offset.
+        :param after: Cursor; return the page starting at this offset. Used
+            if `before` is not set.
+        :param exclude: As for `paginate`. The previous page's cursor then
+            assumes no rows were dropped, so it may overlap this page.
+    """
+    cursor = decode_cursor(before) or decode_cursor(after)
+    offset = cursor[0] if cursor and isinstance(cursor[0], int) else 0
+    offset = max(offset, 0)
+
+    if exclude is None:
+        rows = query.limit(per_page + 1).offset(offset).all()
+        read = min(len(rows), per_page)
+        has_more = len(rows) > per_page
+        items = rows[:per_page]
+    else:
+        batch_size = (per_page + 1) * MUTED_WORDS_OVERFETCH
+        items = list()
+        read = 0
+        has_more = False
+        for _ in range(MUTED_WORDS_MAX_BATCHES):
+            batch = query.limit(batch_size).offset(offset + read).all()
+            for row in batch:
+                if len(items) == per_page:
+                    has_more = True
+                    break
+                read += 1
+                if not exclude(row):
+                    items.append(row)
+            if has_more or len(batch) < batch_size:
+                break
+        else:
+            # Gave up on filling the page; continue from the last row read
+            has_more = True
+
+    next_cursor = encode_cursor(offset + read, 0) if has_more else None
+    prev_cursor = encode_cursor(max(offset - per_page, 0), 0) \
+        if offset else None
+    return CursorPagination(items, per_page, has_more, offset > 0,
+                            next_cursor, prev_cursor)
+
+
+def chunks(query: BaseQuery, chunk_size: int = MOLTS_PER_PAGE,
+           key: Optional[Tuple[Any, Any]] = None,
+           ascending: bool = True) -> Iterator[List[Any]]:
+    """ Read all of `query` as lists of at most `chunk_size` items, each
+        fetched with its own keyset range read when the previous one has been
+        consumed (unlike `yield_per`, no cursor is left open in between, so
+        other queries can run while a chunk is being used).
+
+        :param key: (timestamp or integer column, unique id column) to order
+            and seek on. Defaults to (Molt.timestamp, Molt.id).
+        :param ascending: Oldest first (default) or newest first.
+    """
+    sort_column, id_column = key or (models.Molt.timestamp, models.Molt.id)
+    query = query.add_columns(sort_column, id_column).order_by(None)
+    if ascending:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+    else:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+
+    seek_key = None
+    while True:
+        chunk_query = query
+        if seek_key:
+            chunk_query = _seek(query, sort_column, id_column, seek_key,
+                                ascending)
+        rows = chunk_query.limit(chunk_size).all()
+        if rows:
+            yield [row[0] for row in rows]
+            seek_key = tuple(rows[-1][-2:])
+        if len(rows) < chunk_size:
+            return
@@ -0,0 +1,237 @@
+""" Batched preloading for pages of Molts.
+
+    Rendering `molt.html` for a Molt needs its author, the Molt (and author)
+    it remolts/quotes/replies to, the Crabs it mentions, and whether the
+    viewer has liked, remolted or bookmarked it. Looked up one Molt at a time
+    that is several queries per Molt; `PreloadedPage` resolves them for a
+    whole page with a fixed number of `IN (...)` queries and templates read
+    the results from it. Inline reply chains below the page's Molts are
+    loaded the same way, with one recursive query (see
+    `Molt.load_reply_chains`).
+"""
+from extensions import db
+import models
+from typing import Any, Callable, Dict, Iterable, Iterator, List, \
+    Optional, Set, Tuple, Union
+
+# Rounds of original Molts to follow (e.g. a remolt of a quote of a Molt)
+ORIGINAL_DEPTH = 2
+
+# Whose replies to show below a page's Molts: a Crab (or Crab ID), each
+# Molt's own author ('author'), or the viewer and Crabs they follow
+# ('following')
+RepliesFrom = Union['models.Crab', int, str, None]
+
+
+class PreloadedPage:
+    """ View-model for a page of Molts, passed to templates as `preloaded`.
+
+        Lookups for Molts that weren't part of the page fall back to querying
+        for that Molt alone, so partially covered templates stay correct.
+    """
+    def __init__(self, items: Iterable[Any],
+                 viewer: Optional['models.Crab'] = None,
+                 replies_from: RepliesFrom = None,
+                 depth_limit: int = models.REPLY_CHAIN_DEPTH):
+        """
+            :param items: Molts, or objects with a `molt_id` (Bookmarks,
+                Likes).
+            :param viewer: Crab whose likes/remolts/bookmarks to resolve.
+            :param replies_from: Load the reply chains `molt.html` shows
+                below the page's Molts, as passed to it in
+                `show_replies_from`, or 'author' for each Molt's author.
+            :param depth_limit: The `depth_limit` passed to `molt.html`.
+        """
+        self.viewer = viewer
+        self.replies_from = replies_from
+        self.depth_limit = depth_limit
+        # Strong references keep preloaded rows in the session's identity map
+        # so relationship access (`molt.author`, `molt.original_molt`) is
+        # served without another query.
+        self._molts: Dict[int, 'models.Molt'] = dict()
+        self._authors: Dict[int, 'models.Crab'] = dict()
+        self._liked: Set[int] = set()
+        self._bookmarked: Set[int] = set()
+        self._remolts: Dict[int, 'models.Molt'] = dict()
+        # Reply shown below each (Molt ID, replies-from Crab ID) loaded
+        self._replies: Dict[Tuple[int, Optional[int]],
+                            Optional['models.Molt']] = dict()
+        # Mentionable usernames, for `Molt.rich_content`
+        self.usernames: Set[str] = set()
+
+        self.extend(items)
+
+    def extend(self, items: Iterable[Any]):
+        """ Preload more items for this page (e.g. the next chunk of a
+            streamed page). Only what isn't loaded yet is queried.
+        """
+        items = list(items)
+        known = set(self._molts)
+        missing = set()
+        for item in items:
+            if isinstance(item, models.Molt):
+                self._molts[item.id] = item
+            elif getattr(item, 'molt_id', None) is not None:
+                missing.add(item.molt_id)
+        self._load_molts(missing)
+        if self.replies_from is not None:
+            self._load_replies([item for item in items
+                                if isinstance(item, models.Molt)])
+
+        for _ in range(ORIGINAL_DEPTH):
+            originals = {molt.original_molt_id for molt in self._molts.values()
+                         if molt.original_molt_id is not None}
+            self._load_molts(originals)
+
+        new_molts = [molt for molt_id, molt in self._molts.items()
+                     if molt_id not in known]
+        author_ids = {molt.author_id for molt in new_molts} \
+            - set(self._authors)
+        if author_ids:
+            authors = models.Crab.query \
+                .filter(models.Crab.id.in_(author_ids)).all()
+            self._authors.update((crab.id, crab) for crab in authors)
+
+        self.usernames |= models.Molt.resolve_mentions(new_molts)
+
+        if self.viewer and new_molts:
+            self._load_viewer_state([molt.id for molt in new_molts])
+
+    def _load_molts(self, molt_ids: Iterable[int]):
+        """ Load Molts by ID that aren't loaded yet.
+        """
+        molt_ids = set(molt_ids) - set(self._molts)
+        if molt_ids:
+            for molt in models.Molt.query \
+                    .filter(models.Molt.id.in_(molt_ids)).all():
+                self._molts[molt.id] = molt
+
+    def _load_replies(self, molts: List['models.Molt']):
+        """ Load the reply chains below `molts`, adding the replies to the
+            page.
+        """
+        roots = list()
+        for molt in molts:
+            if self.replies_from == 'author':
+                key = (molt.id, molt.author_id)
+            else:
+                key = (molt.id, _replies_from_id(self.replies_from))
+            if key not in self._replies:
+                self._replies[key] = None
+                roots.append((molt, key[1]))
+        replies = models.Molt.load_reply_chains(roots, self.viewer,
+                                                self.depth_limit)
+        for reply in replies.values():
+            self._molts.setdefault(reply.id, reply)
+        for (parent_id, from_id), reply in replies.items():
+            self._replies[(parent_id, from_id)] = reply
+            # Below a reply, the chain continues with the parent's author
+            self._replies.setdefault(
+                (reply.id, self._molts[parent_id].author_id), None
+            )
+
+    def _load_viewer_state(self, molt_ids: List[int]):
+        self._liked |= {
+            molt_id for molt_id, in db.session.query(models.Like.molt_id)
+            .filter(models.Like.crab_id == self.viewer.id,
+                    models.Like.molt_id.in_(molt_ids))
+        }
+        self._bookmarked |= {
+            molt_id for molt_id, in db.session.query(models.Bookmark.molt_id)
+            .filter(models.Bookmark.crab_id == self.viewer.id,
+                    models.Bookmark.molt_id.in_(molt_ids))
+        }
+        remolts = models.Molt.query \
+            .filter_by(is_remolt=True, author_id=self.viewer.id,
+                       deleted=False) \
+            .filter(models.Molt.original_molt_id.in_(molt_ids)).all()
+        self._remolts.update((remolt.original_molt_id, remolt)
+                             for remolt in remolts)
+
+    def reply_to(self, molt: 'models.Molt', replies_from: RepliesFrom) \
+            -> Optional['models.Molt']:
+        """ Returns the reply to show below `molt` in a reply chain (see
+            `Molt.load_reply_chains`).
+
+            :param replies_from: `show_replies_from` in `molt.html`.
+        """
+        key = (molt.id, _replies_from_id(replies_from))
+        if key in self._replies:
+            return self._replies[key]
+        if replies_from == 'following':
+            if self.viewer is None:
+                return None
+            return molt.get_reply_from_following(self.viewer)
+        return molt.get_reply_from(replies_from)
+
+    def author(self, molt: 'models.Molt') -> Any:
+        """ Returns the author of `molt`.
+        """
+        author = self._authors.get(molt.author_id)
+        return author if author is not None else molt.get_author()
+
+    def has_liked(self, molt: 'models.Molt') -> bool:
+        """ Returns True if the viewer has liked `molt`.
+        """
+        if molt.id in self._molts:
+            return molt.id in self._liked
+        return bool(self.viewer.has_liked(molt))
+
+    def has_bookmarked(self, molt: 'models.Molt') -> bool:
+        """ Returns True if the viewer has bookmarked `molt`.
+        """
+        if molt.id in self._molts:
+            return molt.id in self._bookmarked
+        return bool(self.viewer.has_bookmarked(molt))
+
+    def has_remolted(self, molt: 'models.Molt') -> Optional['models.Molt']:
+        """ Returns the viewer's Remolt of `molt` if there is one.
+        """
+        if molt.id in self._molts:
+            return self._remolts.get(molt.id)
+        return self.viewer.has_remolted(molt)
+
+
+class StreamedPage(PreloadedPage):
+    """ A `PreloadedPage` whose Molts are read in chunks while a template
+        iterates over it, so a long thread starts rendering after its first
+        chunk and only one chunk of rows is held at a time. Pass it as both
+        the Molts to iterate and `preloaded`.
+    """
+    def __init__(self, chunks: Iterable[List['models.Molt']],
+                 viewer: Optional['models.Crab'] = None,
+                 items: Iterable[Any] = (),
+                 exclude: Optional[Callable[[Any], bool]] = None,
+                 replies_from: RepliesFrom = None,
+                 depth_limit: int = models.REPLY_CHAIN_DEPTH):
+        """
+            :param chunks: Lists of Molts, e.g. from `pagination.chunks`.
+            :param items: Items to preload up front (e.g. the Molt the page
+                is about), which aren't iterated.
+            :param exclude: Drops Molts it returns True for (e.g.
+                `Crab.muted_molt_filter`).
+            :param replies_from: As for `PreloadedPage`, for the iterated
+                Molts only.
+        """
+        super().__init__(items, viewer)
+        self.replies_from = replies_from
+        self.depth_limit = depth_limit
+        self._chunks = chunks
+        self._exclude = exclude
+
+    def __iter__(self) -> Iterator['models.Molt']:
+        for chunk in self._chunks:
+            if self._exclude is not None:
+                chunk = [molt for molt in chunk if not self._exclude(molt)]
+            self.extend(chunk)
+            yield from chunk
+
+
+def _replies_from_id(replies_from: RepliesFrom) -> Optional[int]:
+    """ Normalizes `show_replies_from` to a Crab ID (None for 'following').
+    """
+    if isinstance(replies_from, models.Crab):
+        return replies_from.id
+    if replies_from == 'following':
+        return None
+    return replies_from
@@ -0,0 +1,129 @@
+""" Cache of rendered Molt HTML (see `Molt.rich_content`).
+
+    Renders are stored per Molt ID, with one entry per variant (media size,
+    content, etc.) so that all of a Molt's renders can be invalidated at once.
+    Each process keeps a bounded LRU; if `RICH_CONTENT_CACHE_REDIS_URL` is set
+    renders are shared between processes through Redis as well.
+"""
+from collections import OrderedDict
+import config
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+if config.RICH_CONTENT_CACHE_REDIS_URL:
+    import redis
+
+
+class RenderCache:
+    """ Bounded, thread-safe LRU of rendered HTML keyed by (molt_id, variant)
+        with an optional shared Redis backend.
+    """
+    def __init__(self, maxsize: int, ttl: int,
+                 redis_url: Optional[str] = None, prefix: str = 'render'):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[int, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._shared = redis.Redis.from_url(redis_url) if redis_url else None
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    def _shared_key(self, molt_id: int) -> str:
+        return f'{self.prefix}:{molt_id}'
+
+    def get(self, molt_id: int, variant: str) -> Optional[str]:
+        """ Returns the cached render or None.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(molt_id)
+            if entry is not None:
+                expires, variants = entry
+                if expires > time.monotonic() and variant in variants:
+                    self._entries.move_to_end(molt_id)
+                    self.hits += 1
+                    return variants[variant]
+        if self._shared is not None:
+            try:
+                html = self._shared.hget(self._shared_key(molt_id), variant)
+            except redis.RedisError:
+                html = None
+            if html is not None:
+                html = html.decode()
+                self._store(molt_id, variant, html)
+                with self._lock:
+                    self.shared_hits += 1
+                return html
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, molt_id: int, variant: str, html: str):
+        """ Cache a render.
+        """
+        if not self.enabled:
+            return
+        self._store(molt_id, variant, html)
+        if self._shared is not None:
+            key = self._shared_key(molt_id)
+            try:
+                self._shared.pipeline() \
+                    .hset(key, variant, html) \
+                    .expire(key, self.ttl) \
+                    .execute()
+            except redis.RedisError:
+                pass
+
+    def _store(self, molt_id: int, variant: str, html: str):
+        with self._lock:
+            entry = self._entries.get(molt_id)
+            now = time.monotonic()
+            if entry is None or entry[0] <= now:
+                entry = (now + self.ttl, dict())
+                self._entries[molt_id] = entry
+            entry[1][variant] = html
+            self._entries.move_to_end(molt_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, molt_ids: Iterable[int]):
+        """ Drop every cached render of the given Molts.
+        """
+        molt_ids = list(molt_ids)
+        if not molt_ids or not self.enabled:
+            return
+        with self._lock:
+            for molt_id in molt_ids:
+                self._entries.pop(molt_id, None)
+        if self._shared is not None:
+            try:
+                self._shared.delete(*(self._shared_key(molt_id)
+                                      for molt_id in molt_ids))
+            except redis.RedisError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """ Returns hit/miss counters and current size.
+        """
+        with self._lock:
+            return dict(hits=self.hits, shared_hits=self.shared_hits,
+                        misses=self.misses, size=len(self._entries),
+                        maxsize=self.maxsize)
+
+
+rich_content = RenderCache(config.RICH_CONTENT_CACHE_SIZE,
+                           config.RICH_CONTENT_CACHE_TTL,
+                           config.RICH_CONTENT_CACHE_REDIS_URL,
+                           prefix='rich_content')
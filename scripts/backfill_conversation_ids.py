@@ -0,0 +1,76 @@
+""" Fills in molt.conversation_id (added by migration 5) for every reply and
+    quote posted before `Molt.create` set it, and for the Molts at the root
+    of their threads.
+
+    Each Molt's root is found by walking `original_molt_id` links in memory,
+    so the whole table is read once and then updated one conversation at a
+    time.
+"""
+import os
+import sys
+import inspect
+currentdir = os.path.dirname(
+    os.path.abspath(inspect.getfile(inspect.currentframe()))
+)
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+
+from crabber import app
+from extensions import db
+import migrations
+from models import Molt
+from typing import Dict, List, Optional
+
+BATCH_SIZE = 500
+
+app.app_context().push()
+migrations.require_current_schema()
+
+# Replies and quotes, by ID: (ID of the Molt they reply to/quote,
+# conversation ID if already set)
+threaded: Dict[int, tuple] = {
+    molt_id: (original_molt_id, conversation_id)
+    for molt_id, original_molt_id, conversation_id in db.session.query(
+        Molt.id, Molt.original_molt_id, Molt.conversation_id
+    ).filter(db.or_(Molt.is_reply == True, Molt.is_quote == True),
+             Molt.original_molt_id != None)
+}
+roots: Dict[int, int] = dict()
+
+
+def find_root(molt_id: int) -> int:
+    path = list()
+    root_id: Optional[int] = None
+    while molt_id in threaded and molt_id not in roots:
+        original_molt_id, conversation_id = threaded[molt_id]
+        path.append(molt_id)
+        if conversation_id is not None:
+            root_id = conversation_id
+            break
+        if original_molt_id in path:  # Shouldn't happen, but don't loop
+            root_id = original_molt_id
+            break
+        molt_id = original_molt_id
+    if root_id is None:
+        root_id = roots.get(molt_id, molt_id)
+    for visited in path:
+        roots[visited] = root_id
+    return root_id
+
+
+conversations: Dict[int, List[int]] = dict()
+for molt_id, (_, conversation_id) in threaded.items():
+    root_id = find_root(molt_id)
+    if conversation_id != root_id:
+        conversations.setdefault(root_id, [root_id]).append(molt_id)
+
+updated = 0
+for root_id, molt_ids in conversations.items():
+    for start in range(0, len(molt_ids), BATCH_SIZE):
+        updated += Molt.query \
+            .filter(Molt.id.in_(molt_ids[start:start + BATCH_SIZE])) \
+            .update({Molt.conversation_id: root_id},
+                    synchronize_session=False)
+    db.session.commit()
+print(f'Backfilled {updated} Molt(s) in {len(conversations)} '
+      'conversation(s).')
@@ -0,0 +1,27 @@
+""" Fills in the indexed crab.username_lower column (used to resolve
+    mentions) for every Crab. Run after `scripts/migrate.py` has added it.
+"""
+import os
+import sys
+import inspect
+currentdir = os.path.dirname(
+    os.path.abspath(inspect.getfile(inspect.currentframe()))
+)
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+
+from crabber import app
+from extensions import db
+import migrations
+from models import Crab
+
+app.app_context().push()
+migrations.require_current_schema()
+
+updated = Crab.query \
+    .filter(db.or_(Crab.username_lower.is_(None),
+                   Crab.username_lower != db.func.lower(Crab.username))) \
+    .update({Crab.username_lower: db.func.lower(Crab.username)},
+            synchronize_session=False)
+db.session.commit()
+print(f'Backfilled {updated} username(s).')
@@ -0,0 +1,77 @@
+""" Micro-benchmark of rendering a Molt's embeds (YouTube, Giphy, external
+    image) the old way, with `render_template_string` compiling a fresh
+    template per embed, against `Molt.render_embed`.
+
+    Usage: python scripts/benchmark_embeds.py [iterations]
+"""
+import os
+import sys
+import inspect
+currentdir = os.path.dirname(
+    os.path.abspath(inspect.getfile(inspect.currentframe()))
+)
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+
+from crabber import app
+from flask import render_template_string
+from models import Molt
+import patterns
+import timeit
+
+CONTENT = ('Look at these https://www.youtube.com/watch?v=dQw4w9WgXcQ '
+           'https://giphy.com/gifs/crab-dance-l0HlNaQ6gWfllcjDO '
+           'https://example.com/crab.png')
+
+
+def legacy_embeds(content: str, full_size_media: bool = False) -> str:
+    """ How `Molt.rich_content` rendered embeds before `Molt.render_embed`.
+    """
+    youtube_id = patterns.youtube.search(content).group(1)
+    giphy_id = patterns.giphy.search(content).group(1)
+    image_link = patterns.ext_img.search(content).group(1)
+    return render_template_string(
+        f'{{% with video="{youtube_id}" %}}'
+        '   {% include "youtube.html" %}'
+        '{% endwith %}'
+    ) + render_template_string(
+        f'{{% with giphy_id="{giphy_id}" %}}'
+        '   {% include "giphy.html" %}'
+        '{% endwith %}',
+        full_size_media=full_size_media
+    ) + render_template_string(
+        f'{{% with link="{image_link}" %}}'
+        '  {% include "external_img.html" %}'
+        '{% endwith %}',
+        full_size_media=full_size_media
+    )
+
+
+def compiled_embeds(content: str, full_size_media: bool = False) -> str:
+    """ How `Molt.rich_content` renders embeds now.
+    """
+    youtube_id = patterns.youtube.search(content).group(1)
+    giphy_id = patterns.giphy.search(content).group(1)
+    image_link = patterns.ext_img.search(content).group(1)
+    return Molt.render_embed('youtube.html', video=youtube_id) \
+        + Molt.render_embed('giphy.html', giphy_id=giphy_id,
+                            full_size_media=full_size_media) \
+        + Molt.render_embed('external_img.html', link=image_link,
+                            full_size_media=full_size_media)
+
+
+iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+with app.test_request_context():
+    # Unsaved Molt, so rendering skips the rich_content cache
+    molt = Molt(content=CONTENT, nsfw=False)
+
+    results = {
+        'embeds, render_template_string': lambda: legacy_embeds(CONTENT),
+        'embeds, render_embed': lambda: compiled_embeds(CONTENT),
+        'full rich_content render': molt.render_rich_content,
+    }
+    for name, function in results.items():
+        function()  # Warm up Jinja's template cache
+        seconds = timeit.timeit(function, number=iterations)
+        print(f'{name:32} {seconds / iterations * 1e6:9.1f} µs/molt')
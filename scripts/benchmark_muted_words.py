@@ -0,0 +1,74 @@
+""" Benchmark of filtering a Wild West page by a Crab's muted words with one
+    ILIKE clause per word (SQL) against the compiled matcher and over-fetching
+    pager (`config.MUTED_WORDS_MATCHER_ENABLED`). Also checks that both return
+    the same page.
+
+    If the Crab has no muted words, `words` synthetic ones are muted for the
+    run (nothing is saved).
+
+    Usage: python scripts/benchmark_muted_words.py username [iterations] [words]
+"""
+import os
+import sys
+import inspect
+currentdir = os.path.dirname(
+    os.path.abspath(inspect.getfile(inspect.currentframe()))
+)
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+
+import config
+from crabber import app
+from extensions import db
+from models import Crab, Molt
+import pagination
+import timeit
+
+username = sys.argv[1]
+iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+word_count = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+
+with app.test_request_context():
+    crab = Crab.get_by_username(username)
+    if crab is None:
+        sys.exit('No crab found with that username.')
+    if not crab._muted_words:
+        crab._muted_words = ','.join(f'muted{n}' for n in range(word_count))
+    print(f'{len(list(crab.muted_words))} muted word(s), '
+          f'{len(crab._muted_words)} characters')
+
+    def load_page(matcher_enabled: bool) -> pagination.CursorPagination:
+        config.MUTED_WORDS_MATCHER_ENABLED = matcher_enabled
+        molts = Molt.query_all(include_replies=False, include_quotes=False)
+        molts = crab.filter_molt_query(molts)
+        return pagination.paginate(molts, exclude=crab.muted_molt_filter)
+
+    sql_page = load_page(False)
+    matcher_page = load_page(True)
+    if [molt.id for molt in sql_page.items] \
+            != [molt.id for molt in matcher_page.items]:
+        print('WARNING: pages differ')
+
+    for name, matcher_enabled in (('ILIKE per word', False),
+                                  ('compiled matcher', True)):
+        seconds = timeit.timeit(lambda: load_page(matcher_enabled),
+                                number=iterations)
+        print(f'{name:20} {seconds / iterations * 1e3:9.2f} ms/page')
+
+    contents = [molt.content for molt in matcher_page.items] or ['']
+    words = list(crab.muted_words)
+    matcher = crab.muted_word_matcher
+    scans = {
+        'scan, word by word': lambda: [
+            any(word in content.lower() for word in words)
+            for content in contents
+        ],
+        'scan, compiled': lambda: [matcher.search(content)
+                                   for content in contents],
+    }
+    for name, function in scans.items():
+        seconds = timeit.timeit(function, number=iterations)
+        print(f'{name:20} {seconds / iterations / len(contents) * 1e6:9.2f} '
+              'µs/molt')
+
+    db.session.rollback()
@@ -0,0 +1,36 @@
+""" Builds a new snapshot of the stats page's site-wide aggregates (used when
+    STATS_SNAPSHOT_ENABLED is set) and deletes old ones. Run it on a schedule,
+    e.g. from cron, or pass --loop to keep rebuilding every
+    STATS_SNAPSHOT_INTERVAL seconds.
+"""
+import os
+import sys
+import inspect
+currentdir = os.path.dirname(
+    os.path.abspath(inspect.getfile(inspect.currentframe()))
+)
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+
+import config
+from crabber import app
+from extensions import db
+import migrations
+from models import StatsSnapshot
+import time
+
+app.app_context().push()
+
+migrations.require_current_schema()
+
+while True:
+    snapshot = StatsSnapshot.build()
+    pruned = StatsSnapshot.prune()
+    db.session.commit()
+    print(f'Built stats snapshot in {snapshot.build_seconds:.2f}s '
+          f'({pruned} old snapshot(s) deleted).')
+    if '--loop' not in sys.argv[1:]:
+        break
+    # Don't hold a connection while sleeping
+    db.session.remove()
+    time.sleep(config.STATS_SNAPSHOT_INTERVAL)
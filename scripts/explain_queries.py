@@ -0,0 +1,123 @@
+""" Prints the database's query plan (`EXPLAIN QUERY PLAN` on SQLite,
+    `EXPLAIN` on MySQL) for every model query method, plus the filtered feeds
+    built from them, to check which indexes they use. Instance methods run
+    against the first available Crab, Molt and Crabtag.
+
+    Usage: python scripts/explain_queries.py [name filter]
+"""
+import os
+import sys
+import inspect
+currentdir = os.path.dirname(
+    os.path.abspath(inspect.getfile(inspect.currentframe()))
+)
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+
+from crabber import app
+from extensions import db
+import models
+from models import Crab, Crabtag, Molt
+from typing import Callable, Dict
+
+name_filter = sys.argv[1] if len(sys.argv) > 1 else ''
+
+
+def explain(query) -> list:
+    statement = getattr(query, 'statement', query)
+    compiled = statement.compile(
+        dialect=db.engine.dialect,
+        compile_kwargs={'render_postcompile': True}
+    )
+    params = compiled.params
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    prefix = 'EXPLAIN QUERY PLAN' if db.engine.dialect.name == 'sqlite' \
+        else 'EXPLAIN'
+    with db.engine.connect() as connection:
+        result = connection.exec_driver_sql(f'{prefix} {compiled}', params)
+        return [dict(row._mapping) for row in result]
+
+
+def print_plan(name: str, query):
+    print(f'== {name}')
+    try:
+        rows = explain(query)
+    except Exception as error:
+        print(f'   failed: {error}')
+        return
+    for row in rows:
+        if 'detail' in row:
+            print(f'   {row["detail"]}')
+        else:
+            print('   ' + ', '.join(
+                f'{key}={row[key]}' for key in
+                ('table', 'type', 'key', 'rows', 'Extra') if key in row
+            ))
+
+
+with app.test_request_context():
+    crab = Crab.query_all().first()
+    molt = Molt.query_all().first()
+    crabtag = Crabtag.query.first()
+    if crab is None or molt is None:
+        sys.exit('The database needs at least one Crab and Molt.')
+
+    queries: Dict[str, Callable] = dict()
+    instances = {Crab: crab, Molt: molt, Crabtag: crabtag}
+    for model in (Crab, Molt, models.Like, models.Notification, Crabtag,
+                  models.CrabtagUsage, models.Card, models.Bookmark):
+        for attribute, value in vars(model).items():
+            if not attribute.startswith('query_'):
+                continue
+            if isinstance(value, staticmethod):
+                function = value.__func__
+            elif inspect.isfunction(value) and model in instances \
+                    and instances[model] is not None:
+                function = getattr(instances[model], attribute)
+            else:
+                continue
+            required = [parameter for parameter in
+                        inspect.signature(function).parameters.values()
+                        if parameter.default is parameter.empty]
+            if model is Molt and attribute == 'query_with_tag' and crabtag:
+                queries[f'Molt.{attribute}'] = \
+                    lambda function=function: function(crabtag)
+            elif not required:
+                queries[f'{model.__name__}.{attribute}'] = function
+
+    # Feeds as routes build them, with the viewer's filters applied
+    queries.update({
+        'feed: home timeline': crab.query_timeline,
+        'feed: wild west': lambda: crab.filter_molt_query(
+            Molt.query_all(include_replies=False, include_quotes=False)
+        ).order_by(Molt.timestamp.desc()),
+        'feed: profile molts': lambda: crab.filter_molt_query(
+            crab.query_molts().filter_by(is_reply=False)
+        ),
+        'feed: molt replies': lambda: crab.filter_molt_query(
+            molt.query_replies()
+        ),
+        'feed: notifications': lambda: crab.get_notifications(
+            paginated=True
+        ).query,
+        'lookup: crab by username': lambda: Crab.query.filter(
+            Crab.username_lower == crab.username.lower()
+        ),
+        'lookup: crabtag by name': lambda: Crabtag.query.filter_by(
+            name='crab'
+        ),
+        'lookup: card by url': lambda: models.Card.query.filter_by(
+            url='https://crabber.net'
+        ),
+        'lookup: access token': lambda: models.AccessToken.query.filter_by(
+            key='0' * 32
+        ),
+        'lookup: developer key': lambda: models.DeveloperKey.query.filter_by(
+            key='0' * 32
+        ),
+    })
+
+    for name, build in queries.items():
+        if name_filter in name:
+            print_plan(name, build())
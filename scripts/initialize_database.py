@@ -5,6 +5,7 @@ sys.path.insert(0,parentdir)
 
 from crabber import app
 from extensions import db
+import migrations
 from models import Crab, Molt, Trophy
 import json
 
@@ -12,6 +13,8 @@ app.app_context().push()
 
 db.drop_all()
 db.create_all()
+# New databases already have the latest schema; record that
+migrations.migrate()
 
 # Create crabber account
 crabber = Crab.create_new(
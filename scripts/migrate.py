@@ -0,0 +1,45 @@
+""" Applies pending schema migrations (see `migrations.py`) to the configured
+    database.
+
+    Usage: python scripts/migrate.py [--status] [--target VERSION]
+
+    --status lists every migration and whether it has been applied without
+    changing anything. --target stops after the given version.
+
+    Some migrations add columns or tables that existing rows need filled in;
+    the scripts to run for those are listed once they are applied.
+"""
+import os
+import sys
+import inspect
+currentdir = os.path.dirname(
+    os.path.abspath(inspect.getfile(inspect.currentframe()))
+)
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+
+from crabber import app
+import migrations
+
+app.app_context().push()
+
+arguments = sys.argv[1:]
+target = None
+if '--target' in arguments:
+    target = int(arguments[arguments.index('--target') + 1])
+
+if '--status' in arguments:
+    applied = migrations.get_applied_versions()
+    for migration in migrations.MIGRATIONS:
+        state = 'applied' if migration.version in applied else 'pending'
+        print(f'{migration.version:4} {state:8} {migration.description}')
+    sys.exit(0)
+
+applied = migrations.migrate(target)
+print(f'Applied {len(applied)} migration(s); schema is at version '
+      f'{migrations.get_current_version()}.')
+scripts = [script for migration in applied for script in migration.scripts]
+if scripts:
+    print('Now fill in the new schema by running:')
+    for script in scripts:
+        print(f'  python scripts/{script}')
@@ -0,0 +1,27 @@
+""" Rebuilds every Crab's grouped notifications feed from their
+    notifications. Run this once before setting NOTIFICATION_GROUPS_ENABLED on
+    an existing database, or any time the groups are suspected to have
+    drifted.
+"""
+import os
+import sys
+import inspect
+currentdir = os.path.dirname(
+    os.path.abspath(inspect.getfile(inspect.currentframe()))
+)
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+
+from crabber import app
+from extensions import db
+import migrations
+from models import Crab, NotificationGroup
+
+app.app_context().push()
+
+migrations.require_current_schema()
+
+for crab in Crab.query_all():
+    print(f'Rebuilding notifications for @{crab.username}')
+    NotificationGroup.rebuild(crab)
+    db.session.commit()
@@ -0,0 +1,26 @@
+""" Creates the full-text search index of Molt content if it doesn't exist
+    and rebuilds it from the molt table. Run this once before setting
+    FULLTEXT_SEARCH_ENABLED, or any time the index is suspected to have
+    drifted.
+"""
+import os
+import sys
+import inspect
+currentdir = os.path.dirname(
+    os.path.abspath(inspect.getfile(inspect.currentframe()))
+)
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+
+from crabber import app
+import fulltext
+
+app.app_context().push()
+
+if not fulltext.is_supported():
+    print(f'Full-text search is not supported on {fulltext.dialect()}.')
+    sys.exit(1)
+
+print(f'Rebuilding full-text index ({fulltext.dialect()})')
+fulltext.rebuild_index()
+print('Done.')
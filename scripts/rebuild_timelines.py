@@ -0,0 +1,26 @@
+""" Rebuilds every Crab's materialized timeline inbox from who they follow.
+    Run this once before setting TIMELINE_INBOX_ENABLED on an existing
+    database, or any time the inbox is suspected to have drifted.
+"""
+import os
+import sys
+import inspect
+currentdir = os.path.dirname(
+    os.path.abspath(inspect.getfile(inspect.currentframe()))
+)
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+
+from crabber import app
+from extensions import db
+import migrations
+from models import Crab, TimelineEntry
+
+app.app_context().push()
+
+migrations.require_current_schema()
+
+for crab in Crab.query_all():
+    print(f'Rebuilding timeline for @{crab.username}')
+    TimelineEntry.rebuild(crab)
+    db.session.commit()
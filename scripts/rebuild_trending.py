@@ -0,0 +1,39 @@
+""" Recounts the hourly Crabtag uses that trending Crabtags are ranked by
+    (`crabtag_usage`) from the Molts of the last week. Run this once before
+    setting TRENDING_COUNTERS_ENABLED on an existing database.
+
+    Pass --check to only compare the stored counts against the original
+    trending query without fixing them (exits with status 1 if any have
+    drifted).
+"""
+import os
+import sys
+import inspect
+currentdir = os.path.dirname(
+    os.path.abspath(inspect.getfile(inspect.currentframe()))
+)
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+
+from crabber import app
+from extensions import db
+import migrations
+from models import CrabtagUsage
+
+app.app_context().push()
+
+check_only = '--check' in sys.argv[1:]
+
+migrations.require_current_schema()
+
+mismatches = CrabtagUsage.audit()
+for name, stored, actual in mismatches:
+    print(f'%{name}: {stored} recent use(s) counted, should be {actual}')
+
+if check_only:
+    print(f'{len(mismatches)} count(s) out of date.')
+    sys.exit(1 if mismatches else 0)
+
+CrabtagUsage.rebuild()
+db.session.commit()
+print(f'Recounted trending Crabtags ({len(mismatches)} had drifted).')
@@ -0,0 +1,39 @@
+""" Recomputes every Crab's stored follower count.
+
+    Run after `scripts/migrate.py` has added the counter column. Pass --check
+    to only report counts that have drifted without fixing them (exits with
+    status 1 if any are found).
+"""
+import os
+import sys
+import inspect
+currentdir = os.path.dirname(
+    os.path.abspath(inspect.getfile(inspect.currentframe()))
+)
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+
+from crabber import app
+from extensions import db
+import migrations
+from models import Crab
+
+app.app_context().push()
+
+check_only = '--check' in sys.argv[1:]
+
+migrations.require_current_schema()
+
+mismatches = Crab.audit_follower_counts()
+for crab_id, stored, actual in mismatches:
+    print(f'Crab {crab_id}: follower_count is {stored}, should be {actual}')
+
+if check_only:
+    print(f'{len(mismatches)} count(s) out of date.')
+    sys.exit(1 if mismatches else 0)
+
+fixed = Crab.reconcile_follower_counts(
+    {crab_id for crab_id, *_ in mismatches}
+)
+db.session.commit()
+print(f'Corrected {fixed} count(s).')
@@ -0,0 +1,37 @@
+""" Recomputes every Molt's stored like/remolt/reply/quote counters.
+
+    Run after `scripts/migrate.py` has added the counter columns. Pass
+    --check to only report counters that have drifted without fixing
+    them (exits with status 1 if any are found).
+"""
+import os
+import sys
+import inspect
+currentdir = os.path.dirname(
+    os.path.abspath(inspect.getfile(inspect.currentframe()))
+)
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+
+from crabber import app
+from extensions import db
+import migrations
+from models import Molt
+
+app.app_context().push()
+
+check_only = '--check' in sys.argv[1:]
+
+migrations.require_current_schema()
+
+mismatches = Molt.audit_counters()
+for molt_id, counter, stored, actual in mismatches:
+    print(f'Molt {molt_id}: {counter}_count is {stored}, should be {actual}')
+
+if check_only:
+    print(f'{len(mismatches)} counter(s) out of date.')
+    sys.exit(1 if mismatches else 0)
+
+fixed = Molt.reconcile_counters({molt_id for molt_id, *_ in mismatches})
+db.session.commit()
+print(f'Corrected {fixed} counter(s).')
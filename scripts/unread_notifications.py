@@ -18,6 +18,8 @@ crab = Crab.get_by_username(username)
 if crab:
     for notification in crab.notifications[:amount]:
         notification.read = False
+    db.session.flush()
+    Crab.reconcile_unread_notifications([crab.id])
 else:
     print('No crab found with that username.')
 
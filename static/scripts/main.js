@@ -154,9 +154,9 @@ function updateNotifBadge(unread_count) {
     }
 }
 
-// Set new molt indicator to 'molt_count'
+// Set new molt indicator to 'molt_count' (a number, or e.g. "99+")
 function updateNewMoltIndicator(molt_count) {
-    if (molt_count > 0) {
+    if (parseInt(molt_count) > 0) {
         // Update counter
         $("#new-molt-counter").text(molt_count);
         // Update the s in 'new molts'
@@ -166,6 +166,24 @@ function updateNewMoltIndicator(molt_count) {
     }
 }
 
+// Update notification badge and new molt indicator from the server-sent
+// events stream at 'url'. Returns false if the browser can't open one.
+function listenForEvents(url) {
+    if (!window.EventSource) {
+        return false;
+    }
+    var events = new EventSource(url);
+    var new_molts = 0;
+
+    events.addEventListener("unread_notif", function(event) {
+        updateNotifBadge(JSON.parse(event.data).count);
+    });
+    events.addEventListener("molt", function(event) {
+        new_molts += 1;
+        updateNewMoltIndicator(new_molts);
+    });
+    return true;
+}
 
 function updateImgPreview(imgInput) {
     var imgPreview = $(imgInput.form).find(".img-preview");
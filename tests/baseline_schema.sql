@@ -0,0 +1,172 @@
+CREATE TABLE crab (
+    id INTEGER NOT NULL,
+    username VARCHAR(32) NOT NULL,
+    email VARCHAR(120) NOT NULL,
+    display_name VARCHAR(32) NOT NULL,
+    password VARCHAR(128) NOT NULL,
+    description VARCHAR(1024) DEFAULT 'This user has no description.' NOT NULL,
+    raw_bio VARCHAR(2048) DEFAULT '{}' NOT NULL,
+    location VARCHAR(256),
+    website VARCHAR(1024),
+    verified BOOLEAN NOT NULL,
+    avatar VARCHAR(140) DEFAULT 'https://cdn.crabber.net/img/avatar.jpg' NOT NULL,
+    banner VARCHAR(140) DEFAULT 'https://cdn.crabber.net/img/banner.png' NOT NULL,
+    register_time DATETIME NOT NULL,
+    deleted BOOLEAN NOT NULL,
+    timezone VARCHAR(8) NOT NULL,
+    lastfm VARCHAR(128),
+    banned BOOLEAN NOT NULL,
+    password_reset_token VARCHAR(128),
+    nsfw BOOLEAN NOT NULL,
+    show_nsfw BOOLEAN NOT NULL,
+    show_nsfw_thumbnails BOOLEAN NOT NULL,
+    muted_words VARCHAR(4096) DEFAULT '' NOT NULL,
+    pinned_molt_id INTEGER,
+    preferences VARCHAR(4096) NOT NULL,
+    PRIMARY KEY (id)
+);
+
+CREATE TABLE trophy (
+    id INTEGER NOT NULL,
+    title VARCHAR(32) NOT NULL,
+    description VARCHAR(240) NOT NULL,
+    image VARCHAR(240) NOT NULL,
+    PRIMARY KEY (id)
+);
+
+CREATE TABLE crabtag (
+    id INTEGER NOT NULL,
+    name VARCHAR(512) NOT NULL,
+    PRIMARY KEY (id)
+);
+
+CREATE TABLE card (
+    id INTEGER NOT NULL,
+    url VARCHAR(1024),
+    title VARCHAR(256),
+    description VARCHAR(256),
+    image VARCHAR(1024),
+    ready BOOLEAN,
+    failed BOOLEAN,
+    PRIMARY KEY (id)
+);
+
+CREATE TABLE following (
+    id INTEGER NOT NULL,
+    follower_id INTEGER,
+    following_id INTEGER,
+    PRIMARY KEY (id),
+    FOREIGN KEY(follower_id) REFERENCES crab (id),
+    FOREIGN KEY(following_id) REFERENCES crab (id)
+);
+
+CREATE TABLE blocking (
+    id INTEGER NOT NULL,
+    blocker_id INTEGER,
+    blocked_id INTEGER,
+    PRIMARY KEY (id),
+    FOREIGN KEY(blocker_id) REFERENCES crab (id),
+    FOREIGN KEY(blocked_id) REFERENCES crab (id)
+);
+
+CREATE TABLE molt (
+    id INTEGER NOT NULL,
+    author_id INTEGER NOT NULL,
+    content VARCHAR(1000) NOT NULL,
+    timestamp DATETIME NOT NULL,
+    deleted BOOLEAN NOT NULL,
+    raw_mentions VARCHAR(1024) DEFAULT '' NOT NULL,
+    raw_tags VARCHAR(1024) DEFAULT '' NOT NULL,
+    image VARCHAR(1024),
+    source VARCHAR(1024),
+    card_id INTEGER,
+    nsfw BOOLEAN NOT NULL,
+    browser VARCHAR(512),
+    platform VARCHAR(512),
+    address VARCHAR(512),
+    reports INTEGER NOT NULL,
+    approved BOOLEAN NOT NULL,
+    is_remolt BOOLEAN NOT NULL,
+    is_reply BOOLEAN NOT NULL,
+    is_quote BOOLEAN NOT NULL,
+    original_molt_id INTEGER,
+    edited BOOLEAN NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(author_id) REFERENCES crab (id),
+    FOREIGN KEY(card_id) REFERENCES card (id),
+    FOREIGN KEY(original_molt_id) REFERENCES molt (id)
+);
+
+CREATE TABLE trophy_case (
+    id INTEGER NOT NULL,
+    owner_id INTEGER NOT NULL,
+    trophy_id INTEGER NOT NULL,
+    timestamp DATETIME NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(owner_id) REFERENCES crab (id),
+    FOREIGN KEY(trophy_id) REFERENCES trophy (id)
+);
+
+CREATE TABLE developer_keys (
+    id INTEGER NOT NULL,
+    "key" VARCHAR(64) NOT NULL,
+    crab_id INTEGER NOT NULL,
+    deleted BOOLEAN NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(crab_id) REFERENCES crab (id)
+);
+
+CREATE TABLE access_tokens (
+    id INTEGER NOT NULL,
+    "key" VARCHAR(64) NOT NULL,
+    crab_id INTEGER NOT NULL,
+    deleted BOOLEAN NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(crab_id) REFERENCES crab (id)
+);
+
+CREATE TABLE crabtag_links (
+    id INTEGER NOT NULL,
+    molt_id INTEGER,
+    tag_id INTEGER,
+    PRIMARY KEY (id),
+    FOREIGN KEY(molt_id) REFERENCES molt (id),
+    FOREIGN KEY(tag_id) REFERENCES crabtag (id)
+);
+
+CREATE TABLE "like" (
+    id INTEGER NOT NULL,
+    crab_id INTEGER NOT NULL,
+    molt_id INTEGER NOT NULL,
+    PRIMARY KEY (id),
+    UNIQUE (crab_id, molt_id),
+    FOREIGN KEY(crab_id) REFERENCES crab (id),
+    FOREIGN KEY(molt_id) REFERENCES molt (id)
+);
+
+CREATE TABLE notification (
+    id INTEGER NOT NULL,
+    recipient_id INTEGER NOT NULL,
+    sender_id INTEGER,
+    timestamp DATETIME NOT NULL,
+    read BOOLEAN NOT NULL,
+    type VARCHAR(32) NOT NULL,
+    molt_id INTEGER,
+    content VARCHAR(140),
+    link VARCHAR(140),
+    PRIMARY KEY (id),
+    FOREIGN KEY(recipient_id) REFERENCES crab (id),
+    FOREIGN KEY(sender_id) REFERENCES crab (id),
+    FOREIGN KEY(molt_id) REFERENCES molt (id)
+);
+
+CREATE TABLE bookmark (
+    id INTEGER NOT NULL,
+    crab_id INTEGER NOT NULL,
+    molt_id INTEGER NOT NULL,
+    timestamp DATETIME NOT NULL,
+    PRIMARY KEY (id),
+    UNIQUE (crab_id, molt_id),
+    FOREIGN KEY(crab_id) REFERENCES crab (id),
+    FOREIGN KEY(molt_id) REFERENCES molt (id)
+);
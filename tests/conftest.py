@@ -0,0 +1,44 @@
+""" Shared fixtures. Every test gets a fresh SQLite database with the current
+    schema and the trophies the models award.
+"""
+import os
+import tempfile
+
+# Must be set before config is first imported
+DATABASE_FILE = os.path.join(tempfile.mkdtemp(), 'crabber-test.db')
+os.environ['CRABBER_DATABASE'] = f'sqlite:///{DATABASE_FILE}'
+os.environ['IS_DEBUG_SERVER'] = '1'
+
+import crabber  # noqa: E402
+from extensions import db  # noqa: E402
+import models  # noqa: E402
+import pytest  # noqa: E402
+
+TROPHIES = ('Social Newbie', 'Mingler', 'Life of the Party', 'Celebrity',
+            'Baby Crab', 'Pineapple Express', 'I Captivated the Guy',
+            'Dopamine Hit', 'Dopamine Addict', 'Full on Junkie', 'One Year')
+
+
+@pytest.fixture
+def app():
+    with crabber.app.test_request_context():
+        db.drop_all()
+        db.create_all()
+        for title in TROPHIES:
+            db.session.add(models.Trophy(title=title, description=title))
+        db.session.commit()
+        yield crabber.app
+        db.session.remove()
+
+
+@pytest.fixture
+def make_crab(app):
+    """ Returns a function that creates Crabs with throwaway details.
+    """
+    def make_crab(username: str) -> models.Crab:
+        return models.Crab.create_new(
+            username=username, email=f'{username}@example.com',
+            password='hunter2', display_name=username.title(),
+            avatar='https://cdn.crabber.net/img/avatar.jpg'
+        )
+    return make_crab
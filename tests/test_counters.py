@@ -0,0 +1,111 @@
+""" Stored Molt engagement counters must stay equal to a fresh count as Crabs
+    like, reply to, quote, delete and get banned.
+"""
+from extensions import db
+from models import Crab, Molt
+import pytest
+
+
+def counts(molt: Molt) -> dict:
+    db.session.expire_all()
+    return dict(like=molt.like_count, remolt=molt.remolt_count,
+                reply=molt.reply_count, quote=molt.quote_count)
+
+
+def assert_in_sync():
+    db.session.expire_all()
+    assert Molt.audit_counters() == []
+    assert Crab.audit_follower_counts() == []
+
+
+@pytest.fixture
+def crabs(make_crab):
+    return make_crab('alice'), make_crab('bob'), make_crab('carol')
+
+
+@pytest.fixture
+def molt(crabs):
+    alice, _, _ = crabs
+    return alice.molt('Hello, world')
+
+
+def test_like_and_unlike(crabs, molt):
+    _, bob, carol = crabs
+    molt.like(bob)
+    molt.like(carol)
+    molt.like(bob)  # Liking twice does nothing
+    assert counts(molt)['like'] == 2
+    assert_in_sync()
+
+    molt.unlike(bob)
+    molt.unlike(bob)
+    assert counts(molt)['like'] == 1
+    assert_in_sync()
+
+
+def test_reply_remolt_and_quote(crabs, molt):
+    _, bob, carol = crabs
+    molt.reply(bob, 'Hi!')
+    molt.reply(carol, 'Hey')
+    molt.remolt(bob)
+    molt.remolt(bob)  # Already remolted
+    molt.quote(carol, 'Look at this')
+    assert counts(molt) == dict(like=0, remolt=1, reply=2, quote=1)
+    assert_in_sync()
+
+
+def test_delete_and_restore(crabs, molt):
+    _, bob, carol = crabs
+    reply = molt.reply(bob, 'Hi!')
+    quote = molt.quote(carol, 'Look at this')
+    reply.delete()
+    reply.delete()  # Already deleted
+    quote.delete()
+    assert counts(molt) == dict(like=0, remolt=0, reply=0, quote=0)
+    assert_in_sync()
+
+    reply.restore()
+    reply.restore()
+    assert counts(molt)['reply'] == 1
+    assert_in_sync()
+
+
+def test_ban_and_unban(crabs, molt):
+    alice, bob, carol = crabs
+    bob.follow(alice)
+    molt.like(bob)
+    molt.like(carol)
+    molt.reply(bob, 'Hi!')
+    molt.remolt(bob)
+
+    bob.ban()
+    assert counts(molt) == dict(like=1, remolt=0, reply=0, quote=0)
+    assert alice.follower_count == 0
+    assert_in_sync()
+
+    # Engagement while banned isn't counted, then is once they're back
+    molt.quote(bob, 'Still here')
+    assert counts(molt)['quote'] == 0
+    assert_in_sync()
+
+    bob.unban()
+    assert counts(molt) == dict(like=2, remolt=1, reply=1, quote=1)
+    assert alice.follower_count == 1
+    assert_in_sync()
+
+
+def test_reconcile_counters(crabs, molt):
+    _, bob, carol = crabs
+    molt.like(bob)
+    reply = molt.reply(carol, 'Hi!')
+    Molt.query.update({Molt._like_count: 5, Molt._reply_count: 0},
+                      synchronize_session=False)
+    db.session.commit()
+
+    assert {(molt_id, counter) for molt_id, counter, _, _
+            in Molt.audit_counters(batch_size=1)} \
+        == {(molt.id, 'like'), (molt.id, 'reply'), (reply.id, 'like')}
+    assert Molt.reconcile_counters(batch_size=1) == 3
+    db.session.commit()
+    assert counts(molt) == dict(like=1, remolt=0, reply=1, quote=0)
+    assert_in_sync()
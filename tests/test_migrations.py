@@ -0,0 +1,87 @@
+""" Migrating a database created before `migrations` existed must bring it to
+    the current schema without losing data.
+"""
+from extensions import db
+import migrations
+from models import Crab, Molt, Trophy
+import os
+import sqlalchemy
+
+BASELINE_SCHEMA = os.path.join(os.path.dirname(__file__),
+                               'baseline_schema.sql')
+
+BASELINE_DATA = (
+    '''INSERT INTO crab (id, username, email, display_name, password,
+                         verified, register_time, deleted, timezone, banned,
+                         nsfw, show_nsfw, show_nsfw_thumbnails, preferences)
+       VALUES (1, 'Alice', 'alice@example.com', 'Alice', 'x', 0,
+               '2021-01-01 00:00:00', 0, '-06.00', 0, 0, 0, 0, '{}'),
+              (2, 'bob', 'bob@example.com', 'Bob', 'x', 0,
+               '2021-01-01 00:00:00', 0, '-06.00', 0, 0, 0, 0, '{}')''',
+    # Duplicate follow, removed by migration 1
+    '''INSERT INTO following (follower_id, following_id)
+       VALUES (1, 2), (1, 2)''',
+    '''INSERT INTO molt (id, author_id, content, timestamp, deleted, nsfw,
+                         reports, approved, is_remolt, is_reply, is_quote,
+                         original_molt_id, edited)
+       VALUES (1, 2, 'Hello', '2021-01-02 00:00:00', 0, 0, 0, 0, 0, 0, 0,
+               NULL, 0),
+              (2, 1, 'Hi', '2021-01-03 00:00:00', 0, 0, 0, 0, 0, 1, 0,
+               1, 0)''',
+    '''INSERT INTO "like" (crab_id, molt_id) VALUES (1, 1)''',
+)
+
+
+def create_baseline_database():
+    db.session.remove()
+    db.drop_all()
+    with open(BASELINE_SCHEMA) as f:
+        statements = f.read().split(';\n')
+    with db.engine.begin() as connection:
+        for statement in statements + list(BASELINE_DATA):
+            if statement.strip():
+                connection.exec_driver_sql(statement)
+
+
+def test_migrate_baseline(app):
+    create_baseline_database()
+    applied = migrations.migrate(log=lambda line: None)
+    assert [migration.version for migration in applied] \
+        == [migration.version for migration in migrations.MIGRATIONS]
+    assert migrations.get_pending() == []
+    assert migrations.migrate(log=lambda line: None) == []
+
+    # Every table, column and index the models declare now exists
+    inspector = sqlalchemy.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        assert table.name in inspector.get_table_names()
+        columns = {column['name']
+                   for column in inspector.get_columns(table.name)}
+        assert {column.name for column in table.columns} <= columns
+        indexes = {index['name']
+                   for index in inspector.get_indexes(table.name)}
+        assert {index.name for index in table.indexes} <= indexes
+
+
+def test_migrated_data(app):
+    create_baseline_database()
+    migrations.migrate(log=lambda line: None)
+
+    alice, bob = Crab.query.order_by(Crab.id).all()
+    assert (alice.username, bob.username) == ('Alice', 'bob')
+    assert db.session.execute('SELECT COUNT(*) FROM following').scalar() == 1
+    assert bob.follower_count == 1
+
+    # New counters start at zero until the follow-up scripts reconcile them
+    assert Molt.reconcile_counters() == 2
+    db.session.commit()
+    molt = Molt.query.get(1)
+    assert (molt.like_count, molt.reply_count) == (1, 1)
+
+    # The migrated schema works with the current models
+    db.session.add(Trophy(title='Baby Crab', description='Baby Crab'))
+    db.session.commit()
+    reply = molt.reply(alice, 'Again')
+    assert reply.conversation_id == molt.id
+    db.session.expire_all()
+    assert Molt.query.get(1).reply_count == 2
@@ -0,0 +1,98 @@
+""" The grouped notifications feed must list what the ungrouped
+    `get_notifications` query does.
+"""
+import config
+from extensions import db
+from models import Molt, NotificationGroup
+import pytest
+
+
+def ungrouped(crab) -> list:
+    """ `get_notifications` as (notification ID, count, timestamp), computed
+        from `Notification` directly.
+    """
+    enabled = config.NOTIFICATION_GROUPS_ENABLED
+    config.NOTIFICATION_GROUPS_ENABLED = False
+    try:
+        return [(notification.id, count, timestamp) for notification, count,
+                timestamp in crab.get_notifications()]
+    finally:
+        config.NOTIFICATION_GROUPS_ENABLED = enabled
+
+
+def grouped(crab) -> list:
+    """ `get_notifications` as (notification ID, count, timestamp), read from
+        `NotificationGroup`.
+    """
+    enabled = config.NOTIFICATION_GROUPS_ENABLED
+    config.NOTIFICATION_GROUPS_ENABLED = True
+    try:
+        return [(notification.id, count, timestamp) for notification, count,
+                timestamp in crab.get_notifications()]
+    finally:
+        config.NOTIFICATION_GROUPS_ENABLED = enabled
+
+
+def engage(make_crab):
+    """ Notify Alice of one of everything. Returns Alice and the Crabs who
+        engaged.
+    """
+    alice = make_crab('alice')
+    crabs = [make_crab(f'crab{number}') for number in range(4)]
+    first, second = alice.molt('First'), alice.molt('Second')
+    for crab in crabs:
+        crab.follow(alice)
+        first.like(crab)
+    for crab in crabs[:3]:
+        second.like(crab)
+        first.remolt(crab)
+    second.remolt(crabs[3])
+    first.reply(crabs[0], 'Nice')
+    second.quote(crabs[1], 'Look')
+    crabs[2].molt('Hey @alice')
+    return alice, crabs
+
+
+@pytest.fixture
+def groups_enabled():
+    enabled = config.NOTIFICATION_GROUPS_ENABLED
+    config.NOTIFICATION_GROUPS_ENABLED = True
+    yield
+    config.NOTIFICATION_GROUPS_ENABLED = enabled
+
+
+def test_rebuild_matches_ungrouped(make_crab):
+    alice, _ = engage(make_crab)
+    expected = ungrouped(alice)
+    assert len(expected) > 0
+
+    NotificationGroup.rebuild(alice)
+    db.session.commit()
+    assert grouped(alice) == expected
+
+
+def test_rebuild_skips_remolts_of_missing_molts(make_crab):
+    alice, crabs = engage(make_crab)
+    remolt = Molt.query.filter_by(author=crabs[3], is_remolt=True).one()
+    db.session.execute(Molt.__table__.delete()
+                       .where(Molt.id == remolt.id))
+    db.session.commit()
+
+    NotificationGroup.rebuild(alice)
+    db.session.commit()
+    assert 'remolt:None' not in {group.key for group in
+                                 NotificationGroup.query}
+    assert grouped(alice) == ungrouped(alice)
+
+
+def test_groups_kept_up_to_date(make_crab, groups_enabled):
+    alice, crabs = engage(make_crab)
+    assert grouped(alice) == ungrouped(alice)
+
+    crabs[0].ban()
+    alice.block(crabs[1])
+    assert grouped(alice) == ungrouped(alice)
+
+    crabs[0].unban()
+    alice.unblock(crabs[1])
+    assert grouped(alice) == ungrouped(alice)
@@ -0,0 +1,114 @@
+""" Keyset pagination: walking forwards and back, ties, and empty pages.
+"""
+import datetime
+from extensions import db
+from models import Crab, Molt
+import pagination
+import pytest
+
+PER_PAGE = 3
+
+
+@pytest.fixture
+def molts(make_crab):
+    """ Seven Molts, newest first. The middle three share a timestamp.
+    """
+    alice = make_crab('alice')
+    start = datetime.datetime(2021, 1, 1)
+    offsets = (0, 1, 2, 3, 3, 3, 4)
+    molts = list()
+    for number, minutes in enumerate(offsets):
+        molt = alice.molt(f'Molt {number}')
+        molt.timestamp = start + datetime.timedelta(minutes=minutes)
+        molts.append(molt)
+    db.session.commit()
+    return molts[::-1]
+
+
+def walk(query, **kwargs):
+    pages = list()
+    cursor = None
+    while True:
+        page = pagination.paginate(query, before=cursor, per_page=PER_PAGE,
+                                   **kwargs)
+        pages.append(page)
+        if not page.has_next:
+            return pages
+        cursor = page.next_cursor
+
+
+def test_first_page(molts):
+    page = pagination.paginate(Molt.query, per_page=PER_PAGE)
+    assert page.items == molts[:PER_PAGE]
+    assert page.has_next and not page.has_prev
+    assert page.next_cursor and page.prev_cursor
+
+
+def test_walk_before(molts):
+    pages = walk(Molt.query)
+    assert [molt for page in pages for molt in page.items] == molts
+    assert [len(page.items) for page in pages] == [3, 3, 1]
+    assert all(page.has_prev for page in pages[1:])
+
+
+def test_walk_back_after(molts):
+    pages = walk(Molt.query)
+    page = pagination.paginate(Molt.query, after=pages[-1].prev_cursor,
+                               per_page=PER_PAGE)
+    assert page.items == pages[-2].items
+    assert page.has_next and page.has_prev
+
+    page = pagination.paginate(Molt.query, after=page.prev_cursor,
+                               per_page=PER_PAGE)
+    assert page.items == pages[0].items
+    assert page.has_next and not page.has_prev
+
+
+def test_empty_query(app):
+    page = pagination.paginate(Molt.query, per_page=PER_PAGE)
+    assert page.items == []
+    assert not page.has_next and not page.has_prev
+    assert page.next_cursor is None and page.prev_cursor is None
+
+
+def test_empty_after_page(molts):
+    newest = pagination.encode_cursor(molts[0].timestamp, molts[0].id)
+    page = pagination.paginate(Molt.query, after=newest, per_page=PER_PAGE)
+    assert page.items == []
+    assert not page.has_prev
+    # Still links on to older Molts
+    assert page.has_next and page.next_cursor == newest
+    page = pagination.paginate(Molt.query, before=page.next_cursor,
+                               per_page=PER_PAGE)
+    assert page.items == molts[1:1 + PER_PAGE]
+
+
+def test_before_oldest(molts):
+    oldest = pagination.encode_cursor(molts[-1].timestamp, molts[-1].id)
+    page = pagination.paginate(Molt.query, before=oldest, per_page=PER_PAGE)
+    assert page.items == []
+    assert not page.has_next and page.has_prev
+
+
+def test_malformed_cursor(molts):
+    page = pagination.paginate(Molt.query, before='not a cursor',
+                               per_page=PER_PAGE)
+    assert page.items == molts[:PER_PAGE]
+    assert not page.has_prev
+
+
+def test_exclude(molts):
+    hidden = {molt.id for molt in molts[::2]}
+    pages = walk(Molt.query, exclude=lambda molt: molt.id in hidden)
+    assert [molt for page in pages for molt in page.items] \
+        == [molt for molt in molts if molt.id not in hidden]
+
+
+def test_integer_key(make_crab):
+    crabs = [make_crab(f'crab{number}') for number in range(5)]
+    for follower in crabs[1:]:
+        follower.follow(crabs[0])
+    crabs[2].follow(crabs[1])
+    pages = walk(Crab.query, key=Crab.follower_sort_key())
+    assert [crab for page in pages for crab in page.items] \
+        == [crabs[0], crabs[1], crabs[4], crabs[3], crabs[2]]
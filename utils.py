@@ -1,17 +1,23 @@
 from config import *
 from crabatar import Crabatar
 import crabber
-import datetime
 import extensions
-from flask import redirect, request
+from flask import g, has_request_context, redirect, render_template, \
+    request, stream_with_context
 import geoip2.database
 from geoip2.errors import AddressNotFoundError
-from sqlalchemy import func
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import operators, visitors
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter
 import json
+import localization
 import models
+import muted
 import patterns
 import random
 import turtle_images
+from typing import Dict, Iterable, Optional
 import uuid
 from werkzeug.wrappers import Response
 
@@ -73,18 +79,6 @@ def show_message(misc_msg: str, redirect_url=None, preserve_arguments=False) \
     return redirect(f'{target_url}?msg={misc_msg}&{args}')
 
 
-def get_current_user():
-    """
-    Retrieves the object of the currently logged-in user by ID.
-    :return: The logged in user
-    """
-    crab = crabber.session.get('current_user_object')
-    if not crab:
-        crab = models.Crab.get_by_ID(crabber.session.get('current_user'))
-        crabber.session['current_user_object'] = crab
-    return crab
-
-
 def validate_username(username: str) -> bool:
     """
     Validates `username` hasn't already been used by another (not deleted) user.
@@ -384,9 +378,13 @@ def common_molt_actions() -> Response:
                 if len(new_username) in range(3, 32):
                     if patterns.username.fullmatch(new_username):
                         if not patterns.only_underscores.fullmatch(new_username):
+                            old_username = target_user.username
                             target_user.email = new_email
                             target_user.username = new_username
                             db.session.commit()
+                            if old_username != new_username:
+                                models.Molt.uncache_mentioning(old_username,
+                                                               new_username)
                             return show_message('Changes saved.')
                         else:
                             return show_error('Only underscores? Really? Think '
@@ -426,7 +424,7 @@ def common_molt_actions() -> Response:
         target_user = get_current_user()
         new_timezone = request.form.get('timezone')
         new_lastfm = request.form.get('lastfm').strip()
-        if patterns.timezone.fullmatch(new_timezone):
+        if localization.is_valid_timezone(new_timezone):
             target_user.timezone = new_timezone
             target_user.lastfm = new_lastfm
             db.session.commit()
@@ -451,6 +449,7 @@ def common_molt_actions() -> Response:
         target_user.show_nsfw = new_nsfw
 
         db.session.commit()
+        muted.matchers.invalidate(target_user.id)
         return show_message("Changes saved.")
     else:
         print(action)
@@ -458,38 +457,109 @@ def common_molt_actions() -> Response:
     # PRG pattern
     return redirect(request.url)
 
+def render_blocks(template_name: str,
+                  blocks: Iterable[str] = ('title', 'heading', 'body'),
+                  **context) -> Dict[str, str]:
+    """ Renders only the named blocks of a page template, for `ajax_json`
+        page switching. Blocks are rendered in one pass over one context
+        (context processors run once), so values computed while rendering
+        one block are reused by the others.
+        :return: Rendered HTML of each block, by name
+    """
+    app = crabber.app
+    template = app.jinja_env.get_or_select_template(template_name)
+    app.update_template_context(context)
+    template_context = template.new_context(context)
+    return {block: ''.join(template.blocks[block](template_context)).strip()
+            for block in blocks}
+
+
+def stream_template(template_name: str, mimetype: Optional[str] = None,
+                    **context) -> Response:
+    """ Renders a template as a streamed response: HTML is sent in pieces of
+        about `STREAM_BUFFER_SIZE` bytes as the template renders, instead of
+        after all of it has. Falls back to a regular response if
+        `STREAMING_ENABLED` is off.
+    """
+    app = crabber.app
+    if not STREAMING_ENABLED:
+        return Response(render_template(template_name, **context),
+                        mimetype=mimetype)
+    template = app.jinja_env.get_or_select_template(template_name)
+    app.update_template_context(context)
+
+    def generate():
+        buffer, size = list(), 0
+        for piece in template.generate(context):
+            buffer.append(piece)
+            size += len(piece)
+            if size >= STREAM_BUFFER_SIZE:
+                yield ''.join(buffer)
+                buffer, size = list(), 0
+        if buffer:
+            yield ''.join(buffer)
+
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+
 def get_current_user():
     """
-    Retrieves the object of the currently logged-in user by ID.
+    Retrieves the object of the currently logged-in user by ID. It is loaded
+    once per request and kept in `flask.g`; it's loaded again only if the
+    session's user changes (e.g. on login or logout).
     :return: The logged in user
     """
-    return models.Crab.query.filter_by(id=crabber.session.get("current_user"), deleted=False).first()
+    crab_id = crabber.session.get('current_user')
+    if g.get('current_user_id', None) != crab_id \
+            or 'current_user' not in g:
+        g.pop('current_user_id', None)
+        g.pop('current_user', None)
+        g.current_user = models.Crab.get_by_ID(crab_id)
+        g.current_user_id = crab_id
+    return g.current_user
+
+
+def _is_current_user_query(statement) -> bool:
+    """ Whether `statement` selects the Crab with the current user's ID.
+    """
+    if statement.whereclause is None \
+            or models.Crab not in (description.get('entity') for description
+                                   in statement.column_descriptions):
+        return False
+    for clause in visitors.iterate(statement.whereclause):
+        if isinstance(clause, BinaryExpression) \
+                and clause.operator is operators.eq \
+                and getattr(clause.left, 'table', None) \
+                is models.Crab.__table__ \
+                and clause.left.key == 'id' \
+                and isinstance(clause.right, BindParameter) \
+                and clause.right.effective_value == g.current_user_id:
+            return True
+    return False
 
 
-def get_pretty_age(dt: datetime.datetime) -> str:
-    """
-    Converts datetime to pretty twitter-esque age string.
-    :param dt:
-    :return: Age string
+@event.listens_for(Session, 'do_orm_execute')
+def check_current_user_query(orm_execute_state):
+    """ Logs a warning when a main-site route queries the current user again
+        after `get_current_user` has loaded them (if
+        `CURRENT_USER_QUERY_CHECK` is enabled). Blueprints (the API, RSS)
+        and explicit `Crab.get_by_ID` lookups are exempt.
     """
-    now: datetime.datetime = datetime.datetime.utcnow()
-    delta = now - dt
-
-    if delta.total_seconds() < 60:  # Less than a minute
-        # Return number of seconds
-        return f"{round(delta.seconds)}s"
-    elif delta.total_seconds() / 60 < 60:  # Less than an hour
-        # Return number of minutes
-        return f"{round(delta.seconds / 60)}m"
-    elif delta.seconds / 60 / 60 < 24 and delta.days == 0:  # Less than a day
-        # Return number of hours
-        return f"{round(delta.seconds / 60 / 60)}h"
-    elif dt.year == now.year:  # Same year as now
-        # Return day and month
-        return localize(dt).strftime("%b %e")
-    else:
-        # Return day month, year
-        return localize(dt).strftime("%b %e, %Y")
+    # Only once they were found: an invalidated account (e.g. banned) may
+    # still be looked up by ID, as `before_request` does to log it out
+    if CURRENT_USER_QUERY_CHECK and has_request_context() \
+            and request.blueprint is None \
+            and g.get('current_user', None) is not None \
+            and orm_execute_state.is_select \
+            and not orm_execute_state.is_column_load \
+            and not orm_execute_state.is_relationship_load \
+            and not orm_execute_state.execution_options.get(
+                'explicit_lookup', False) \
+            and _is_current_user_query(orm_execute_state.statement):
+        crabber.app.logger.warning(
+            'The current user was queried again during %s; use '
+            'utils.get_current_user() instead.', request.path
+        )
 
 
 def allowed_file(filename: str) -> bool:
@@ -502,26 +572,6 @@ def allowed_file(filename: str) -> bool:
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def localize(dt: datetime.datetime) -> datetime.datetime:
-    """
-    Localizes datetime to user's timezone
-    https://www.youtube.com/watch?v=-5wpm-gesOY
-
-    :param dt: datetime to localize
-    :return: Localized datetime
-    """
-    current_user = get_current_user()
-    if current_user:
-        new_dt = dt + current_user.timedelta
-    else:
-        # Defaults to Chicago time
-        new_dt = dt + datetime.timedelta(hours=-6)
-
-    # Daylight Saving
-    if new_dt.month in range(4, 11) or (new_dt.month == 3 and new_dt.day >= 8):
-        new_dt += datetime.timedelta(hours=1)
-    return new_dt
-
 def upload_image(image_file):
     """ Saves image file and returns new location.
     """